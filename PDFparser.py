@@ -1,25 +1,107 @@
 import os
 import re
 import pymupdf
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable
+
+# 正文中的 URL：带协议或 www. 开头的，以及常见顶级域名后紧跟路径的裸域名 (github.com/xxx)
+_URL_CHAR = r"[^\s<>\"'`{}|\\^\[\]]"
+_TEXT_URL_RE = re.compile(
+    rf"(?:https?://|www\.){_URL_CHAR}+"
+    rf"|\b(?:[a-z0-9-]+\.)+(?:com|org|net|io|ai|edu|gov|co|dev|app|me|info|cc|xyz|uk|cn|de|fr|jp)/{_URL_CHAR}*",
+    re.IGNORECASE,
+)
+# 先用只含字面量的模式判断这一页是否可能有 URL，绝大多数正文页面可以跳过完整匹配
+_URL_HINT_RE = re.compile(r"://|www\.|\.(?:com|org|net|io|ai|edu|gov|co|dev|app|me|info|cc|xyz|uk|cn|de|fr|jp)/",
+                          re.IGNORECASE)
+_URL_TOKEN_RE = re.compile(rf"{_URL_CHAR}+")
+# URL 以这些字符结尾却恰好遇到换行，基本可以确定是被折行截断的 (句号、问号等可能是句末标点，不算)
+_URL_BREAK_CHARS = "/-_=&#%~"
+_TRAILING_PUNCT = ".,;:!?'\"。，；：）"
+
+
+def _continues_on_next_line(url: str, token: str) -> bool:
+    """判断下一行开头的 token 是否是被折行 (或断字) 截断的 URL 的后半部分。"""
+    if token.lower().startswith(("http://", "https://", "www.")):
+        return False
+    if url.endswith(tuple(_URL_BREAK_CHARS)):
+        return True
+    # 在路径中间折行：下一行开头的 token 本身带路径分隔符，才当作续接 (避免吞掉下一行的普通单词)
+    return "/" in token.rstrip(_TRAILING_PUNCT)
+
+
+def _strip_url_tail(url: str) -> str:
+    """去掉句末标点，以及不成对的右括号。"""
+    while url:
+        if url[-1] in _TRAILING_PUNCT:
+            url = url[:-1]
+        elif url[-1] == ")" and url.count("(") < url.count(")"):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def mine_text_urls(text: str) -> List[str]:
+    """
+    从一页的纯文本中挖掘 URL，处理跨行 (包括在连字符处断开) 的 URL。
+    没有协议的 (www.xxx / github.com/xxx) 补上 https://。
+    """
+    urls = []
+    if not _URL_HINT_RE.search(text):
+        return urls
+    consumed = 0
+    for match in _TEXT_URL_RE.finditer(text):
+        if match.start() < consumed:  # 已经作为上一个 URL 的续行被拼接
+            continue
+        url, end = match.group(0), match.end()
+        while end < len(text) and text[end] == "\n":
+            token = _URL_TOKEN_RE.match(text, end + 1)
+            if token is None or not _continues_on_next_line(url, token.group(0)):
+                break
+            url, end = url + token.group(0), token.end()
+        consumed = end
+        url = _strip_url_tail(url)
+        if "://" not in url:
+            url = "https://" + url
+        host = url.split("://", 1)[1].split("/", 1)[0]
+        if "." in host and not host.endswith("."):
+            urls.append(url)
+    return urls
+
+
+def _link_key(url: str) -> str:
+    key = url.strip().lower().split("://", 1)[-1]
+    if key.startswith("www."):
+        key = key[4:]
+    return key.rstrip("/")
+
 
 class PdfLinkExtractor:
+    ENGINES = ("full", "fast", "text")
+
     def __init__(self, pdf_root_dir: str, output_file: str, flatten: bool = False,
-                 skip_domains=None, replacements=None):
+                 skip_domains=None, replacements=None, engine: str = "full"):
         """
         :param pdf_sroot_dir:    要递归搜索 PDF 的根目录
         :param output_file: 结果写入的文本文件路径
         :param flatten:     如果为 True，则输出一个全局去重的 URL 列表（扁平化），
                             否则按文件分组输出。
         :param skip_domains: 要跳过的域名或 URL 片段列表
-        :param replacements: 替换映射 dict，key 为待替换子串，value 为目标子串
+        :param replacements: 替换映射 dict，key 为待替换子串，value 为目标子串；
+                             为 None 时不做替换 (由后续的链接解析阶段在最终 URL 上替换)
+        :param engine:      "full" 逐页加载并调用 get_links()；
+                            "fast" 按路径打开 PDF，只读取链接注释对象和元数据标题 (见 extract_paper_name_and_links_fast)；
+                            "text" 在 fast 的基础上每页提取一次纯文本，补充正文/脚注中没有链接注释的 URL
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"未知的 PDF 解析引擎: {engine}，可选: {self.ENGINES}")
         self.pdf_root_dir = pdf_root_dir
         self.output_file = output_file
         self.flatten = flatten
         self.skip_domains = skip_domains
         # 使用字典存储多对替换规则
         self.replacements = replacements
+        self.engine = engine
 
     @staticmethod
     def extract_paper_name_and_links(pdf_bytes: bytes, pdf_filename: str) -> Dict[str, Any]:
@@ -64,6 +146,75 @@ class PdfLinkExtractor:
         
         return {"paper_name": paper_name, "extracted_links": unique_links}
 
+    @staticmethod
+    def extract_paper_name_and_links_fast(source, pdf_filename: str, mine_text: bool = False) -> Dict[str, Any]:
+        """
+        最小工作量的提取：source 为文件路径 (由 MuPDF 按需读取，不整体读入内存) 或 PDF 二进制。
+        不加载页面、不做文本和版面分析，直接从每页的 /Annots 中读取链接注释的 /A/URI；
+        标题取元数据，元数据为空时才看第 0 页 (字号最大的文本)，仍没有时用文件名。
+        mine_text=True 时每页只提取一次纯文本，同时挖掘正文/脚注中没有链接注释的 URL (见 mine_text_urls)，
+        与注释中的链接合并去重 (注释在前)。
+        """
+        if isinstance(source, (bytes, bytearray)):
+            doc = pymupdf.open(stream=source, filetype="pdf")
+        else:
+            doc = pymupdf.open(source)
+        try:
+            paper_name = " ".join(((doc.metadata or {}).get("title") or "").split())
+            links = []
+            text_links = []
+            for pno in range(doc.page_count):
+                textpage = None
+                if mine_text:
+                    # 每页一次文本提取 (flags=0：不保留连字/空白/图片信息)，第 0 页的标题也复用这次结果
+                    textpage = doc[pno].get_textpage(flags=0)
+                    text_links.extend(mine_text_urls(textpage.extractText()))
+                if pno == 0 and not paper_name:
+                    textpage = textpage or doc[0].get_textpage(flags=0)
+                    paper_name = PdfLinkExtractor._title_from_textpage(textpage)
+
+                annots = doc.page_annot_xrefs(pno)
+                if any(xref == 0 for xref, _, _ in annots):
+                    # 注释直接内嵌在 /Annots 数组中 (没有独立对象)，这一页退回到 get_links()
+                    links.extend(link["uri"] for link in doc[pno].get_links() if link.get("uri"))
+                    continue
+                for xref, annot_type, _ in annots:
+                    if annot_type != pymupdf.PDF_ANNOT_LINK:
+                        continue
+                    value_type, uri = doc.xref_get_key(xref, "A/URI")
+                    if value_type == "string" and uri:
+                        links.append(uri)
+        finally:
+            doc.close()
+
+        if not paper_name:
+            paper_name = os.path.splitext(pdf_filename)[0]
+        if text_links:
+            # 注释链接与正文中的同一链接只差协议/www/末尾斜杠时视为重复
+            seen = {_link_key(url) for url in links}
+            for url in text_links:
+                key = _link_key(url)
+                if key not in seen:
+                    seen.add(key)
+                    links.append(url)
+        return {"paper_name": paper_name, "extracted_links": list(dict.fromkeys(links))}
+
+    @staticmethod
+    def _title_from_textpage(textpage, max_chars: int = 300) -> str:
+        """取第 0 页字号最大的文本行作为标题 (只在元数据没有标题时调用)。"""
+        spans = []
+        for block in textpage.extractDICT().get("blocks", []):
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    text = span.get("text", "").strip()
+                    if text:
+                        spans.append((round(span.get("size", 0), 1), text))
+        if not spans:
+            return ""
+        largest = max(size for size, _ in spans)
+        title = " ".join(text for size, text in spans if size == largest)
+        return " ".join(title.split())[:max_chars]
+
     @staticmethod
     def extract_text_and_links(pdf_bytes: bytes) -> list:
         """从 PDF 二进制中提取所有外部 URL 并去重（保留顺序）。"""
@@ -127,7 +278,7 @@ class PdfLinkExtractor:
         for url in urls:
             updated = url
             # 先做映射替换
-            for src, tgt in self.replacements.items():
+            for src, tgt in (self.replacements or {}).items():
                 if src in updated:
                     original = updated
                     updated = updated.replace(src, tgt)
@@ -142,41 +293,80 @@ class PdfLinkExtractor:
             new_urls.append(updated)
         return new_urls
     
-    def run(self) -> List[Dict[str, Any]]:
-        papers_data = []
+    def extract_paper(self, pdf_path: str) -> Optional[Dict[str, Any]]:
+        """
+        处理单个 PDF：提取论文名和链接，并做前缀去重、skip_domains 过滤和替换。
+        读取/解析失败或没有有效链接时返回 None。
+        """
+        if self.engine in ("fast", "text"):
+            # 直接按路径打开，省去把整个文件读入 bytes 的拷贝
+            paper = self._extract_paper(pdf_path, os.path.basename(pdf_path))
+        else:
+            try:
+                with open(pdf_path, "rb") as f:
+                    pdf_bytes = f.read()
+            except Exception as e:
+                print(f"[错误] 读取 PDF 失败 {pdf_path}: {e}")
+                return None
+            paper = self._extract_paper(pdf_bytes, os.path.basename(pdf_path))
+        if paper is not None:
+            paper["venue"] = self.venue_for(pdf_path)
+        return paper
+
+    def venue_for(self, pdf_path: str) -> str:
+        """PDF 所在的子目录 (抓取时每个会议/分组一个子目录)，直接放在根目录下时取根目录名。"""
+        venue = os.path.relpath(os.path.dirname(os.path.abspath(pdf_path)), os.path.abspath(self.pdf_root_dir))
+        return os.path.basename(os.path.abspath(self.pdf_root_dir)) if venue == "." else venue
 
+    def extract_paper_bytes(self, pdf_bytes: bytes, filename: str) -> Optional[Dict[str, Any]]:
+        """与 extract_paper 相同，但直接处理内存中的 PDF (下载后无需落盘再读取)。"""
+        return self._extract_paper(pdf_bytes, filename)
+
+    def _extract_paper(self, source, filename: str) -> Optional[Dict[str, Any]]:
+        try:
+            # 从 PDF 中提取论文名和链接
+            # 文件名被传递给 extract_paper_name_and_links 用于备用 paper_name
+            if self.engine in ("fast", "text"):
+                paper_info = self.extract_paper_name_and_links_fast(source, filename, mine_text=self.engine == "text")
+            else:
+                paper_info = self.extract_paper_name_and_links(source, filename)
+            
+            # 对提取出的链接进行处理
+            processed_links = self.remove_prefix_urls(paper_info["extracted_links"])
+            processed_links = self.filter_urls(processed_links)
+            processed_links = self.apply_replacements(processed_links)
+        except Exception as proc_e:
+            print(f"[错误] 处理 PDF 时出错 {filename}: {proc_e}")
+            return None
+
+        if not processed_links: # 只返回包含有效链接的论文条目
+            return None
+        return {
+            "paper_name": paper_info["paper_name"],
+            "extracted_links": processed_links
+        }
+
+    def list_pdfs(self) -> List[str]:
+        """递归列出 pdf_root_dir 下的全部 PDF 路径。"""
+        pdf_paths = []
         for root, _, files in os.walk(self.pdf_root_dir):
             for fn in files:
-                if not fn.lower().endswith(".pdf"):
-                    continue
+                if fn.lower().endswith(".pdf"):
+                    pdf_paths.append(os.path.join(root, fn))
+        return pdf_paths
 
-                pdf_path = os.path.join(root, fn)
-                try:
-                    with open(pdf_path, "rb") as f:
-                        pdf_bytes = f.read()
-                except Exception as e:
-                    print(f"[错误] 读取 PDF 失败 {pdf_path}: {e}")
-                    continue
+    def run(self, on_paper: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        :param on_paper: 每提取完一篇 (有链接的) 论文就调用一次，例如用于边解析边预热
+        """
+        papers_data = []
 
-                try:
-                    # 从 PDF 中提取论文名和链接
-                    # fn (文件名) 被传递给 extract_paper_name_and_links 用于备用 paper_name
-                    paper_info = self.extract_paper_name_and_links(pdf_bytes, fn)
-                    
-                    # 对提取出的链接进行处理
-                    processed_links = self.remove_prefix_urls(paper_info["extracted_links"])
-                    processed_links = self.filter_urls(processed_links)
-                    processed_links = self.apply_replacements(processed_links)
-                    
-                    if processed_links: # 只添加包含有效链接的论文条目
-                        papers_data.append({
-                            "paper_name": paper_info["paper_name"],
-                            "extracted_links": processed_links
-                        })
-                        
-                except Exception as proc_e:
-                    print(f"[错误] 处理 PDF 时出错 {pdf_path}: {proc_e}")
-                    continue
+        for pdf_path in self.list_pdfs():
+            paper = self.extract_paper(pdf_path)
+            if paper is not None:
+                papers_data.append(paper)
+                if on_paper is not None:
+                    on_paper(paper)
         
         if self.output_file: # 简单保留写入，但格式可能不符合预期
             try:
@@ -203,16 +393,62 @@ class PdfLinkExtractor:
         print(f"[信息] PdfLinkExtractor 完成，处理了 {len(papers_data)} 个包含链接的PDF文档。")
         return papers_data
 
+def benchmark_engines(pdf_paths: List[str], engines=PdfLinkExtractor.ENGINES) -> Dict[str, Dict[str, Any]]:
+    """
+    在同一批 PDF 上比较各解析引擎的吞吐 (PDFs/sec、MB/sec)，
+    并统计与第一个引擎提取出的链接集合不一致的论文数。
+    """
+    import time
+    total_mb = sum(os.path.getsize(path) for path in pdf_paths) / (1024 * 1024)
+    results = {}
+    reference = None
+    for engine in engines:
+        extractor = PdfLinkExtractor(pdf_root_dir="", output_file="", engine=engine)
+        extracted = []
+        start = time.perf_counter()
+        for path in pdf_paths:
+            if engine in ("fast", "text"):
+                extracted.append(extractor.extract_paper_name_and_links_fast(
+                    path, os.path.basename(path), mine_text=engine == "text"))
+            else:
+                with open(path, "rb") as f:
+                    extracted.append(extractor.extract_paper_name_and_links(f.read(), os.path.basename(path)))
+        elapsed = time.perf_counter() - start
+        link_sets = [set(info["extracted_links"]) for info in extracted]
+        if reference is None:
+            reference = link_sets
+        results[engine] = {
+            "pdfs": len(pdf_paths),
+            "seconds": round(elapsed, 3),
+            "pdfs_per_sec": round(len(pdf_paths) / elapsed, 1) if elapsed else None,
+            "mb_per_sec": round(total_mb / elapsed, 1) if elapsed else None,
+            "links": sum(len(links) for links in link_sets),
+            "papers_with_different_links": sum(1 for a, b in zip(reference, link_sets) if a != b),
+        }
+    return results
+
+
 if __name__ == "__main__":
+    import argparse
     from utils import load_config
-    config = load_config("config.yaml")
+
+    parser = argparse.ArgumentParser(description="从 PDF 中提取论文名和外部链接")
+    parser.add_argument("--config", default="config.yaml", help="YAML 配置文件路径 (默认: config.yaml)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="不写输出文件，在 pdf_dir 下的全部 PDF 上比较各解析引擎的吞吐")
+    args = parser.parse_args()
+    config = load_config(args.config)
 
     extractor = PdfLinkExtractor(
         pdf_root_dir = config["scraper"]["pdf_dir"], 
         output_file = config["PDFparser"]["output_path"],
         flatten= config["PDFparser"]["flatten"],
         skip_domains=config["PDFparser"]["skip_domains"],
-        replacements=config["PDFparser"]["replacements"]
+        replacements=config["PDFparser"]["replacements"],
+        engine=config["PDFparser"].get("engine", "full")
     )
-    extractor.run()
-
+    if args.benchmark:
+        for engine, stats in benchmark_engines(extractor.list_pdfs()).items():
+            print(f"[基准] {engine}: {stats}")
+    else:
+        extractor.run()
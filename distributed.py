@@ -0,0 +1,344 @@
+"""
+分布式 coordinator / worker 模式。
+
+整届会议 (ICLR + NeurIPS + ICML 的全部 tab) 一个进程跑不完时使用：
+- coordinator：把 PDF 目录下的每篇论文作为一个 "paper" 任务放入共享队列；
+- worker：任意多个进程/机器从队列租用 (lease) 任务：
+    paper 任务 -> 提取链接并完成 Agent 之前的全部步骤，需要 Agent 判断的 URL
+                  以规范化 URL 为键作为 "url" 任务入队 (多篇论文引用同一 URL 只检查一次)；
+    url 任务   -> 调用 check_url_is_dataset，把判定写回队列；
+- merge：把队列中的结果合并成与单机模式相同格式的最终 JSON (agent.final_json_name)。
+
+队列是放在共享磁盘上的 SQLite 文件 (未使用 WAL，网络文件系统上更稳妥)。
+租约超时未续期的任务 (worker 崩溃/失联) 会被其他 worker 重新领取；结果写入是幂等的：
+同一任务只有第一次完成的结果生效，过期租约的迟到结果会被忽略。
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+from utils import save_json
+from urlchecker.priority import score_url, RunBudget
+from urlchecker.prescreen import build_prescreener
+from urlchecker.urlnorm import canonicalize_url
+from urlchecker.warmup import start_warm_up
+from urlchecker.browser_pool import close_browser_pool
+from urlchecker.deadline import Deadline, STATUS_TIMEOUT
+from urlchecker.cost import cost_scope
+from urlchecker.logs import log_context
+
+logger = logging.getLogger(__name__)
+
+KIND_PAPER = "paper"
+KIND_URL = "url"
+# paper 任务优先于 url 任务被领取，尽早产生后续的 url 任务
+PAPER_PRIORITY = 1000.0
+
+
+class SharedWorkQueue:
+    """基于 SQLite 的共享工作队列，支持租约、续约和幂等完成。"""
+
+    def __init__(self, path: str, lease_seconds: float = 600.0, max_attempts: int = 3):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # isolation_level=None: 手动控制事务，用 BEGIN IMMEDIATE 保证租用操作的原子性
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                priority REAL NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_status ON items (status, priority);
+            CREATE TABLE IF NOT EXISTS papers (
+                paper_id TEXT PRIMARY KEY,
+                paper_name TEXT NOT NULL,
+                seq INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS paper_links (
+                paper_id TEXT NOT NULL,
+                link_order INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                url_item TEXT,
+                confirmed_thought TEXT,
+                PRIMARY KEY (paper_id, url)
+            );
+        """)
+
+    def _write(self, sql_statements: List[Tuple[str, tuple]]) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in sql_statements:
+                self._conn.execute(sql, params)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, item_id: str, kind: str, payload: Dict[str, Any], priority: float = 0.0) -> None:
+        """入队；同一 id 已存在时不重复入队。"""
+        self._write([("INSERT OR IGNORE INTO items (id, kind, payload, priority, updated_at) VALUES (?, ?, ?, ?, ?)",
+                      (item_id, kind, json.dumps(payload, ensure_ascii=False), priority, time.time()))])
+
+    def lease(self, worker_id: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """领取一个待处理 (或租约已过期) 的任务，返回 (id, kind, payload)；当前没有可领取的任务时返回 None。"""
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 租约过期且重试次数用完的任务标记为失败
+            self._conn.execute(
+                "UPDATE items SET status = 'failed', updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            row = self._conn.execute(
+                "SELECT id, kind, payload FROM items "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? "
+                "ORDER BY priority DESC LIMIT 1", (now, self.max_attempts)).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE items SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, row[0]))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def renew(self, item_id: str, worker_id: str) -> bool:
+        """续约；租约已被其他 worker 接手时返回 False。"""
+        cursor = self._conn.execute(
+            "UPDATE items SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + self.lease_seconds, item_id, worker_id))
+        return cursor.rowcount > 0
+
+    def complete(self, item_id: str, result: Dict[str, Any],
+                 extra_statements: Optional[List[Tuple[str, tuple]]] = None) -> bool:
+        """
+        幂等地写入结果：任务已完成时忽略 (返回 False)。
+        extra_statements 与结果在同一事务中执行 (例如 paper 任务写入的链接表)。
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self._conn.execute(
+                "UPDATE items SET status = 'done', result = ?, updated_at = ? WHERE id = ? AND status != 'done'",
+                (json.dumps(result, ensure_ascii=False), time.time(), item_id))
+            if cursor.rowcount and extra_statements:
+                for sql, params in extra_statements:
+                    self._conn.execute(sql, params)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
+
+    def release(self, item_id: str, worker_id: str, count_attempt: bool = True) -> None:
+        """
+        处理出错时立即放回队列 (不等租约过期)；重试次数已用完时标记为失败。
+        count_attempt=False 用于没有开始处理就放回 (如预算用完)，不计入重试次数。
+        """
+        if not count_attempt:
+            self._conn.execute(
+                "UPDATE items SET status = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time(), item_id, worker_id))
+            return
+        self._conn.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (self.max_attempts, time.time(), item_id, worker_id))
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, status, n in self._conn.execute("SELECT kind, status, COUNT(*) FROM items GROUP BY kind, status"):
+            counts.setdefault(kind, {})[status] = n
+        return counts
+
+    def has_unfinished(self) -> bool:
+        row = self._conn.execute("SELECT COUNT(*) FROM items WHERE status IN ('pending', 'leased')").fetchone()
+        return row[0] > 0
+
+
+def run_coordinator(pipeline, queue: SharedWorkQueue) -> int:
+    """把 PDF 目录下的每篇论文放入队列，返回新入队的论文数。"""
+    pdf_paths = sorted(pipeline.extractor.list_pdfs())
+    before = queue.counts().get(KIND_PAPER, {})
+    for seq, pdf_path in enumerate(pdf_paths):
+        # seq 决定合并时的论文顺序 (按路径排序，多次合并结果稳定)
+        queue.enqueue(f"paper:{os.path.abspath(pdf_path)}", KIND_PAPER,
+                      {"pdf_path": os.path.abspath(pdf_path), "seq": seq}, priority=PAPER_PRIORITY)
+    added = sum(queue.counts().get(KIND_PAPER, {}).values()) - sum(before.values())
+    logger.info(f"[Coordinator] 共 {len(pdf_paths)} 篇论文，新入队 {added} 篇。队列状态: {queue.counts()}")
+    return added
+
+
+async def _with_lease_renewal(queue: SharedWorkQueue, item_id: str, worker_id: str, coro):
+    """执行任务期间定期续约，避免长时间的 Agent 检查被误判为失联。"""
+    async def renew_loop():
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not queue.renew(item_id, worker_id):
+                logger.warning(f"[Worker {worker_id}] 任务 {item_id} 的租约已被接手。")
+                return
+    renewer = asyncio.create_task(renew_loop())
+    try:
+        return await coro
+    finally:
+        renewer.cancel()
+
+
+async def _handle_paper(pipeline, queue: SharedWorkQueue, item_id: str, payload: Dict[str, Any]) -> None:
+    paper = await asyncio.to_thread(pipeline.extractor.extract_paper, payload["pdf_path"])
+    paper_name = paper["paper_name"] if paper else os.path.splitext(os.path.basename(payload["pdf_path"]))[0]
+    confirmed: list = []
+    urls_to_agent: list = []
+    link_order: Dict[str, int] = {}
+    probe_by_url: Dict[str, Any] = {}
+    if paper is not None:
+        with cost_scope(venue=paper.get("venue"), paper=paper_name):
+            link_order, urls_to_agent, probe_by_url = await pipeline._prepare_paper_links(
+                paper_name, paper["extracted_links"], confirmed)
+
+    statements = [("INSERT OR REPLACE INTO papers VALUES (?, ?, ?)", (item_id, paper_name, payload.get("seq", 0)))]
+    for order, info in confirmed:
+        statements.append(("INSERT OR REPLACE INTO paper_links VALUES (?, ?, ?, NULL, ?)",
+                           (item_id, order, info["url"], info["thought"])))
+    for url in urls_to_agent:
+        url_item = f"url:{canonicalize_url(url)}"
+        probe = probe_by_url.get(url)
+        score = score_url(url, latency=probe.latency if probe else 0.0, cached=bool(probe and probe.cached))
+        statements.append(("INSERT OR REPLACE INTO paper_links VALUES (?, ?, ?, ?, NULL)",
+                           (item_id, link_order[url], url, url_item)))
+        statements.append(("INSERT OR IGNORE INTO items (id, kind, payload, priority, updated_at) VALUES (?, ?, ?, ?, ?)",
+                           (url_item, KIND_URL, json.dumps({"url": url, "paper_name": paper_name}, ensure_ascii=False),
+                            score, time.time())))
+    queue.complete(item_id, {"paper_name": paper_name, "to_agent": len(urls_to_agent), "confirmed": len(confirmed)},
+                   extra_statements=statements)
+
+
+async def _handle_url(pipeline, queue: SharedWorkQueue, item_id: str, payload: Dict[str, Any]) -> None:
+    deadline = Deadline.after(pipeline.url_seconds, "url")
+    started = time.monotonic()
+    with cost_scope(paper=payload.get("paper_name"), url=payload["url"]), log_context(paper=payload.get("paper_name")):
+        url, status, thought = await pipeline._check_url_with_agent(payload.get("paper_name", ""), payload["url"], deadline)
+    elapsed = time.monotonic() - started
+    pipeline._budget.record_check(elapsed)
+    pipeline._latency.record(url, elapsed, status.lower() if status in ("YES", "NO", STATUS_TIMEOUT) else "error")
+    if status == STATUS_TIMEOUT:
+        # 超时不重试：同一个页面换一个 worker 多半还是超时
+        queue.complete(item_id, {"status": status, "thought": thought})
+        return
+    if status not in ("YES", "NO"):
+        raise RuntimeError(status)  # Agent 出错：放回队列，由重试次数兜底
+    pipeline._record_verdict(url, status, source="agent")
+    queue.complete(item_id, {"status": status, "thought": thought})
+
+
+async def run_worker(pipeline, queue: SharedWorkQueue, worker_id: Optional[str] = None,
+                     concurrency: Optional[int] = None, poll_interval: float = 5.0) -> None:
+    """
+    持续领取并处理任务，直到队列中没有未完成的任务。
+    :param concurrency: 同时处理的任务数，默认取 agent.max_concurrent_checks
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    concurrency = concurrency or pipeline.max_concurrent_checks
+    pipeline.prescreener = build_prescreener(pipeline.agent_cfg.get("reverse_replacements", {}))
+    # agent.budget 对每个 worker 进程分别生效 (与单机模式一样按本进程的用量计算)
+    budget = pipeline._budget = RunBudget(pipeline.max_run_seconds, pipeline.max_llm_calls, pipeline.max_tokens,
+                                          pipeline.max_spend_usd, pipeline.downgrade_at, pipeline.downgrade_model)
+    processed = {"paper": 0, "url": 0, "errors": 0}
+
+    async def loop():
+        while True:
+            if pipeline._budget_stop_reason:
+                return
+            leased = queue.lease(worker_id)
+            if leased is None:
+                if not queue.has_unfinished():
+                    return
+                await asyncio.sleep(poll_interval)  # 其他 worker 还在处理，等待可能产生的新任务或过期租约
+                continue
+            item_id, kind, payload = leased
+            if kind == KIND_URL:
+                reason = pipeline._budget_stop_reason or budget.exhausted()
+                if reason:
+                    # 放回队列 (不计重试次数)，留给其他 worker 或之后的运行
+                    queue.release(item_id, worker_id, count_attempt=False)
+                    if pipeline._budget_stop_reason is None:
+                        pipeline._budget_stop_reason = reason
+                        logger.warning(f"[Worker {worker_id}] {reason}，停止领取新任务。")
+                    return
+                budget.check_downgrade()
+            try:
+                if kind == KIND_PAPER:
+                    await _with_lease_renewal(queue, item_id, worker_id,
+                                              _handle_paper(pipeline, queue, item_id, payload))
+                else:
+                    await _with_lease_renewal(queue, item_id, worker_id,
+                                              _handle_url(pipeline, queue, item_id, payload))
+                processed[kind] += 1
+            except Exception as e:
+                processed["errors"] += 1
+                logger.error(f"[Worker {worker_id}] 处理任务 {item_id} 出错，放回队列: {e}")
+                queue.release(item_id, worker_id)
+
+    logger.info(f"[Worker {worker_id}] 启动，并发 {concurrency}。")
+    warm = start_warm_up()
+    try:
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    finally:
+        if warm is not None:
+            await warm.wait()
+        await close_browser_pool()
+    if pipeline._budget_stop_reason:
+        logger.info(f"[Worker {worker_id}] 因预算停止: {processed}；队列状态: {queue.counts()}")
+    else:
+        logger.info(f"[Worker {worker_id}] 队列已处理完毕: {processed}；队列状态: {queue.counts()}")
+    logger.info(f"[Worker {worker_id}] 运行预算使用情况: {budget.stats()}")
+    pipeline._report_run_stats()
+
+
+def merge_results(pipeline, queue: SharedWorkQueue, output_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """把队列中的结果合并为与单机模式相同格式的最终 JSON。"""
+    conn = queue._conn
+    verdicts = {}
+    for item_id, result in conn.execute("SELECT id, result FROM items WHERE kind = ? AND status = 'done'", (KIND_URL,)):
+        verdicts[item_id] = json.loads(result)
+
+    final_output_data = []
+    for paper_id, paper_name in conn.execute("SELECT paper_id, paper_name FROM papers ORDER BY seq, paper_id").fetchall():
+        confirmed = []
+        for order, url, url_item, thought in conn.execute(
+                "SELECT link_order, url, url_item, confirmed_thought FROM paper_links WHERE paper_id = ?", (paper_id,)):
+            if url_item is None:
+                confirmed.append((order, {"url": url, "thought": thought}))
+            elif verdicts.get(url_item, {}).get("status") == "YES":
+                confirmed.append((order, {"url": url, "thought": verdicts[url_item].get("thought") or "Agent确认，但未提供明确思考过程"}))
+        entry = pipeline.finalize_paper({"paper_name": paper_name, "confirmed": confirmed})
+        if entry is not None:
+            final_output_data.append(entry)
+
+    unfinished = queue.counts()
+    output_path = output_path or pipeline.agent_cfg.get("final_json_name", "final_dataset_urls.json")
+    save_json(output_path, final_output_data)
+    logger.info(f"[Merge] 已合并 {len(final_output_data)} 篇论文的结果到 {output_path}；队列状态: {unfinished}")
+    return final_output_data
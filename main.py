@@ -1,11 +1,13 @@
 # main.py
+import json
 import argparse
 import asyncio
 import logging
 from pipeline import MiningPipeline
+from utils import load_config
+from distributed import SharedWorkQueue, run_coordinator, run_worker, merge_results
+from urlchecker.logs import setup_logging
 
-# 设置日志记录 (与 pipeline.py 保持一致)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def main(args):
@@ -13,6 +15,16 @@ def main(args):
     logger.info("初始化 MiningPipeline...")
     pipeline = MiningPipeline(config_path=args.config)
 
+    if args.dry_run:
+        # 试运行：只解析 PDF 统计候选链接，按历史平均值预估费用和耗时，不调用 LLM
+        estimate = pipeline.estimate(args.pdf_dir)
+        print(json.dumps(estimate, ensure_ascii=False, indent=2))
+        return
+
+    if args.role != "local":
+        run_distributed(pipeline, args)
+        return
+
     logger.info(f"开始运行挖掘流程，目标URL: {args.urls if args.urls else '将使用配置文件中的默认或不抓取新PDF'}")
     try:
         asyncio.run(pipeline.run(args.urls))
@@ -20,6 +32,24 @@ def main(args):
     except Exception as e:
         logger.exception(f"Pipeline 运行时发生未处理的异常: {e}")
 
+def run_distributed(pipeline, args):
+    """分布式模式：coordinator 入队论文，worker 领取处理，merge 合并结果 (见 distributed.py)。"""
+    dist_cfg = load_config(args.config).get("distributed", {})
+    queue = SharedWorkQueue(
+        args.queue or dist_cfg.get("queue_path", "work_queue.sqlite3"),
+        lease_seconds=dist_cfg.get("lease_seconds", 600),
+        max_attempts=dist_cfg.get("max_attempts", 3),
+    )
+    try:
+        if args.role == "coordinator":
+            run_coordinator(pipeline, queue)
+        elif args.role == "worker":
+            asyncio.run(run_worker(pipeline, queue, worker_id=args.worker_id))
+        elif args.role == "merge":
+            merge_results(pipeline, queue)
+    except Exception as e:
+        logger.exception(f"分布式模式 ({args.role}) 运行时发生未处理的异常: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="论文挖掘 Pipeline：提取 PDF 链接 -> Agent 检查 -> 输出确认的链接")
     
@@ -36,8 +66,39 @@ if __name__ == "__main__":
         default="config.yaml", # 默认配置文件名
         help="YAML 配置文件路径 (默认: config.yaml)"
     )
+    parser.add_argument(
+        "--role",
+        choices=["local", "coordinator", "worker", "merge"],
+        default="local",
+        help="运行角色：local 单机运行 (默认)；coordinator 把论文放入共享队列；worker 从队列领取任务处理；merge 合并队列中的结果"
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        default=None,
+        help="共享工作队列 (SQLite) 路径，默认取配置文件中的 distributed.queue_path"
+    )
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        default=None,
+        help="worker 标识，默认 主机名-进程号"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="试运行：解析 PDF 目录中的链接，按历史运行的平均值预估 LLM 费用和耗时，不实际检查"
+    )
+    parser.add_argument(
+        "--pdf-dir",
+        type=str,
+        default=None,
+        help="试运行时要预估的 PDF 目录，默认取配置文件中的 scraper.pdf_dir"
+    )
     
     args = parser.parse_args()
+    # 日志格式、异步输出、采样和对话记录见 urlchecker/config.py 的 LOGGING
+    setup_logging()
 
     # 这条信息来自原 pipeline.py, 放在这里作为启动提示
     logger.info("确保 urlchecker 依赖和 Playwright 浏览器已准备就绪...")
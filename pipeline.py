@@ -1,17 +1,40 @@
+import os
 import argparse
 import asyncio # 导入 asyncio
 import time # 用于计时
 import logging # 用于日志记录
-import requests # 用来检测是否为国外网站
+from typing import Optional, Tuple, Dict, Any
 from utils import load_config, save_json # 确保 save_json 被导入
 from scraper import OpenReviewScraper
 from PDFparser import PdfLinkExtractor
 # 导入 urlchecker 的接口
-from urlchecker.main import check_url_is_dataset #, check_url_likely_dataset
+from urlchecker.main import check_url_is_dataset, check_urls_batch #, check_url_likely_dataset
+from urlchecker.concurrency import get_llm_limiter
+from urlchecker.router import get_router_stats
+from urlchecker.llm_handler import get_stream_stats, get_prompt_cache_stats
+from urlchecker.batch import get_batch_stats
+from urlchecker.probe import probe_url
+from urlchecker.coalesce import get_coalescing_stats
+from urlchecker.host_scheduler import get_host_scheduler_stats
+from urlchecker.reachability import get_reachability_stats
+from urlchecker.resolver import get_url_resolver, get_resolver_stats
+from urlchecker.urlnorm import canonicalize_url
+from urlchecker.priority import PriorityWorkQueue, RunBudget, score_url
+from urlchecker.prescreen import build_prescreener, get_verdict_history, get_prescreen_stats
+from urlchecker.fingerprint import get_fingerprint_stats
+from urlchecker.prefetch import get_prefetch_stats
+from urlchecker.evidence import get_evidence_stats
+from urlchecker.sniff import sniff_content, get_sniff_stats, KIND_DATA, KIND_SKIP
+from urlchecker.warmup import start_warm_up
+from urlchecker.browser_pool import close_browser_pool, get_browser_pool_stats
+from urlchecker.http_cache import get_http_cache_stats
+from urlchecker.service import RemoteClassifier
+from urlchecker.deadline import Deadline, LatencyRecorder, STATUS_TIMEOUT
+from urlchecker.cost import cost_scope, get_cost_ledger, get_cost_report, append_run_history, load_run_history, estimate_run
+from urlchecker.logs import log_context, setup_logging, get_logging_stats
 import urllib3
 
-# 设置日志记录
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# 日志由程序入口调用 setup_logging() 配置 (见 urlchecker/config.py 的 LOGGING)
 logger = logging.getLogger(__name__)
 
 # --- (可选) 初步过滤的辅助函数 ---
@@ -93,150 +116,595 @@ class MiningPipeline:
             json_dir=scraper_cfg.get("json_dir"),
             headless=scraper_cfg.get("headless", True)
         )
+        # 传入 OpenReview 页面时的流式抓取：发现论文 -> 下载 -> 提取 -> 检查 各阶段重叠进行
+        ingest_cfg = scraper_cfg.get("ingest") or {}
+        self.download_workers = max(1, int(ingest_cfg.get("download_workers", 8)))
+        self.save_pdfs = bool(ingest_cfg.get("save_pdfs", False))
+        self._ingest_stats: Dict[str, int] = {}
+
+        # 启用链接解析时，镜像替换推迟到解析出最终 URL 之后 (见 urlchecker/resolver.py)
+        self.resolver = get_url_resolver(parser_cfg.get("replacements", None))
 
-        # 提取器初始化保持不变
         self.extractor = PdfLinkExtractor(
             pdf_root_dir=scraper_cfg.get("pdf_dir"), 
             output_file=parser_cfg.get("output_path"),
             flatten=parser_cfg.get("flatten", True),
             skip_domains=parser_cfg.get("skip_domains",None), # 获取 skip_domains 用于初步过滤
-            replacements=parser_cfg.get("replacements",None)
+            replacements=None if self.resolver is not None else parser_cfg.get("replacements",None),
+            engine=parser_cfg.get("engine", "full")
         )
         # 保存 skip_domains 列表以供后续使用
         self.skip_domains = self.extractor.skip_domains
 
-    # 将 run 方法改为异步
-    async def run(self, urls: list):
-        start_time = time.time()
-        
-        final_output_data = [] # 用于存储最终的 [{paper_name: ..., links: [{url:..., thought:...}]}]
+        # 同时运行的 Agent 检查数 (每个检查占用一个浏览器)；LLM 请求的并发由 urlchecker 自适应控制
+        self.max_concurrent_checks = max(1, int(self.agent_cfg.get("max_concurrent_checks", 1)))
+        self._check_semaphore: Optional[asyncio.Semaphore] = None
+        # Agent 检查后端：local 在本进程运行；remote 调用常驻分类服务 (python -m urlchecker.service)
+        backend_cfg = self.agent_cfg.get("backend") or {}
+        self.remote_classifier: Optional[RemoteClassifier] = None
+        if backend_cfg.get("type", "local") == "remote":
+            self.remote_classifier = RemoteClassifier(
+                backend_cfg.get("address", "http://127.0.0.1:8765"), deadline=backend_cfg.get("deadline"))
+        # 是否先用静态页面摘要批量分类 (一次 LLM 请求判断多个 URL)
+        self.batch_classify = bool(self.agent_cfg.get("batch_classify", False))
+        # 按响应头识别直接下载的文件 (见 urlchecker/sniff.py)
+        self.sniff_content = bool(self.agent_cfg.get("sniff_content", True))
+        # 同时处理的论文数；不同论文引用同一 URL 时，在途检查会被合并
+        self.max_concurrent_papers = max(1, int(self.agent_cfg.get("max_concurrent_papers", 4)))
+        self._paper_semaphore: Optional[asyncio.Semaphore] = None
+        # 运行预算 (墙钟秒数 / LLM 请求数 / token 数 / 费用，null 表示不限)；Agent 检查按优先级从高到低进行
+        budget_cfg = self.agent_cfg.get("budget") or {}
+        self.max_run_seconds = budget_cfg.get("max_seconds")
+        self.max_llm_calls = budget_cfg.get("max_llm_calls")
+        self.max_tokens = budget_cfg.get("max_tokens")
+        self.max_spend_usd = budget_cfg.get("max_spend_usd")
+        self.downgrade_at = budget_cfg.get("downgrade_at")
+        self.downgrade_model = budget_cfg.get("downgrade_model")
+        self._candidate_count = 0
+        self._budget: Optional[RunBudget] = None
+        self._work_queue: Optional[PriorityWorkQueue] = None
+        self._work_available: Optional[asyncio.Event] = None
+        self._producers_done = False
+        self._budget_stop_reason: Optional[str] = None
+        self._paper_results: list = []
+        # 分层截止时间 (秒，null 表示不限)：整次运行沿用 budget.max_seconds，另可限制单篇论文和单个 URL；
+        # 到期时进行中的检查被中断并记为超时，而不只是不再开始新的检查
+        deadline_cfg = self.agent_cfg.get("deadlines") or {}
+        self.paper_seconds = deadline_cfg.get("paper_seconds")
+        self.url_seconds = deadline_cfg.get("url_seconds")
+        self._run_deadline = Deadline()
+        self._paper_deadlines: Dict[int, Deadline] = {}
+        self._latency = LatencyRecorder()
+        # URL 预筛模型 (在 run 开始时用判定历史和人工标注训练)
+        self.prescreener = None
+        # 预热 (与 PDF 解析并行) 和首个判定的时间
+        self._warm = None
+        self._run_started: Optional[float] = None
+        self._first_verdict_after: Optional[float] = None
 
-        # 步骤1: (可选) 抓取 PDF (当前默认不执行此步骤)
-        # logger.info("[Pipeline] 开始抓取 PDF")
-        # self.scraper.run(urls) 
+    async def _check_url_with_agent(self, paper_name: str, url: str,
+                                    deadline: Optional[Deadline] = None) -> Tuple[str, str, Optional[str]]:
+        """在并发上限内调用 Agent 检查单个 URL (不超过 deadline)，返回 (url, status, thought)。"""
+        if self._check_semaphore is None:
+            self._check_semaphore = asyncio.Semaphore(self.max_concurrent_checks)
+        async with self._check_semaphore:
+            logger.info(f"[Pipeline] 论文 '{paper_name}' 正在检查 URL: {url}")
+            try:
+                # check_url_is_dataset 现在返回 (status, thought)
+                if self.remote_classifier is not None:
+                    status, thought = await self.remote_classifier.check(url, deadline.remaining() if deadline else None)
+                else:
+                    status, thought = await check_url_is_dataset(url, deadline)
+            except Exception as e:
+                logger.error(f"[Agent检查严重错误] URL: {url} 在调用 check_url_is_dataset 时发生异常: {e}")
+                return url, f"Error: {e}", None
 
-        # 步骤2: 从 PDF 提取论文名和链接
-        logger.info("[Pipeline] 开始从 PDF 提取论文名和链接...")
-        # self.extractor.run() 现在返回 List[Dict[str, Any]]
-        # 每个字典是 {'paper_name': '...', 'extracted_links': ['url1', 'url2', ...]}
-        papers_with_extracted_links = self.extractor.run()
-        
-        if not papers_with_extracted_links:
-            logger.info("[Pipeline] 未从 PDF 提取到任何论文或链接，流程结束。")
+        if status == "YES":
+            logger.info(f"[Agent确认✅] URL: {url} -> YES. Thought: {thought}")
+        elif status == "NO":
+            logger.info(f"[Agent确认❌] URL: {url} -> NO.")
+        elif status == STATUS_TIMEOUT:
+            logger.warning(f"[Agent检查超时⏱] URL: {url} 超过{deadline.name if deadline else ''}截止时间，未得出判定。")
+        else: # 处理 Error 情况
+            logger.warning(f"[Agent检查警告/错误] URL: {url}, 返回状态: {status}")
+        return url, status, thought
+
+    async def _discover_papers(self, urls: list, paper_links: asyncio.Queue) -> None:
+        """逐页从 OpenReview API 拉取论文链接放入下载队列；API 失败时回退到 Selenium。"""
+        for page_url in urls:
+            subdir = self.scraper.subdir_for(page_url)
+            if self.save_pdfs:
+                os.makedirs(os.path.join(self.scraper.pdf_dir, subdir), exist_ok=True)
+            discovered = []
+            seen = set()
+            try:
+                links_iter = self.scraper.iter_paper_links_via_api(page_url)
+                while True:
+                    # 每次取一个链接；请求下一页 API 时阻塞在线程里，不影响下载和检查
+                    link = await asyncio.to_thread(next, links_iter, None)
+                    if link is None:
+                        break
+                    if link not in seen:
+                        seen.add(link)
+                        discovered.append(link)
+                        await paper_links.put((link, subdir))
+                if not discovered:
+                    raise ValueError("API 返回空列表")
+            except Exception as api_err:
+                if discovered:
+                    logger.warning(f"[抓取] {page_url} 的 API 分页中断 ({api_err})，保留已发现的 {len(discovered)} 篇论文。")
+                else:
+                    logger.warning(f"[抓取] {page_url} 的 API 方法失败：{api_err}，改用 Selenium 动态爬虫")
+                    try:
+                        discovered = await asyncio.to_thread(self.scraper.get_paper_links_via_selenium, page_url)
+                    except Exception as sel_err:
+                        logger.error(f"[抓取] Selenium 方法也失败：{sel_err}，跳过该页面")
+                        continue
+                    for link in discovered:
+                        await paper_links.put((link, subdir))
+            self._ingest_stats["discovered"] += len(discovered)
+            logger.info(f"[抓取] {page_url}: 发现 {len(discovered)} 篇论文。")
+            # 链接列表仍保存一份，便于之后用 scraper.py 单独重跑
+            save_json(os.path.join(self.scraper.json_dir, f"{subdir}.json"), discovered)
+
+    async def _download_worker(self, paper_links: asyncio.Queue) -> None:
+        """下载池中的一个 worker：下载 PDF -> 从内存提取链接 -> 进入论文预处理与 Agent 检查队列。"""
+        while True:
+            item = await paper_links.get()
+            if item is None:
+                return
+            link, subdir = item
+            # 按发现顺序预留结果位置，最终输出顺序与抓取顺序一致
+            paper_index = len(self._paper_results)
+            self._paper_results.append({"paper_name": link, "venue": subdir, "confirmed": []})
+            try:
+                paper_id, pdf_bytes = await asyncio.to_thread(self.scraper.download_pdf_bytes, link)
+            except Exception as e:
+                self._ingest_stats["download_failed"] += 1
+                logger.warning(f"[抓取] 下载失败 {link}：{e}")
+                continue
+            self._ingest_stats["downloaded"] += 1
+            # 单篇论文出错不能让 worker 退出：worker 全部退出后发现协程会在有界队列上永远等待
+            try:
+                await self._ingest_paper(paper_index, paper_id, pdf_bytes, subdir)
+            except Exception as e:
+                self._ingest_stats["failed"] += 1
+                logger.exception(f"[抓取] 处理论文出错 {link}：{e}")
+
+    async def _ingest_paper(self, paper_index: int, paper_id: str, pdf_bytes: bytes, subdir: str) -> None:
+        if self.save_pdfs:
+            await asyncio.to_thread(self.scraper.save_pdf_bytes, paper_id, pdf_bytes, subdir)
+        paper_data = await asyncio.to_thread(self.extractor.extract_paper_bytes, pdf_bytes, f"{paper_id}.pdf")
+        if paper_data is None:
             return
+        self._ingest_stats["with_links"] += 1
+        self._paper_results[paper_index]["paper_name"] = paper_data["paper_name"]
+        paper_data["venue"] = subdir
+        if self._warm is not None:
+            self._warm.resolve_hosts(paper_data["extracted_links"])
+        await self._process_paper(paper_index, paper_data)
 
-        logger.info(f"[Pipeline] 从 PDF 共提取到 {len(papers_with_extracted_links)} 篇论文的链接信息。")
+    async def _ingest(self, urls: list) -> None:
+        """流式抓取：发现、下载、解析与 Agent 检查同时进行。"""
+        self._ingest_stats = {"discovered": 0, "downloaded": 0, "download_failed": 0, "with_links": 0, "failed": 0}
+        # 有界队列：下载跟不上时暂停发现，避免一次性堆积整届会议的链接
+        paper_links: asyncio.Queue = asyncio.Queue(maxsize=self.download_workers * 4)
+        downloaders = [asyncio.create_task(self._download_worker(paper_links)) for _ in range(self.download_workers)]
+        try:
+            await self._discover_papers(urls, paper_links)
+        except asyncio.CancelledError:
+            for task in downloaders:
+                task.cancel()
+            await asyncio.gather(*downloaders, return_exceptions=True)
+            raise
+        finally:
+            # 已经退出的 worker 不会再取队列，不给它们放结束标记，否则队列满时会一直等下去
+            for task in downloaders:
+                if not task.done():
+                    await paper_links.put(None)
+            await asyncio.gather(*downloaders)
+        logger.info(f"[抓取] 流式抓取统计: {self._ingest_stats}")
 
-        # 遍历每篇论文及其提取的链接
-        for paper_data in papers_with_extracted_links:
-            paper_name = paper_data.get("paper_name", "未知论文")
-            extracted_urls_for_paper = paper_data.get("extracted_links", [])
+    async def _process_paper(self, paper_index: int, paper_data: Dict[str, Any]) -> None:
+        """预处理单篇论文：链接解析 -> 黑/白名单 -> 连通性检查，候选 URL 放入全局优先级队列。"""
+        async with self._paper_semaphore:
+            # 论文的截止时间从开始预处理算起，覆盖它的全部 Agent 检查
+            self._paper_deadlines[paper_index] = self._run_deadline.child(self.paper_seconds, "paper")
+            # 批量分类等预处理阶段的 LLM 请求记到这篇论文上
+            with cost_scope(venue=paper_data.get("venue"), paper=paper_data.get("paper_name")), \
+                    log_context(paper=paper_data.get("paper_name")):
+                await self._process_paper_links(paper_index, paper_data)
 
-            if not extracted_urls_for_paper:
-                logger.info(f"[Pipeline] 论文 '{paper_name}' 未提取到链接，跳过。")
+    async def _resolve_links(self, paper_name: str, urls: list) -> list:
+        """解析短链接/重定向并做镜像替换，按解析后的规范化目标去重 (保持原顺序)。"""
+        resolved = await asyncio.gather(*(asyncio.to_thread(self.resolver.resolve_sync, url) for url in urls))
+        unique_urls = []
+        seen = set()
+        for url in resolved:
+            # 短链接可能指向 skip_domains 中的站点 (论文 PDF 等)，解析后再过滤一次
+            if is_blacklisted(url, self.skip_domains or []):
                 continue
+            key = canonicalize_url(url)
+            if key not in seen:
+                seen.add(key)
+                unique_urls.append(url)
+        if len(unique_urls) < len(urls):
+            logger.info(f"[Pipeline] 论文 '{paper_name}': 链接解析后去重/过滤掉 {len(urls) - len(unique_urls)} 个链接。")
+        return unique_urls
+
+    async def _process_paper_links(self, paper_index: int, paper_data: Dict[str, Any]) -> None:
+        paper_name = paper_data.get("paper_name", "未知论文")
+        link_order, urls_to_agent, probe_by_url = await self._prepare_paper_links(
+            paper_name, paper_data.get("extracted_links", []), self._paper_results[paper_index]["confirmed"])
+
+        # 剩余链接按 "产出 / 成本" 分数放入全局优先级队列，由 _agent_worker 按分数从高到低检查
+        for url in urls_to_agent:
+            probe = probe_by_url.get(url)
+            score = score_url(url, latency=probe.latency if probe else 0.0, cached=bool(probe and probe.cached))
+            self._work_queue.push(score, (paper_index, link_order[url], url))
+        if urls_to_agent:
+            logger.info(f"[Pipeline] 论文 '{paper_name}': {len(urls_to_agent)} 个链接进入 Agent 检查队列 (队列长度 {len(self._work_queue)})。")
+            self._work_available.set()
+
+    async def _prepare_paper_links(self, paper_name: str, extracted_urls_for_paper: list,
+                                   current_paper_confirmed_links: list) -> Tuple[Dict[str, int], list, Dict[str, Any]]:
+        """
+        Agent 检查之前的全部步骤：链接解析 -> 黑/白名单 -> 预筛 -> 连通性检查 -> (可选) 批量分类。
+        白名单和批量分类确认的链接以 (链接在论文中的序号, link_info) 追加到 current_paper_confirmed_links，
+        返回 (链接序号表, 需要 Agent 检查的 URL 列表, 连通性检查结果)。
+        """
+        if not extracted_urls_for_paper:
+            logger.info(f"[Pipeline] 论文 '{paper_name}' 未提取到链接，跳过。")
+            return {}, [], {}
+
+        logger.info(f"[Pipeline] 开始处理论文: '{paper_name}'，包含 {len(extracted_urls_for_paper)} 个初步链接。")
+
+        if self.resolver is not None:
+            extracted_urls_for_paper = await self._resolve_links(paper_name, extracted_urls_for_paper)
+
+
+        # 步骤3: 初步过滤链接 (黑/白名单)
+        candidate_urls_for_paper = []
+        blacklisted_count = 0
+        whitelisted_count = 0
 
-            logger.info(f"[Pipeline] 开始处理论文: '{paper_name}'，包含 {len(extracted_urls_for_paper)} 个初步链接。")
+        link_order = {url: i for i, url in enumerate(extracted_urls_for_paper)}
+        for url in extracted_urls_for_paper:
+            if is_blacklisted(url, self.agent_cfg.get("blacklist", [])):
+                blacklisted_count += 1
+                continue
             
-            current_paper_confirmed_links = [] # 存储当前论文确认的链接及其 thought
+            # 白名单逻辑：如果命中白名单，直接认为是有效链接，但目前没有 thought
+            # 为了保持格式统一，可以给白名单链接一个默认的 thought
+            if is_whitelisted(url, self.agent_cfg.get("whitelist", [])):
+                whitelisted_count += 1
+                current_paper_confirmed_links.append((link_order[url], {"url": url, "thought": "通过白名单规则自动确认"}))
+            else:
+                candidate_urls_for_paper.append(url)
+        self._candidate_count += len(candidate_urls_for_paper)
 
-            # 步骤3: 初步过滤链接 (黑/白名单)
-            candidate_urls_for_paper = []
-            blacklisted_count = 0
-            whitelisted_count = 0
+        logger.info(
+            f"[Pipeline] 论文 '{paper_name}': 黑名单跳过 {blacklisted_count} 个；"
+            f"白名单直接纳入 {whitelisted_count} 个；"
+            f"{len(candidate_urls_for_paper)} 个待进一步判断。"
+        )
 
-            for url in extracted_urls_for_paper:
-                if is_blacklisted(url, self.agent_cfg.get("blacklist", [])):
-                    blacklisted_count += 1
-                    continue
-                
-                # 白名单逻辑：如果命中白名单，直接认为是有效链接，但目前没有 thought
-                # 为了保持格式统一，可以给白名单链接一个默认的 thought
-                if is_whitelisted(url, self.agent_cfg.get("whitelist", [])):
-                    whitelisted_count += 1
-                    current_paper_confirmed_links.append({"url": url, "thought": "通过白名单规则自动确认"})
+        if not candidate_urls_for_paper and not whitelisted_count:
+            logger.info(f"[Pipeline] 论文 '{paper_name}' 初步过滤后无候选链接，且无白名单命中。")
+            # 如果这篇论文没有任何确认的链接（包括白名单），则不添加到最终输出
+            # continue # 如果希望即使论文没有链接也输出空的 paper_name 条目，则注释掉此行
+        
+        # 步骤3.5: 预筛模型一次性给全部候选链接打分，高置信度的负例不再检查
+        if candidate_urls_for_paper and self.prescreener is not None:
+            candidate_urls_for_paper, prescreen_skipped = self.prescreener.screen(candidate_urls_for_paper)
+            for url, prob in prescreen_skipped:
+                logger.info(f"[预筛] 跳过 URL: {url} (正例概率 {prob:.3f})")
+
+        # 步骤4: 连通性检查 (针对候选链接)
+        urls_to_agent = []
+        probe_by_url = {}
+        if candidate_urls_for_paper: # 仅当有候选链接时才进行连通性检查
+            logger.info(f"[Pipeline] 论文 '{paper_name}': 开始对 {len(candidate_urls_for_paper)} 个候选链接进行连通性检查...")
+            # 同一 URL 的并发探测会被合并 (见 urlchecker/coalesce.py)
+            probe_results = await asyncio.gather(*(probe_url(url, timeout=10) for url in candidate_urls_for_paper))
+            cached_count = sum(1 for result in probe_results if result.cached)
+            for result in probe_results:
+                probe_by_url[result.url] = result
+                if result.reachable and self.sniff_content and (result.status_code or 0) < 400:
+                    content = sniff_content(result.final_url or result.url, result.content_type,
+                                            result.content_length, result.content_disposition)
+                    if content.kind == KIND_DATA:
+                        logger.info(f"[内容嗅探] 直接下载的数据文件 ({content.describe()})，确认: {result.url}")
+                        current_paper_confirmed_links.append((link_order[result.url], {
+                            "url": result.url,
+                            "thought": f"链接直接指向数据文件 ({content.describe()})",
+                            "download": {"format": content.format, "content_type": content.content_type,
+                                         "content_length": content.content_length, "filename": content.filename},
+                        }))
+                        self._record_verdict(result.url, "YES", source="sniff")
+                    elif content.kind == KIND_SKIP:
+                        logger.info(f"[内容嗅探] 非数据的二进制内容 ({content.describe()})，丢弃: {result.url}")
+                    else:
+                        urls_to_agent.append(result.url)
+                elif result.reachable:
+                    urls_to_agent.append(result.url) # 更宽松的可连接性检测条件：任何状态码都算可连接
+                elif result.error_class in ("Timeout", "ReadTimeout", "ConnectTimeout"):
+                    logger.warning(f"请求超时 (Timeout)，丢弃: {result.url}")
                 else:
-                    candidate_urls_for_paper.append(url)
-            
-            logger.info(
-                f"[Pipeline] 论文 '{paper_name}': 黑名单跳过 {blacklisted_count} 个；"
-                f"白名单直接纳入 {whitelisted_count} 个；"
-                f"{len(candidate_urls_for_paper)} 个待进一步判断。"
-            )
-
-            if not candidate_urls_for_paper and not whitelisted_count:
-                logger.info(f"[Pipeline] 论文 '{paper_name}' 初步过滤后无候选链接，且无白名单命中。")
-                # 如果这篇论文没有任何确认的链接（包括白名单），则不添加到最终输出
-                # continue # 如果希望即使论文没有链接也输出空的 paper_name 条目，则注释掉此行
-            
-            # 步骤4: 连通性检查 (针对候选链接)
-            urls_to_agent = []
-            if candidate_urls_for_paper: # 仅当有候选链接时才进行连通性检查
-                logger.info(f"[Pipeline] 论文 '{paper_name}': 开始对 {len(candidate_urls_for_paper)} 个候选链接进行连通性检查...")
-                for url in candidate_urls_for_paper:
-                    logger.info(f"正在验证连通性: {url}")
-                    try:
-                        # 增加 headers 模拟浏览器，减少被拒的可能性
-                        headers = {
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                        }
-                        response = requests.get(url, timeout=10, headers=headers, allow_redirects=True)
-                        # if response.status_code == 200:
-                        urls_to_agent.append(url) # 更宽松的可连接性检测条件
-                        # else:
-                        #     logger.warning(f"请求非200状态 ({response.status_code})，丢弃: {url}")
-                    except requests.exceptions.Timeout:
-                        logger.warning(f"请求超时 (Timeout)，丢弃: {url}")
-                    except requests.exceptions.RequestException as e:
-                        logger.warning(f"请求异常 ({type(e).__name__}) 丢弃: {url}；异常: {e}")
-                
-                logger.info(f"[Pipeline] 论文 '{paper_name}': 连通性检查完成，{len(urls_to_agent)} 个 URL 供 Agent 进一步判断。")
+                    logger.warning(f"请求异常 ({result.error_class}) 丢弃: {result.url}；异常: {result.error}")
 
-            # 步骤5: 调用 urlchecker Agent 进行检查 (针对通过连通性检查的链接)
-            if urls_to_agent:
-                logger.info(f"[Pipeline] 论文 '{paper_name}': 开始顺序调用 Agent 检查 {len(urls_to_agent)} 个链接...")
-                
-                for url in urls_to_agent:
-                    logger.info(f"[Pipeline] 论文 '{paper_name}' 正在检查 URL: {url}")
-                    try:
-                        # check_url_is_dataset 现在返回 (status, thought)
-                        status, thought = await check_url_is_dataset(url)
-                        
-                        if status == "YES":
-                            logger.info(f"[Agent确认✅] URL: {url} -> YES. Thought: {thought}")
-                            current_paper_confirmed_links.append({"url": url, "thought": thought if thought else "Agent确认，但未提供明确思考过程"})
-                        elif status == "NO":
-                            logger.info(f"[Agent确认❌] URL: {url} -> NO.")
-                        else: # 处理 Error 情况
-                            logger.warning(f"[Agent检查警告/错误] URL: {url}, 返回状态: {status}")
-                            
-                    except Exception as e:
-                        logger.error(f"[Agent检查严重错误] URL: {url} 在调用 check_url_is_dataset 时发生异常: {e}")
-                    # await asyncio.sleep(1) # 可选的延时
-            
-            # 步骤6: 处理当前论文的结果并准备添加到最终输出
-            if current_paper_confirmed_links:
-                # 进行域名反向替换
-                restored_links_for_paper = []
-                reverse_replacements = self.agent_cfg.get("reverse_replacements",{})
-                for link_info in current_paper_confirmed_links:
-                    restored_url = link_info["url"]
-                    for src, tgt in reverse_replacements.items():
-                        if src in restored_url:
-                            restored_url = restored_url.replace(src, tgt)
-                    restored_links_for_paper.append({"url": restored_url, "thought": link_info["thought"]})
-                
-                final_output_data.append({
-                    "paper_name": paper_name,
-                    "links": restored_links_for_paper
-                })
-                logger.info(f"[Pipeline] 论文 '{paper_name}' 处理完成，找到 {len(restored_links_for_paper)} 个确认的链接。")
+            logger.info(f"[Pipeline] 论文 '{paper_name}': 连通性检查完成 (缓存命中 {cached_count} 个)，{len(urls_to_agent)} 个 URL 供 Agent 进一步判断。")
+
+        # 步骤5: 调用 urlchecker Agent 进行检查 (针对通过连通性检查的链接)
+        if urls_to_agent and self.batch_classify and (self._budget is None or not self._budget.exhausted()):
+            # 先用静态摘要批量分类，判断不了的再交给 Agent
+            batch_results = await check_urls_batch(urls_to_agent, recheck=False)
+            for url, (status, thought) in batch_results.items():
+                logger.info(f"[批量分类] URL: {url} -> {status}.")
+                self._record_verdict(url, status, source="batch")
+                if status == "YES":
+                    current_paper_confirmed_links.append((link_order[url], {"url": url, "thought": thought if thought else "批量分类确认，但未提供明确思考过程"}))
+            urls_to_agent = [url for url in urls_to_agent if url not in batch_results]
+
+        return link_order, urls_to_agent, probe_by_url
+
+    def _record_verdict(self, url: str, status: str, source: str) -> None:
+        """把 YES/NO 判定写入判定历史，供下次运行训练预筛模型。"""
+        if self._first_verdict_after is None and self._run_started is not None:
+            self._first_verdict_after = time.monotonic() - self._run_started
+            logger.info(f"[Pipeline] 首个判定用时 {self._first_verdict_after:.2f} 秒 ({source}: {url} -> {status})。")
+        history = get_verdict_history()
+        if history is not None:
+            history.append(url, status, source=source)
+        if self.prescreener is not None:
+            self.prescreener.record_verdict(url, status)
+
+    async def _agent_worker(self) -> None:
+        """从优先级队列中取分数最高的 URL 调用 Agent 检查，直到队列清空或预算用完。"""
+        while True:
+            if not len(self._work_queue):
+                if self._producers_done:
+                    return
+                self._work_available.clear()
+                await self._work_available.wait()
+                continue
+            reason = self._budget_stop_reason or self._budget.exhausted()
+            if reason:
+                if self._budget_stop_reason is None:
+                    self._budget_stop_reason = reason
+                    logger.warning(f"[Pipeline] {reason}，停止开始新的 Agent 检查。")
+                return
+
+            self._budget.check_downgrade()
+
+            score, (paper_index, order, url) = self._work_queue.pop()
+            paper_name = self._paper_results[paper_index]["paper_name"]
+            logger.debug(f"[Pipeline] 优先级 {score:.3f}: {url}")
+            deadline = self._paper_deadlines.get(paper_index, self._run_deadline).child(self.url_seconds, "url")
+            if deadline.expired():
+                logger.warning(f"[Pipeline] 论文 '{paper_name}' 已超过{deadline.name}截止时间，跳过: {url}")
+                self._latency.record(url, 0.0, f"timeout ({deadline.name}, 未开始)")
+                continue
+            started = time.monotonic()
+            with cost_scope(venue=self._paper_results[paper_index].get("venue"), paper=paper_name, url=url), \
+                    log_context(paper=paper_name):
+                url, status, thought = await self._check_url_with_agent(paper_name, url, deadline)
+            elapsed = time.monotonic() - started
+            self._budget.record_check(elapsed)
+            if status == STATUS_TIMEOUT:
+                self._latency.record(url, elapsed, f"timeout ({deadline.name})")
+            else:
+                self._latency.record(url, elapsed, status.lower() if status in ("YES", "NO") else "error")
+            self._record_verdict(url, status, source="agent")
+            if status == "YES":
+                self._paper_results[paper_index]["confirmed"].append(
+                    (order, {"url": url, "thought": thought if thought else "Agent确认，但未提供明确思考过程"}))
+
+    def finalize_paper(self, paper_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        步骤6: 整理单篇论文的结果并准备添加到最终输出 (没有确认链接时为 None)。
+        paper_result 为 {"paper_name": ..., "confirmed": [(链接序号, {"url", "thought"}), ...]}。
+        """
+        paper_name = paper_result["paper_name"]
+        current_paper_confirmed_links = [info for _, info in sorted(paper_result["confirmed"], key=lambda item: item[0])]
+        if current_paper_confirmed_links:
+            # 进行域名反向替换
+            restored_links_for_paper = []
+            reverse_replacements = self.agent_cfg.get("reverse_replacements",{})
+            for link_info in current_paper_confirmed_links:
+                restored_url = link_info["url"]
+                for src, tgt in reverse_replacements.items():
+                    if src in restored_url:
+                        restored_url = restored_url.replace(src, tgt)
+                restored_links_for_paper.append(dict(link_info, url=restored_url))
+
+            logger.info(f"[Pipeline] 论文 '{paper_name}' 处理完成，找到 {len(restored_links_for_paper)} 个确认的链接。")
+            return {
+                "paper_name": paper_name,
+                "links": restored_links_for_paper
+            }
+        logger.info(f"[Pipeline] 论文 '{paper_name}' 未找到任何确认的数据集/代码链接。")
+        return None
+
+    def _report_run_stats(self) -> None:
+        """在运行结束时输出各组件的统计指标。"""
+        limiter = get_llm_limiter()
+        if limiter is not None:
+            logger.info(f"[Pipeline] LLM 自适应并发统计: {limiter.stats()}")
+        router_stats = get_router_stats()
+        if router_stats is not None:
+            for endpoint_name, endpoint_stats in router_stats.items():
+                logger.info(f"[Pipeline] LLM 端点 '{endpoint_name}' 统计: {endpoint_stats}")
+        stream_stats = get_stream_stats()
+        if stream_stats["streamed_calls"]:
+            logger.info(f"[Pipeline] LLM 流式输出统计: {stream_stats}")
+        prompt_cache_stats = get_prompt_cache_stats()
+        if prompt_cache_stats["requests"]:
+            logger.info(f"[Pipeline] 消息布局与提示缓存统计: {prompt_cache_stats}")
+        batch_stats = get_batch_stats()
+        if batch_stats["batches"]:
+            logger.info(f"[Pipeline] 批量分类统计: {batch_stats}")
+        for coalescer_name, coalescer_stats in get_coalescing_stats().items():
+            if coalescer_stats["calls"]:
+                logger.info(f"[Pipeline] 请求合并统计 ({coalescer_name}): 避免了 {coalescer_stats['coalesced']} 次重复检查 {coalescer_stats}")
+        host_stats = get_host_scheduler_stats()
+        if host_stats:
+            for host, stats in sorted(host_stats.items(), key=lambda item: -item[1]["requests"]):
+                logger.info(f"[Pipeline] 主机调度统计 '{host}': {stats}")
+        prescreen_stats = get_prescreen_stats()
+        if prescreen_stats is not None:
+            logger.info(f"[Pipeline] URL 预筛统计 (节省 {prescreen_stats['agent_calls_saved']} 次 Agent 检查): {prescreen_stats}")
+        fingerprint_stats = get_fingerprint_stats()
+        if fingerprint_stats is not None and fingerprint_stats["lookups"]:
+            logger.info(f"[Pipeline] 页面指纹判定复用统计: {fingerprint_stats}")
+        evidence_stats = get_evidence_stats()
+        if evidence_stats["states"]:
+            logger.info(f"[Pipeline] 证据提前判定统计 (节省 {evidence_stats['llm_calls_saved']} 次 LLM 请求): {evidence_stats}")
+        sniff_stats = get_sniff_stats()
+        if sum(sniff_stats[kind] for kind in ("data", "skip", "page")):
+            logger.info(f"[Pipeline] 内容嗅探统计: {sniff_stats}")
+        prefetch_stats = get_prefetch_stats()
+        if prefetch_stats["started"]:
+            logger.info(f"[Pipeline] 推测性预加载统计: {prefetch_stats}")
+        resolver_stats = get_resolver_stats()
+        if resolver_stats is not None:
+            logger.info(f"[Pipeline] 链接解析统计: {resolver_stats}")
+        browser_pool_stats = get_browser_pool_stats()
+        if browser_pool_stats is not None:
+            logger.info(f"[Pipeline] 浏览器池统计: {browser_pool_stats}")
+        http_cache_stats = get_http_cache_stats()
+        if http_cache_stats is not None and (http_cache_stats["hits"] or http_cache_stats["misses"]):
+            logger.info(f"[Pipeline] 浏览器 HTTP 缓存统计 (节省 {http_cache_stats['bytes_saved'] / 1024 / 1024:.1f} MB): {http_cache_stats}")
+        reachability_stats = get_reachability_stats()
+        if reachability_stats is not None:
+            logger.info(f"[Pipeline] 可达性缓存统计: {reachability_stats}")
+        latency_report = self._latency.report()
+        if latency_report is not None:
+            logger.info(f"[Pipeline] Agent 检查耗时分布 (秒): {latency_report}")
+        cost_report = get_cost_report()
+        if cost_report["calls"]:
+            logger.info(f"[Pipeline] LLM 用量与费用 (${cost_report['spend_usd']:.4f}): {cost_report}")
+        logger.info(f"[Pipeline] 日志统计: {get_logging_stats()}")
+
+    def estimate(self, pdf_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        试运行：只解析 PDF 并按黑/白名单统计候选链接 (不联网、不调用 LLM)，
+        再按历史运行的平均值预估 Agent 检查数、LLM 请求数、token、费用和墙钟时间。
+        """
+        extractor = self.extractor
+        if pdf_dir:
+            extractor = PdfLinkExtractor(pdf_root_dir=pdf_dir, output_file=None, skip_domains=self.skip_domains,
+                                         replacements=self.extractor.replacements, engine=self.extractor.engine)
+        papers = extractor.run()
+        candidates = sum(
+            1 for paper in papers for url in paper["extracted_links"]
+            if not is_blacklisted(url, self.agent_cfg.get("blacklist", []))
+            and not is_whitelisted(url, self.agent_cfg.get("whitelist", []))
+        )
+        estimate = estimate_run(len(papers), candidates, load_run_history())
+        logger.info(f"[Pipeline] 试运行预估: {estimate}")
+        return estimate
+
+    # 将 run 方法改为异步
+    async def run(self, urls: list):
+        start_time = time.time()
+        self._run_started = time.monotonic()
+        self._first_verdict_after = None
+        # 预热 (浏览器池、LLM 连接与凭据、DNS) 与 PDF 解析/抓取同时进行；远程后端自己负责预热
+        self._warm = start_warm_up() if self.remote_classifier is None else None
+        try:
+            await self._run(urls, start_time)
+        finally:
+            if self._warm is not None:
+                logger.info(f"[Pipeline] 预热报告: {await self._warm.wait()}")
+            await close_browser_pool()
+
+    async def _run(self, urls: list, start_time: float):
+        final_output_data = [] # 用于存储最终的 [{paper_name: ..., links: [{url:..., thought:...}]}]
+
+        # 步骤1+2: 传入 OpenReview 页面时流式抓取 (见 _ingest)，论文边下载边提取、边检查；
+        # 否则从 pdf_dir 中已有的 PDF 提取论文名和链接
+        papers_with_extracted_links = []
+        if urls:
+            logger.info(f"[Pipeline] 开始流式抓取 {len(urls)} 个 OpenReview 页面 (下载并发 {self.download_workers})...")
+        else:
+            logger.info("[Pipeline] 开始从 PDF 提取论文名和链接...")
+            # self.extractor.run() 现在返回 List[Dict[str, Any]]
+            # 每个字典是 {'paper_name': '...', 'extracted_links': ['url1', 'url2', ...]}
+            # 在线程中解析，事件循环同时运行预热任务；每解析完一篇就预解析其链接的主机
+            on_paper = None
+            if self._warm is not None:
+                loop = asyncio.get_running_loop()
+                on_paper = lambda paper: loop.call_soon_threadsafe(self._warm.resolve_hosts, paper["extracted_links"])
+            papers_with_extracted_links = await asyncio.to_thread(self.extractor.run, on_paper)
+
+            if not papers_with_extracted_links:
+                logger.info("[Pipeline] 未从 PDF 提取到任何论文或链接，流程结束。")
+                return
+
+            logger.info(f"[Pipeline] 从 PDF 共提取到 {len(papers_with_extracted_links)} 篇论文的链接信息。")
+
+        if self._warm is not None:
+            await self._warm.wait_llm()
+            if self._warm.credentials_invalid():
+                logger.error("[Pipeline] 所有 LLM 端点的凭据都无效，停止运行 (请检查 .env 中的 API_KEY)。")
+                return
+
+        # 并发预处理多篇论文 (上限 max_concurrent_papers)，同时由 max_concurrent_checks 个 worker
+        # 按优先级消费 Agent 检查队列；结果保持原论文顺序
+        self._paper_semaphore = asyncio.Semaphore(self.max_concurrent_papers)
+        self.prescreener = build_prescreener(self.agent_cfg.get("reverse_replacements", {}))
+        self._budget = RunBudget(self.max_run_seconds, self.max_llm_calls, self.max_tokens, self.max_spend_usd,
+                                 self.downgrade_at, self.downgrade_model)
+        self._candidate_count = 0
+        self._run_deadline = Deadline(None if self.max_run_seconds is None
+                                      else self._budget.started_at + self.max_run_seconds, "run")
+        self._paper_deadlines = {}
+        self._latency = LatencyRecorder()
+        self._work_queue = PriorityWorkQueue()
+        self._work_available = asyncio.Event()
+        self._producers_done = False
+        self._budget_stop_reason = None
+        self._paper_results = [
+            {"paper_name": paper_data.get("paper_name", "未知论文"), "venue": paper_data.get("venue"), "confirmed": []}
+            for paper_data in papers_with_extracted_links
+        ]
+        workers = [asyncio.create_task(self._agent_worker()) for _ in range(self.max_concurrent_checks)]
+        try:
+            if urls:
+                await self._ingest(urls)
             else:
-                logger.info(f"[Pipeline] 论文 '{paper_name}' 未找到任何确认的数据集/代码链接。")
+                await asyncio.gather(
+                    *(self._process_paper(i, paper_data) for i, paper_data in enumerate(papers_with_extracted_links))
+                )
+        finally:
+            self._producers_done = True
+            self._work_available.set()
+            await asyncio.gather(*workers)
+
+        unchecked = self._work_queue.drain()
+        if unchecked:
+            logger.warning(f"[Pipeline] {self._budget_stop_reason}：{len(unchecked)} 个候选链接未检查。优先级最高的几个: "
+                           f"{[url for _, _, url in unchecked[:5]]}")
+        budget_stats = self._budget.stats()
+        logger.info(f"[Pipeline] 运行预算使用情况: {budget_stats}")
+        # 记入运行历史，供之后的试运行 (estimate) 按平均值预估
+        usage = get_cost_ledger().snapshot()
+        append_run_history({
+            "papers": len(self._paper_results), "candidates": self._candidate_count,
+            "agent_checks": budget_stats["checks"], "llm_calls": budget_stats["llm_calls"],
+            "prompt_tokens": usage["prompt_tokens"] - self._budget.usage_at_start["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"] - self._budget.usage_at_start["completion_tokens"],
+            "spend_usd": budget_stats["spend_usd"], "wall_seconds": round(time.time() - start_time, 1),
+        })
+        if self._first_verdict_after is not None:
+            logger.info(f"[Pipeline] 首个判定用时 (time-to-first-verdict): {self._first_verdict_after:.2f} 秒。")
+        final_output_data = [entry for entry in map(self.finalize_paper, self._paper_results) if entry is not None]
 
         # 步骤7: 保存最终的 JSON 数据
         end_time = time.time()
         logger.info(f"[Pipeline] 所有论文处理完成。总耗时: {end_time - start_time:.2f} 秒。")
+        self._report_run_stats()
         
         if final_output_data:
             output_json_path = self.agent_cfg.get("final_json_name", "final_dataset_urls.json")
@@ -269,13 +737,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "urls",
         nargs="*",
-        default=[
-            "https://openreview.net/group?id=ICML.cc/2024/Conference#tab-accept-spotlight",
-            # "https://openreview.net/group?id=ICLR.cc/2025/Conference#tab-accept-oral",
-            # "https://openreview.net/group?id=ICLR.cc/2025/Conference#tab-accept-spotlight",
-            #"https://openreview.net/group?id=ICLR.cc/2025/Conference#tab-accept-poster"
-        ],
-        help="要抓取的 OpenReview 页面 URL 列表 (当前抓取功能未启用)"
+        default=[],
+        # 例如 "https://openreview.net/group?id=ICML.cc/2024/Conference#tab-accept-spotlight"
+        help="要流式抓取的 OpenReview 页面 URL 列表；不传时处理 pdf_dir 中已有的 PDF"
     )
             # more testcases
             # "https://openreview.net/group?id=ICLR.cc/2025/Conference#tab-accept-oral",
@@ -295,6 +759,7 @@ if __name__ == "__main__":
         help="YAML 配置文件路径"
     )
     args = parser.parse_args()
+    setup_logging()
 
     # 确保 urlchecker 的依赖和 Playwright 已安装
     # (urlchecker/main.py 中已有自动检查和尝试安装逻辑)
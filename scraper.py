@@ -3,6 +3,7 @@ import time
 import requests
 from urllib.parse import urlparse, parse_qs
 from typing_extensions import Tuple
+from typing import Iterator
 import json
 
 from selenium import webdriver
@@ -17,10 +18,14 @@ class OpenReviewScraper:
     BASE_URL = "https://openreview.net"
     PDF_URL_TMPL = BASE_URL + "/pdf?id={paper_id}"
 
-    def __init__(self, pdf_dir: str, json_dir: str, headless: bool = True):
+    def __init__(self, pdf_dir: str, json_dir: str, headless: bool = True, download_timeout: float = 60):
         self.pdf_dir = pdf_dir
         self.json_dir = json_dir
         self.headless = headless
+        self.download_timeout = download_timeout
+        # 复用连接 (下载池的多个线程共享连接池)
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
         os.makedirs(self.pdf_dir, exist_ok=True)
         os.makedirs(self.json_dir, exist_ok=True)
 
@@ -30,6 +35,13 @@ class OpenReviewScraper:
         对于分区名称（Oral/Spotlight/Poster）同时尝试 Title-case 和 lower-case，
         并将两次结果合并去重后返回。
         """
+        return list(dict.fromkeys(self.iter_paper_links_via_api(page_url, limit)))
+
+    def iter_paper_links_via_api(self, page_url: str, limit: int = 1000) -> Iterator[str]:
+        """
+        与 get_paper_links_via_api 相同，但每拉到一页就逐个产出论文链接 (不去重)，
+        下游可以在后续分页还在请求时就开始下载。
+        """
         # 1. 解析 URL
         parsed = urlparse(page_url)
         qs = parse_qs(parsed.query)
@@ -59,12 +71,11 @@ class OpenReviewScraper:
             "limit": limit
         }
 
-        merged_links = []
-        # 5. 对每个 venue 都分页拉取、累积
+        # 5. 对每个 venue 都分页拉取
         for venue in venue_options:
             params = {**base_params, "content.venue": venue, "offset": 0}
             while True:
-                resp = requests.get(api_url, params=params)
+                resp = self.session.get(api_url, params=params)
                 resp.raise_for_status()
                 data = resp.json()
                 notes = data.get("notes", [])
@@ -73,11 +84,16 @@ class OpenReviewScraper:
                 for note in notes:
                     pid = note.get("id") or note.get("forum")
                     if pid:
-                        merged_links.append(f"{self.BASE_URL}/forum?id={pid}")
+                        yield f"{self.BASE_URL}/forum?id={pid}"
                 params["offset"] += limit
 
-        # 6. 去重并保持原顺序
-        return list(dict.fromkeys(merged_links))
+    @staticmethod
+    def subdir_for(page_url: str) -> str:
+        """group 页面对应的保存子目录名，如 ICLR.cc_2025_Conference_tab-accept-oral"""
+        parsed = urlparse(page_url)
+        group_id = parse_qs(parsed.query).get("id", ["unknown"])[0]
+        fragment = parsed.fragment or ""
+        return group_id.replace("/", "_") + (f"_{fragment}" if fragment else "")
     
     def download_pdf_bytes(self, paper_url: str) -> Tuple[str, bytes]:
         parsed = urlparse(paper_url)
@@ -86,16 +102,20 @@ class OpenReviewScraper:
         if not paper_id:
             raise ValueError(f"无法从 URL 中解析出 paper id：{paper_url}")
         pdf_url = self.PDF_URL_TMPL.format(paper_id=paper_id)
-        resp = requests.get(pdf_url)
+        resp = self.session.get(pdf_url, timeout=self.download_timeout)
         resp.raise_for_status()
         return paper_id, resp.content
 
     def download_pdf(self, url: str,save_subdir:str) -> str:
         paper_id, pdf_bytes = self.download_pdf_bytes(url)
+        self.save_pdf_bytes(paper_id, pdf_bytes, save_subdir)
+        return paper_id
+
+    def save_pdf_bytes(self, paper_id: str, pdf_bytes: bytes, save_subdir: str) -> str:
         filename = os.path.join(self.pdf_dir,save_subdir ,f"{paper_id}.pdf")
         with open(filename, "wb") as f:
             f.write(pdf_bytes)
-        return paper_id
+        return filename
 
     def setup_driver(self) -> webdriver.Chrome:
         opts = Options()
@@ -185,10 +205,7 @@ class OpenReviewScraper:
     def run(self, urls: list):
         for page_url in urls:
             print(f"\n▶ 处理页面：{page_url}")
-            parsed = urlparse(page_url)
-            group_id = parse_qs(parsed.query).get("id", ["unknown"])[0]
-            fragment = parsed.fragment or ""
-            subdir = group_id.replace("/", "_") + (f"_{fragment}" if fragment else "")
+            subdir = self.subdir_for(page_url)
             target_dir = os.path.join(self.pdf_dir, subdir)
             os.makedirs(target_dir, exist_ok=True)
 
@@ -0,0 +1,32 @@
+import socket
+import threading
+
+from urlchecker.batch import fetch_digest
+
+
+def _serve_once(response: bytes) -> str:
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def handle():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.sendall(response)
+        conn.close()
+        server.close()
+
+    threading.Thread(target=handle, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/"
+
+
+def test_connection_dropped_mid_body_returns_none():
+    url = _serve_once(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 10000\r\n\r\n<html><title>x")
+    assert fetch_digest(url, timeout=5) is None
+
+
+def test_html_without_charset_is_decoded_as_utf8():
+    body = "<html><head><title>数据集主页</title></head><body>说明</body></html>".encode("utf-8")
+    url = _serve_once(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: "
+                      + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+    assert fetch_digest(url, timeout=5)["title"] == "数据集主页"
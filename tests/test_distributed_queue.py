@@ -0,0 +1,38 @@
+from distributed import SharedWorkQueue, KIND_URL
+
+
+def test_release_marks_item_failed_after_max_attempts(tmp_path):
+    queue = SharedWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=3)
+    queue.enqueue("url:a", KIND_URL, {"url": "https://example.com/a"})
+
+    for _ in range(3):
+        leased = queue.lease("worker")
+        assert leased is not None and leased[0] == "url:a"
+        assert queue.has_unfinished()
+        queue.release("url:a", "worker")
+
+    assert queue.lease("worker") is None
+    assert not queue.has_unfinished()
+    assert queue.counts() == {KIND_URL: {"failed": 1}}
+
+
+def test_released_item_is_retried_before_limit(tmp_path):
+    queue = SharedWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=3)
+    queue.enqueue("url:a", KIND_URL, {"url": "https://example.com/a"})
+
+    queue.lease("worker")
+    queue.release("url:a", "worker")
+
+    assert queue.counts() == {KIND_URL: {"pending": 1}}
+    assert queue.lease("worker")[0] == "url:a"
+
+
+def test_release_without_attempt_keeps_retry_count(tmp_path):
+    queue = SharedWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=1)
+    queue.enqueue("url:a", KIND_URL, {"url": "https://example.com/a"})
+
+    queue.lease("worker")
+    queue.release("url:a", "worker", count_attempt=False)
+
+    assert queue.counts() == {KIND_URL: {"pending": 1}}
+    assert queue.lease("worker")[0] == "url:a"
@@ -0,0 +1,18 @@
+import pytest
+
+from urlchecker.evidence import detect_download_dataset_button
+
+
+def _state(label):
+    return {"elements": [{"tag": "a", "text": label, "attributes": {"href": "https://example.com/x"}}]}
+
+
+@pytest.mark.parametrize("label", ["Download the dataset", "Download full data", "Download Corpus (2 GB)", "Download datasets", "下载数据集"])
+def test_download_dataset_labels(label):
+    assert detect_download_dataset_button(_state(label))[0] == "YES"
+
+
+@pytest.mark.parametrize("label", ["Download DataLoader examples", "Download database schema",
+                                   "Download Datasheet (PDF)", "下载数据库结构"])
+def test_similar_labels_are_not_datasets(label):
+    assert detect_download_dataset_button(_state(label)) is None
@@ -0,0 +1,47 @@
+import random
+
+from urlchecker.fingerprint import FingerprintVerdictStore, hamming_distance
+
+TEXT = " ".join(f"word{i % 37} token{i % 11} dataset card section{i % 5}" for i in range(60))
+
+
+def test_cross_host_reuse_is_counted(tmp_path):
+    store = FingerprintVerdictStore(str(tmp_path / "fp.sqlite3"))
+    fp = store.fingerprint(TEXT, [])
+    store.add(fp, "https://huggingface.co/datasets/org/name", "YES", "数据集卡片", "org/name · Datasets")
+
+    match = store.lookup(fp, "https://hf-mirror.com/datasets/org/name", "org/name · Datasets")
+    assert match["url"] == "https://huggingface.co/datasets/org/name"
+    assert store.stats()["cross_host_hits"] == 1
+
+
+def test_same_host_only(tmp_path):
+    store = FingerprintVerdictStore(str(tmp_path / "fp.sqlite3"), same_host_only=True)
+    fp = store.fingerprint(TEXT, [])
+    store.add(fp, "https://example.com/a", "NO", None, "Project page")
+
+    assert store.lookup(fp, "https://other.example.org/a", "Project page") is None
+    assert store.lookup(fp, "https://www.example.com/b", "Project page")["verdict"] == "NO"
+
+
+def test_same_template_pages_with_different_content_do_not_share_verdicts(tmp_path):
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(2000)]
+    chrome = " ".join(rng.choice(vocabulary) for _ in range(600))  # 导航、侧栏、页脚等共享的模板文本
+    store = FingerprintVerdictStore(str(tmp_path / "fp.sqlite3"))
+    pages = [(f"GitHub - org/repo{i}", chrome + " " + " ".join(rng.choice(vocabulary) for _ in range(20)))
+             for i in range(2)]
+    fp_a, fp_b = (store.fingerprint(text, []) for _, text in pages)
+    assert hamming_distance(fp_a, fp_b) <= store.max_hamming  # 只看指纹会被当成同一页面
+    store.add(fp_a, "https://github.com/org/repo0", "YES", "包含数据集", pages[0][0])
+
+    assert store.lookup(fp_a, "https://github.com/org/repo0", pages[0][0]) is not None
+    assert store.lookup(fp_a, "https://github.com/org/repo1", pages[1][0]) is None
+    assert store.lookup(fp_b, "https://github.com/org/repo1", pages[1][0]) is None
+
+
+def test_pages_without_title_are_not_reused(tmp_path):
+    store = FingerprintVerdictStore(str(tmp_path / "fp.sqlite3"))
+    fp = store.fingerprint(TEXT, [])
+    store.add(fp, "https://example.com/a", "NO", None, "")
+    assert store.lookup(fp, "https://example.com/b", "") is None
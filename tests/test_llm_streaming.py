@@ -0,0 +1,36 @@
+import json
+
+from urlchecker.llm_handler import LLMHandler
+
+
+class _FakeClient:
+    def __init__(self, text):
+        self.text = text
+
+    def generate_stream(self, **kwargs):
+        for i in range(0, len(self.text), 7):
+            yield self.text[i:i + 7]
+
+
+def _handler(response):
+    handler = LLMHandler.__new__(LLMHandler)
+    handler.client = _FakeClient(json.dumps(response, ensure_ascii=False))
+    handler.early_stop = "finish"
+    handler.default_model = handler.default_temperature = handler.default_max_tokens = None
+    return handler
+
+
+def test_yes_finish_keeps_full_thought():
+    response = {"action": {"action": "finish", "params": {"success": True, "message": "YES"}},
+                "thought": "页面提供了数据集的下载链接和说明。", "extra": "x" * 200}
+    raw, early = _handler(response)._stream_response([])
+    assert early["thought"] == response["thought"]
+    assert len(raw) < len(json.dumps(response, ensure_ascii=False))
+
+
+def test_no_finish_stops_at_action():
+    response = {"action": {"action": "finish", "params": {"success": True, "message": "NO"}},
+                "thought": "这是论文的项目主页，只有代码。" * 10}
+    raw, early = _handler(response)._stream_response([])
+    assert early["action"]["params"]["message"] == "NO"
+    assert len(raw) < len(json.dumps(response, ensure_ascii=False))
@@ -0,0 +1,19 @@
+from urlchecker.reachability import classify_probe, OUTCOME_SUCCESS, OUTCOME_TRANSIENT, OUTCOME_PERMANENT
+
+
+def test_nxdomain_is_permanent():
+    error = ("HTTPSConnectionPool(host='gone.example', port=443): Max retries exceeded "
+             "(Caused by NameResolutionError(\"Failed to resolve 'gone.example' ([Errno -2] Name or service not known)\"))")
+    assert classify_probe(False, None, "ConnectionError", error) == OUTCOME_PERMANENT
+
+
+def test_temporary_resolver_failure_is_transient():
+    error = ("HTTPSConnectionPool(host='example.com', port=443): Max retries exceeded "
+             "(Caused by NameResolutionError(\"Failed to resolve 'example.com' "
+             "([Errno -3] Temporary failure in name resolution)\"))")
+    assert classify_probe(False, None, "ConnectionError", error) == OUTCOME_TRANSIENT
+
+
+def test_status_codes():
+    assert classify_probe(True, 200, None, None) == OUTCOME_SUCCESS
+    assert classify_probe(True, 404, None, None) == OUTCOME_PERMANENT
@@ -0,0 +1,30 @@
+from urlchecker.sniff import sniff_content, KIND_DATA, KIND_SKIP, KIND_PAGE
+from urlchecker.evidence import detect_data_file_links
+
+
+def test_data_formats_are_data():
+    assert sniff_content("https://example.com/files/train.csv", "text/csv", 1024, None).kind == KIND_DATA
+    assert sniff_content("https://example.com/files/train.csv.gz", "application/gzip", None, None).kind == KIND_DATA
+
+
+def test_github_source_archives_are_not_data():
+    assert sniff_content("https://github.com/org/repo/archive/refs/heads/main.zip",
+                         "application/zip", None, None).kind == KIND_SKIP
+    assert sniff_content("https://codeload.github.com/org/repo/zip/refs/heads/main",
+                         "application/zip", None, "attachment; filename=repo-main.zip").kind == KIND_SKIP
+    assert sniff_content("https://raw.githubusercontent.com/org/repo/main/config.json",
+                         "text/plain", None, None).kind == KIND_PAGE
+
+
+def test_generic_archives_need_data_in_link():
+    assert sniff_content("https://example.com/release/code.zip", "application/zip", None, None).kind == KIND_PAGE
+    assert sniff_content("https://example.com/release/dataset.zip", "application/zip", None, None).kind == KIND_DATA
+
+
+def test_evidence_shares_the_rule():
+    state = {"elements": [{"tag": "a", "text": "Download ZIP",
+                           "attributes": {"href": "https://github.com/org/dataset/archive/main.zip"}}]}
+    assert detect_data_file_links(state) is None
+    state["elements"].append({"tag": "a", "text": "test split",
+                              "attributes": {"href": "https://example.com/test.parquet"}})
+    assert detect_data_file_links(state)[0] == "YES"
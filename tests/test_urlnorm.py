@@ -0,0 +1,9 @@
+from urlchecker.urlnorm import canonicalize_url
+
+
+def test_canonicalize_drops_default_port_and_tracking_params():
+    assert canonicalize_url("HTTPS://Example.com:443/Data/?utm_source=x&b=2&a=1#top") == "https://example.com/Data?a=1&b=2"
+
+
+def test_canonicalize_returns_url_with_invalid_port_unchanged():
+    assert canonicalize_url("http://example.com:port/data") == "http://example.com:port/data"
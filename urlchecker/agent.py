@@ -1,3 +1,4 @@
+import json
 import asyncio
 import logging
 from typing import List, Dict, Any, Optional, Tuple
@@ -5,23 +6,65 @@ from typing import List, Dict, Any, Optional, Tuple
 from .browser_controller import BrowserController
 from .llm_handler import LLMHandler
 from .actions import AgentAction, FinishAction, GoToURLAction, GoToURLParams, FinishParams, LLMResponse
+from .fingerprint import FingerprintVerdictStore
+from .deadline import Deadline, DeadlineExceeded, current_deadline
+from .evidence import EvidenceDetector, record_stall_stop
+from .logs import record_transcript
 
 logger = logging.getLogger(__name__)
 
 class MineAgent:
-    def __init__(self, task: str, llm_handler: LLMHandler, start_url: str, headless: bool = True):
+    def __init__(self, task: str, llm_handler: LLMHandler, start_url: str, headless: bool = True,
+                 fingerprint_store: Optional[FingerprintVerdictStore] = None,
+                 deadline: Optional[Deadline] = None,
+                 evidence_detector: Optional[EvidenceDetector] = None,
+                 max_steps: int = 10, stall_steps: Optional[int] = None):
         self.task = task
         self.start_url = start_url
         self.llm_handler = llm_handler
         self.browser_controller = BrowserController(headless=headless)
         self.history: List[Dict[str, Any]] = []
-        self.max_steps = 10
+        self.max_steps = max_steps
+        # 连续 stall_steps 步没有新的观察 (页面、元素和提取结果都没变) 时提前结束；None 表示不限
+        self.stall_steps = stall_steps
+        # 页面证据足够明确时不问 LLM 直接判定；None 表示不启用
+        self.evidence_detector = evidence_detector
+        # 起始页面的内容指纹与已判定页面相近时直接复用判定；None 表示不启用
+        self.fingerprint_store = fingerprint_store
+        # 截止时间 (默认取当前上下文的)；到期时停止并以超时结束，已有的想法作为部分结果返回
+        self.deadline = deadline or current_deadline()
+        self.timed_out = False
+
+    async def _bounded(self, awaitable):
+        """在截止时间内等待 awaitable，超时抛出 DeadlineExceeded (同时取消它)。"""
+        if self.deadline is None or self.deadline.at is None:
+            return await awaitable
+        remaining = self.deadline.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded(f"{self.deadline.name} 截止时间已到")
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.deadline.name} 截止时间已到") from None
+
+    @staticmethod
+    def _observation_key(state: Dict[str, Any], last_result: Optional[Dict[str, Any]]) -> int:
+        """一步的观察 = 页面状态 + 上一个动作提取到的数据。"""
+        extracted = (last_result or {}).get("extracted_data")
+        return hash(json.dumps([state.get("url"), state.get("title"), state.get("elements"), extracted],
+                               sort_keys=True, ensure_ascii=False, default=str))
 
     async def run(self) -> Optional[Tuple[FinishParams, Optional[str]]]:
         logger.info(f"开始执行任务: {self.task}")
         await self.browser_controller.start()
         final_finish_params: Optional[FinishParams] = None
         final_thought: Optional[str] = None
+        llm_response: Optional[LLMResponse] = None
+        seen_observations = set()
+        stalled_steps = 0
+        action_result: Optional[Dict[str, Any]] = None
 
         try:
             logger.info(f"准备跳转到起始网址: {self.start_url}")
@@ -30,27 +73,88 @@ class MineAgent:
                 self.start_url = "https://" + self.start_url
             
             initial_action = GoToURLAction(params=GoToURLParams(url=self.start_url))
-            init_result = await self.browser_controller.execute_action(initial_action)
+            init_result = await self.browser_controller.execute_action(initial_action, deadline=self.deadline)
             if init_result["status"] == "error":
+                if self.deadline is not None and self.deadline.expired():
+                    raise DeadlineExceeded(f"{self.deadline.name} 截止时间已到")
                 logger.error(f"起始网址跳转失败: {init_result['message']}")
                 final_finish_params = FinishParams(success=False, message=f"无法打开起始网址: {init_result['message']}")
                 return final_finish_params, None
 
+            start_fingerprint = None
+            start_title = None
+            if self.fingerprint_store is not None:
+                content = await self._bounded(self.browser_controller.get_page_content())
+                start_title = content.get("title")
+                # SimHash 逐特征计算，大页面要几十毫秒，放到线程里避免阻塞其他 Agent
+                start_fingerprint = await asyncio.to_thread(self.fingerprint_store.fingerprint,
+                                                            content["text"], content["links"])
+                match = None
+                if start_fingerprint is not None:
+                    match = await asyncio.to_thread(self.fingerprint_store.lookup, start_fingerprint, self.start_url,
+                                                    start_title)
+                if match is not None:
+                    # 总是输出 (不受采样影响) 并写入对话记录，误复用时可以按两个 URL 追查
+                    logger.warning(f"起始页面与已判定页面 {match['url']} 内容相近 (汉明距离 {match['distance']})，"
+                                   f"复用判定: {match['verdict']} ({self.start_url})")
+                    record_transcript("fingerprint_reuse", url=self.start_url, matched_url=match["url"],
+                                      distance=match["distance"], verdict=match["verdict"])
+                    final_finish_params = FinishParams(success=True, message=match["verdict"])
+                    final_thought = match["thought"]
+                    if final_thought:
+                        final_thought = f"{final_thought} (复用内容相近页面 {match['url']} 的判定)"
+                    return final_finish_params, final_thought
+
             for step in range(self.max_steps):
                 logger.info(f"--- 开始第 {step + 1}/{self.max_steps} 步 ---")
 
                 logger.debug("准备调用 get_current_state...")
-                current_state = await self.browser_controller.get_current_state()
+                current_state = await self._bounded(self.browser_controller.get_current_state())
                 logger.debug(f"get_current_state 调用完成. URL: {current_state.get('url')}")
                 logger.info(f"当前网址: {current_state['url']}")
                 logger.debug(f"当前页面元素 (前 500 字符): {str(current_state.get('elements', []))[:500]}...")
 
+                if self.evidence_detector is not None:
+                    evidence = self.evidence_detector.inspect(current_state)
+                    if evidence is not None:
+                        detector_name, verdict, reason = evidence
+                        logger.info(f"证据检测器 {detector_name} 命中: {reason} -> {verdict}，不再调用 LLM。")
+                        final_finish_params = FinishParams(success=True, message=verdict)
+                        final_thought = f"{reason} (证据检测器 {detector_name})"
+                        if start_fingerprint is not None:
+                            await asyncio.to_thread(self.fingerprint_store.add, start_fingerprint, self.start_url,
+                                                    verdict, final_thought, start_title)
+                        break
+
+                observation = self._observation_key(current_state, action_result)
+                if observation in seen_observations:
+                    stalled_steps += 1
+                else:
+                    seen_observations.add(observation)
+                    stalled_steps = 0
+                if self.stall_steps and stalled_steps >= self.stall_steps:
+                    logger.warning(f"连续 {stalled_steps} 步没有新的观察，提前结束 (省下 {self.max_steps - step} 步)。")
+                    record_stall_stop(self.max_steps - step)
+                    final_finish_params = FinishParams(success=False, message=f"Agent 连续 {stalled_steps} 步没有新的观察")
+                    final_thought = llm_response.thought if llm_response else None
+                    break
+
+                # 等待 LLM 的同时在后台预加载可能的下一跳页面
+                self.browser_controller.start_prefetch(current_state)
                 logger.debug("准备调用 llm_handler.get_next_action...")
-                llm_response: Optional[LLMResponse] = self.llm_handler.get_next_action(
+                # get_next_action 是同步阻塞调用，放到线程里执行，避免卡住其他并发的 Agent；
+                # 线程继承截止时间，HTTP 请求超时同样不会超过它
+                llm_response = await self._bounded(asyncio.to_thread(
+                    self.llm_handler.get_next_action,
                     task=self.task,
                     current_state=current_state,
                     history=self.history
-                )
+                ))
+                if (self.deadline is not None and self.deadline.expired()
+                        and (not llm_response or (llm_response.action.action == "finish"
+                                                  and not llm_response.action.params.success))):
+                    # 请求因截止时间被截断，返回的是错误而不是判断
+                    raise DeadlineExceeded(f"{self.deadline.name} 截止时间已到")
                 logger.debug(f"llm_handler.get_next_action 调用完成. 返回值: {llm_response}")
 
                 if not llm_response:
@@ -58,13 +162,9 @@ class MineAgent:
                     final_finish_params = FinishParams(success=False, message="LLM未返回响应")
                     break
 
-                logger.debug("准备打印 LLM 输出...")
-                print("\n-------------------- LLM 输出 --------------------")
-                print(f"[想法]: {llm_response.thought}")
-                print(f"[动作]: {llm_response.action.action}")
-                print(f"[参数]: {llm_response.action.params}")
-                print("--------------------------------------------------\n")
-                logger.debug("LLM 输出打印完成.")
+                # 对话记录默认写入压缩文件，不再逐步打印到标准输出 (见 logs.py)
+                record_transcript("llm", step=step + 1, thought=llm_response.thought,
+                                  action=llm_response.action.action, params=llm_response.action.params.model_dump())
                 
                 current_step_history = {"llm_response_raw": llm_response.model_dump_json(indent=2)} 
 
@@ -78,10 +178,15 @@ class MineAgent:
                     self.history.append(current_step_history)
                     final_finish_params = finish_params
                     final_thought = llm_response.thought
+                    if start_fingerprint is not None and finish_params.success:
+                        await asyncio.to_thread(self.fingerprint_store.add, start_fingerprint, self.start_url,
+                                                finish_params.message.strip().upper(), final_thought, start_title)
                     break
 
-                action_result = await self.browser_controller.execute_action(action_to_execute)
+                action_result = await self.browser_controller.execute_action(action_to_execute, deadline=self.deadline)
+                await self.browser_controller.discard_prefetch()
                 logger.info(f"动作执行结果: {action_result}")
+                record_transcript("result", step=step + 1, result=action_result)
                 current_step_history["action_result"] = action_result
                 self.history.append(current_step_history)
 
@@ -94,6 +199,12 @@ class MineAgent:
                 if llm_response:
                     final_thought = llm_response.thought
 
+        except DeadlineExceeded as e:
+            self.timed_out = True
+            logger.warning(f"Agent 在第 {len(self.history) + 1} 步超时: {e}")
+            final_finish_params = FinishParams(success=False, message=f"{e} (已完成 {len(self.history)} 步)")
+            # 最后一次的想法作为部分结果保留
+            final_thought = llm_response.thought if llm_response else None
         except Exception as e:
             logger.exception("Agent 执行过程中出错:")
             final_finish_params = FinishParams(success=False, message=f"Agent 执行出错: {e}")
@@ -102,4 +213,6 @@ class MineAgent:
             logger.info("Agent 运行结束。")
             if final_finish_params is None:
                 final_finish_params = FinishParams(success=False, message="Agent因未知原因未产生结果")
+            record_transcript("finish", steps=len(self.history), success=final_finish_params.success,
+                              message=final_finish_params.message, thought=final_thought, timed_out=self.timed_out)
             return final_finish_params, final_thought 
\ No newline at end of file
@@ -3,20 +3,115 @@ AI 客户端模块，负责直接与 AI API 进行交互。
 """
 
 import json
+import time
 import requests
 import logging
-import sseclient # 虽然当前没用流式输出，但保持与 sql 示例结构一致
+import threading
+import sseclient # 用于解析流式 (SSE) 输出
 from typing import List, Dict, Any, Optional, Union, Callable, Generator
 
 # 从新的 config.py 导入配置
 from .config import AI_CONFIG
+from .deadline import DeadlineExceeded, bounded_timeout
+from .cost import get_cost_ledger
 
 logger = logging.getLogger(__name__)
 
+# 整个进程发出的 LLM 请求数 (含失败和重试)，用于运行预算控制
+_llm_call_count = 0
+_llm_call_count_lock = threading.Lock()
+
+
+def get_llm_call_count() -> int:
+    """返回本进程目前为止发出的 LLM 请求数。"""
+    with _llm_call_count_lock:
+        return _llm_call_count
+
+
+# API 响应中的 token 用量 (含命中提供方提示缓存的 token 数)
+_usage_stats = {"requests": 0, "requests_with_usage": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                "completion_tokens": 0, "cached_calls": 0, "cached_latency": 0.0,
+                "uncached_calls": 0, "uncached_latency": 0.0}
+_usage_stats_lock = threading.Lock()
+
+
+def _cached_tokens(usage: Dict[str, Any]) -> int:
+    """各家兼容 API 报告缓存命中的字段不同：OpenAI / DeepSeek / Anthropic 兼容格式。"""
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens")
+               or usage.get("cache_read_input_tokens") or 0)
+
+
+def record_usage(usage: Optional[Dict[str, Any]], latency: float, model: Optional[str] = None) -> None:
+    """
+    记录一次请求的 token 用量和耗时 (usage 为响应中的 usage 字段，没有时为 None)，
+    并按模型单价记到当前的费用记账范围上 (见 cost.py)。
+    """
+    cached = _cached_tokens(usage) if usage else 0
+    get_cost_ledger().charge(model, int((usage or {}).get("prompt_tokens") or 0), cached,
+                             int((usage or {}).get("completion_tokens") or 0), has_usage=bool(usage))
+    with _usage_stats_lock:
+        _usage_stats["requests"] += 1
+        if not usage:
+            return
+        _usage_stats["requests_with_usage"] += 1
+        _usage_stats["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+        _usage_stats["completion_tokens"] += int(usage.get("completion_tokens") or 0)
+        _usage_stats["cached_tokens"] += cached
+        bucket = "cached" if cached else "uncached"
+        _usage_stats[f"{bucket}_calls"] += 1
+        _usage_stats[f"{bucket}_latency"] += latency
+
+
+def get_usage_stats() -> Dict[str, Any]:
+    """
+    token 用量、提示缓存命中率，以及按 CACHED_INPUT_DISCOUNT (缓存 token 的折扣) 估算的输入成本降幅；
+    命中/未命中缓存的请求分别统计平均耗时，用来观察缓存对延迟的影响。
+    """
+    with _usage_stats_lock:
+        stats = dict(_usage_stats)
+    discount = (AI_CONFIG.get("PROMPT_LAYOUT") or {}).get("CACHED_INPUT_DISCOUNT", 0.5)
+    prompt_tokens = stats["prompt_tokens"]
+    stats["cache_hit_ratio"] = round(stats["cached_tokens"] / prompt_tokens, 3) if prompt_tokens else None
+    stats["input_cost_reduction"] = (round(stats["cached_tokens"] * discount / prompt_tokens, 3)
+                                     if prompt_tokens else None)
+    for bucket in ("cached", "uncached"):
+        calls = stats[f"{bucket}_calls"]
+        total = stats.pop(f"{bucket}_latency")
+        stats[f"avg_{bucket}_latency_s"] = round(total / calls, 3) if calls else None
+    return stats
+
+
+# 每个 API_BASE 一个 requests.Session：复用 TCP/TLS 连接 (预热阶段建立的连接也由后续请求复用)
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_api_session(api_base: str) -> requests.Session:
+    """返回 api_base 对应的共享 Session (线程安全；连接池大小足够多个 Agent 并发使用)。"""
+    key = api_base.strip("/")
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32))
+            session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32))
+            _sessions[key] = session
+        return session
+
+
 class AIClientError(Exception):
     """自定义 AI Client 异常"""
     pass
 
+class AIClientRateLimitError(AIClientError):
+    """API 返回 429 (被限流)"""
+    pass
+
+class AIClientTimeoutError(AIClientError):
+    """API 请求超时"""
+    pass
+
 class AIClient:
     """AI 客户端基类"""
     
@@ -40,27 +135,32 @@ class AIClient:
         """
         raise NotImplementedError("子类必须实现此方法")
     
-    # 保留流式方法的定义，但暂时不实现或使用
+    # 流式接口：子类按需实现
     def stream_complete(self, messages: List[Dict[str, str]], callback: Callable[[str], None], **kwargs) -> None:
-        raise NotImplementedError("流式处理在此版本中未实现")
+        raise NotImplementedError("该客户端未实现流式处理")
     
     def generate_stream(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
-        raise NotImplementedError("流式处理在此版本中未实现")
+        raise NotImplementedError("该客户端未实现流式处理")
         yield # 为了让它成为生成器
 
 class OpenAIClient(AIClient):
     """OpenAI API (或兼容 API，如 Siliflow) 客户端"""
     
-    def __init__(self, config_section: str = 'OPENAI'):
+    def __init__(self, config_section: str = 'OPENAI', config: Optional[Dict[str, Any]] = None,
+                 name: Optional[str] = None):
         """
         使用 config.py 中指定的部分初始化客户端。
         
         Args:
             config_section: AI_CONFIG 中要使用的配置块的名称 (例如 'OPENAI')
+            config: 直接传入的配置字典 (例如 ROUTER 中的单个端点)，提供时忽略 config_section
+            name: 日志中使用的名称，默认为 config_section
         """
-        config = AI_CONFIG.get(config_section)
+        if config is None:
+            config = AI_CONFIG.get(config_section)
         if not config:
             raise ValueError(f"在 config.py 中未找到配置部分: {config_section}")
+        config_section = name or config_section
             
         super().__init__(config.get('API_KEY'))
         self.model = config.get('MODEL')
@@ -75,10 +175,11 @@ class OpenAIClient(AIClient):
         if not self.api_base:
             raise ValueError(f"配置部分 '{config_section}' 缺少 API_BASE URL。")
 
-    def complete(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """
-        使用 OpenAI 格式的 API 生成完成内容。
-        """
+    def _build_request(self, messages: List[Dict[str, str]], stream: bool, **kwargs):
+        """组装 chat/completions 请求的 endpoint、headers 和请求体 (每次调用计为一次 LLM 请求)。"""
+        global _llm_call_count
+        with _llm_call_count_lock:
+            _llm_call_count += 1
         endpoint = f"{self.api_base.strip('/')}/chat/completions"
         headers = {
             "Content-Type": "application/json"
@@ -87,20 +188,65 @@ class OpenAIClient(AIClient):
             headers["Authorization"] = f"Bearer {self.api_key}" 
         
         data = {
-            "model": kwargs.get("model", self.model),
+            "model": kwargs.get("model") or self.model, # 调用方传 None 时使用本客户端的模型 (例如路由中的各个端点)
             "messages": messages,
-            "temperature": kwargs.get("temperature", self.temperature),
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "stream": False # 明确指定非流式
+            "temperature": kwargs["temperature"] if kwargs.get("temperature") is not None else self.temperature,
+            "max_tokens": kwargs.get("max_tokens") or self.max_tokens,
+            "stream": stream
         }
+        if stream and (AI_CONFIG.get("PROMPT_LAYOUT") or {}).get("STREAM_USAGE", True):
+            # 让服务端在流的最后一段附上 usage (含缓存命中的 token 数)
+            data["stream_options"] = {"include_usage": True}
+        return endpoint, headers, data
+
+    @staticmethod
+    def _request_timeout(kwargs: Dict[str, Any]) -> float:
+        """
+        请求超时：调用方可以用 timeout 参数指定 (默认 3 分钟)，并且不超过当前截止时间的剩余时间
+        (asyncio.to_thread 会把调用方的截止时间一起带进线程)。
+        """
+        return bounded_timeout(kwargs.get("timeout") or 180)
+
+    @staticmethod
+    def _to_client_error(e: Exception) -> AIClientError:
+        """把 requests / JSON 异常转换为对应的 AIClientError 子类。"""
+        if isinstance(e, AIClientError):
+            return e
+        if isinstance(e, DeadlineExceeded):
+            logger.warning(f"API 请求未发出: {e}")
+            return AIClientTimeoutError(f"API 请求未发出: {e}")
+        if isinstance(e, requests.exceptions.Timeout):
+            logger.error(f"API 请求超时: {e}")
+            return AIClientTimeoutError(f"API 请求超时: {e}")
+        if isinstance(e, requests.exceptions.HTTPError):
+            if e.response is not None and e.response.status_code == 429:
+                logger.warning(f"API 请求被限流 (429): {e}")
+                return AIClientRateLimitError(f"API 请求被限流 (429): {e}")
+            logger.error(f"API 请求失败: {e}")
+            return AIClientError(f"API 请求失败: {e}")
+        if isinstance(e, requests.exceptions.RequestException):
+            logger.error(f"API 请求失败: {e}")
+            return AIClientError(f"API 请求失败: {e}")
+        if isinstance(e, json.JSONDecodeError):
+            logger.error(f"解析 API 响应 JSON 失败: {e}")
+            return AIClientError("解析 API 响应 JSON 失败")
+        logger.exception("调用 API 时发生未知错误:") # 使用 exception 记录堆栈跟踪
+        return AIClientError(f"调用 API 时发生未知错误: {e}")
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        使用 OpenAI 格式的 API 生成完成内容。
+        """
+        endpoint, headers, data = self._build_request(messages, stream=False, **kwargs) # 明确指定非流式
+        started = time.monotonic()
 
         try:
             logger.debug(f"向 {endpoint} 发送请求，模型: {data['model']}, 消息数: {len(messages)}")
-            response = requests.post(
+            response = get_api_session(self.api_base).post(
                 endpoint,
                 headers=headers,
                 json=data,
-                timeout=180 # 设置超时，例如 3 分钟
+                timeout=self._request_timeout(kwargs)
             )
             
             response.raise_for_status() # 如果状态码不是 2xx，则抛出 HTTPError
@@ -122,18 +268,88 @@ class OpenAIClient(AIClient):
                 raise AIClientError("API 响应格式无效")
 
             content = response_json['choices'][0]['message']['content']
+            record_usage(response_json.get("usage"), time.monotonic() - started, data["model"])
             logger.debug(f"从 API 成功获取内容，长度: {len(content)}")
             return content
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API 请求失败: {e}")
-            raise AIClientError(f"API 请求失败: {e}") from e
-        except json.JSONDecodeError as e:
-             logger.error(f"解析 API 响应 JSON 失败: {e}")
-             raise AIClientError("解析 API 响应 JSON 失败") from e # 移除错误的 from e
         except Exception as e:
-            logger.exception("调用 API 时发生未知错误:") # 使用 exception 记录堆栈跟踪
-            raise AIClientError(f"调用 API 时发生未知错误: {e}") from e
+            raise self._to_client_error(e) from e
+
+    def generate_stream(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
+        """
+        以 SSE 流式方式请求，逐段 yield 模型输出的文本增量。
+        调用方提前关闭生成器 (close() 或 break 出 for 循环) 时会断开连接，服务端随之停止生成。
+        """
+        endpoint, headers, data = self._build_request(messages, stream=True, **kwargs)
+        headers["Accept"] = "text/event-stream"
+        started = time.monotonic()
+        usage = None
+
+        try:
+            logger.debug(f"向 {endpoint} 发送流式请求，模型: {data['model']}, 消息数: {len(messages)}")
+            response = get_api_session(self.api_base).post(endpoint, headers=headers, json=data, stream=True,
+                                                          timeout=self._request_timeout(kwargs))
+            response.raise_for_status()
+        except Exception as e:
+            raise self._to_client_error(e) from e
+
+        try:
+            for event in sseclient.SSEClient(response).events():
+                if not event.data:
+                    continue
+                if event.data.strip() == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(event.data)
+                except json.JSONDecodeError as e:
+                    raise self._to_client_error(e) from e
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+        except GeneratorExit:
+            logger.debug("流式输出被调用方提前结束，断开连接。")
+            raise
+        except AIClientError:
+            raise
+        except Exception as e:
+            raise self._to_client_error(e) from e
+        finally:
+            response.close()
+            # 提前结束的流拿不到 usage，只计入请求数
+            record_usage(usage, time.monotonic() - started, data["model"])
+
+    def warm_up(self, timeout: float = 10) -> Dict[str, Any]:
+        """
+        建立到 API_BASE 的连接并校验凭据：请求 GET /models (不计入 LLM 请求数，也不消耗 token)。
+        401/403 视为凭据无效；端点不支持 /models (404 等) 时只建立连接，不判断凭据。
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        started = time.monotonic()
+        try:
+            response = get_api_session(self.api_base).get(
+                f"{self.api_base.strip('/')}/models", headers=headers, timeout=timeout)
+            response.close()
+        except requests.exceptions.RequestException as e:
+            return {"connected": False, "credentials_valid": None, "error": f"{type(e).__name__}: {e}",
+                    "latency": round(time.monotonic() - started, 3)}
+        if response.status_code in (401, 403):
+            credentials_valid = False
+        elif response.ok:
+            credentials_valid = True
+        else:
+            credentials_valid = None
+        return {"connected": True, "credentials_valid": credentials_valid, "status_code": response.status_code,
+                "latency": round(time.monotonic() - started, 3)}
+
+    def stream_complete(self, messages: List[Dict[str, str]], callback: Callable[[str], None], **kwargs) -> None:
+        """流式请求，每收到一段文本就调用一次 callback。"""
+        for delta in self.generate_stream(messages, **kwargs):
+            callback(delta)
 
 # 客户端获取函数 (类似 sql 项目)
 def get_ai_client() -> AIClient:
@@ -146,7 +362,11 @@ def get_ai_client() -> AIClient:
         # OpenAIClient 可以处理标准 OpenAI 和 Siliflow 等兼容 API
         # 它会读取 AI_CONFIG['OPENAI'] 下的配置
         logger.info("创建 OpenAI/兼容 API 客户端实例...")
-        return OpenAIClient(config_section='OPENAI')
+        client: AIClient = OpenAIClient(config_section='OPENAI')
+    elif default_source == "ROUTER":
+        # 多端点路由：读取 AI_CONFIG['ROUTER']，所有 Agent 共享同一个路由实例
+        from .router import get_llm_router
+        client = get_llm_router()
     # elif default_source == "CUSTOM_AI":
     #     # 如果未来添加 CustomAIClient，在这里实例化
     #     logger.info("创建自定义 AI 客户端实例...")
@@ -154,5 +374,12 @@ def get_ai_client() -> AIClient:
     else:
         raise ValueError(f"不支持的 AI 源在 config.py 中设置: {default_source}")
 
+    # 启用自适应并发控制时，用全局共享的限流器包装客户端
+    from .concurrency import AdaptiveLimitedClient, get_llm_limiter
+    limiter = get_llm_limiter()
+    if limiter is not None:
+        client = AdaptiveLimitedClient(client, limiter)
+    return client
+
 # 可以选择创建一个默认客户端实例供全局使用，如果方便的话
 # default_ai_client = get_ai_client() 
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+批量 URL 分类：把多个页面的精简摘要打包进一次 LLM 请求。
+
+对每个 URL 先做一次静态 HTML 抓取 (不启动浏览器)，提取标题、meta 描述、
+标题标签、可见文本开头和链接目标，组成紧凑的页面摘要；再按 batch_size 和
+token 上限把多个摘要打包成一次请求，要求模型逐个返回 YES / NO / UNSURE。
+返回 UNSURE、缺失或格式不合法的条目交给完整的 Agent 逐个复查。
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from typing import List, Dict, Any, Optional, Tuple
+
+import requests
+import urllib3
+
+from .ai_client import AIClient, AIClientError, get_ai_client
+from .cost import get_cost_ledger
+from .prompts import BATCH_CLASSIFY_SYSTEM_PROMPT
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+MAX_HTML_BYTES = 512 * 1024  # 只解析页面开头部分，摘要用不到更多
+VALID_VERDICTS = ("YES", "NO")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：ASCII 约 4 字符 1 token，其他字符 (中文等) 约 1 字符 1 token。"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+class _DigestParser(HTMLParser):
+    """从 HTML 中收集标题、meta 描述、h1-h3、正文文本和链接。"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "svg", "template"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self.headings: List[str] = []
+        self.text_parts: List[str] = []
+        self.links: List[Tuple[str, str]] = []
+        self._skip_depth = 0
+        self._current: Optional[str] = None
+        self._current_href: Optional[str] = None
+        self._buffer: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "meta":
+            name = (attrs.get("name") or attrs.get("property") or "").lower()
+            if name in ("description", "og:description") and not self.description:
+                self.description = (attrs.get("content") or "").strip()
+        elif tag in ("title", "h1", "h2", "h3", "a"):
+            self._current = tag
+            self._current_href = attrs.get("href") if tag == "a" else None
+            self._buffer = []
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == self._current:
+            text = " ".join("".join(self._buffer).split())
+            if tag == "title":
+                self.title = text
+            elif tag == "a":
+                if self._current_href and not self._current_href.startswith(("#", "javascript:")):
+                    self.links.append((text, self._current_href))
+            elif text:
+                self.headings.append(text)
+            self._current = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._current:
+            self._buffer.append(data)
+        text = data.strip()
+        if text:
+            self.text_parts.append(text)
+
+
+def build_digest(url: str, html: str, max_text_chars: int = 600, max_links: int = 20) -> Dict[str, Any]:
+    """把 HTML 压缩成供批量分类使用的页面摘要。"""
+    parser = _DigestParser()
+    try:
+        parser.feed(html)
+    except Exception as e:  # HTMLParser 对残缺页面偶尔会抛异常，已解析的部分仍可用
+        logger.debug(f"解析 HTML 摘要出错 {url}: {e}")
+    text = " ".join(" ".join(parser.text_parts).split())[:max_text_chars]
+    links = []
+    for link_text, href in parser.links[:max_links]:
+        href = urljoin(url, href)
+        links.append(f"{link_text[:40]} -> {href[:120]}" if link_text else href[:120])
+    return {
+        "url": url,
+        "title": parser.title[:200],
+        "description": parser.description[:300],
+        "headings": parser.headings[:10],
+        "text": text,
+        "links": links,
+    }
+
+
+def fetch_digest(url: str, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+    """静态抓取页面并生成摘要；非 HTML 或请求失败时返回 None (交给 Agent 处理)。"""
+    try:
+        response = requests.get(url, timeout=timeout, headers=HEADERS, allow_redirects=True, stream=True)
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code >= 400 or "html" not in content_type.lower():
+            response.close()
+            return None
+        try:
+            raw = response.raw.read(MAX_HTML_BYTES, decode_content=True)
+        finally:
+            response.close()
+        # 没有声明 charset 时 requests 按 HTTP 规范给出 ISO-8859-1，而实际的页面几乎都是 UTF-8
+        encoding = response.encoding if "charset" in content_type.lower() else None
+        html = raw.decode(encoding or "utf-8", errors="replace")
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, OSError, LookupError) as e:
+        # 服务端在响应体中途断开时，raw.read 抛出的是 urllib3 的 ProtocolError 而不是 requests 的异常
+        logger.debug(f"静态抓取摘要失败 {url}: {e}")
+        return None
+    digest = build_digest(response.url or url, html)
+    digest["url"] = url
+    return digest
+
+
+def pack_batches(digests: List[Dict[str, Any]], batch_size: int, max_prompt_tokens: int) -> List[List[Dict[str, Any]]]:
+    """按条数和 token 上限把摘要贪心地装进若干批次。"""
+    system_tokens = estimate_tokens(BATCH_CLASSIFY_SYSTEM_PROMPT)
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = system_tokens
+    for digest in digests:
+        tokens = estimate_tokens(json.dumps(digest, ensure_ascii=False))
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_prompt_tokens):
+            batches.append(current)
+            current, current_tokens = [], system_tokens
+        current.append(digest)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_messages(batch: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    items = [{"id": i, **digest} for i, digest in enumerate(batch, start=1)]
+    user = "需要判断的页面摘要列表：\n```json\n" + json.dumps(items, ensure_ascii=False) + "\n```"
+    return [
+        {"role": "system", "content": BATCH_CLASSIFY_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+
+def parse_batch_response(text: str, batch_len: int) -> Dict[int, Tuple[str, str]]:
+    """解析批量回复，只返回通过校验的条目 {id: (verdict, thought)}。"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        logger.warning("批量分类回复不是合法 JSON，整批改为逐个检查。")
+        return {}
+    results = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(results, list):
+        return {}
+
+    parsed: Dict[int, Tuple[str, str]] = {}
+    for item in results:
+        if not isinstance(item, dict):
+            continue
+        item_id = item.get("id")
+        verdict = str(item.get("verdict", "")).strip().upper()
+        thought = item.get("thought")
+        if not isinstance(item_id, int) or not 1 <= item_id <= batch_len or item_id in parsed:
+            continue
+        if verdict not in VALID_VERDICTS or not isinstance(thought, str) or not thought.strip():
+            continue
+        parsed[item_id] = (verdict, thought.strip())
+    return parsed
+
+
+class BatchClassifier:
+    """把多个 URL 的页面摘要打包分类；无法可靠判断的 URL 留给调用方逐个复查。"""
+
+    def __init__(self, client: Optional[AIClient] = None, batch_size: int = 8,
+                 max_prompt_tokens: int = 6000, fetch_timeout: float = 10.0):
+        self.client = client or get_ai_client()
+        self.batch_size = max(1, batch_size)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.fetch_timeout = fetch_timeout
+
+    async def classify(self, urls: List[str]) -> Dict[str, Optional[Tuple[str, Optional[str]]]]:
+        """
+        返回 {url: (status, thought)}；值为 None 表示该 URL 需要逐个复查
+        (抓不到静态摘要、模型回答 UNSURE、回复缺失或不合法)。
+        """
+        results: Dict[str, Optional[Tuple[str, Optional[str]]]] = {url: None for url in urls}
+        digests = await asyncio.gather(*(asyncio.to_thread(fetch_digest, url, self.fetch_timeout) for url in urls),
+                                       return_exceptions=True)
+        for url, digest in zip(urls, digests):
+            if isinstance(digest, BaseException):
+                logger.warning(f"[批量分类] 抓取摘要出错，改为逐个检查: {url}: {digest}")
+        digests = [d for d in digests if isinstance(d, dict)]
+        _record(digest_misses=len(urls) - len(digests))
+
+        for batch in pack_batches(digests, self.batch_size, self.max_prompt_tokens):
+            messages = build_batch_messages(batch)
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            try:
+                text = await asyncio.to_thread(self.client.complete, messages, model=get_cost_ledger().model_for(None))
+            except AIClientError as e:
+                logger.warning(f"批量分类请求失败，{len(batch)} 个 URL 改为逐个检查: {e}")
+                _record(batches=1, prompt_tokens=prompt_tokens, batched_urls=len(batch))
+                continue
+            parsed = parse_batch_response(text, len(batch))
+            for item_id, (verdict, thought) in parsed.items():
+                results[batch[item_id - 1]["url"]] = (verdict, thought if verdict == "YES" else None)
+            _record(batches=1, prompt_tokens=prompt_tokens, batched_urls=len(batch), resolved=len(parsed))
+            logger.info(f"[批量分类] 一次请求判断了 {len(parsed)}/{len(batch)} 个 URL。")
+        return results
+
+
+_batch_stats = {"batches": 0, "batched_urls": 0, "resolved": 0, "digest_misses": 0, "prompt_tokens": 0}
+_batch_stats_lock = threading.Lock()
+
+
+def _record(**counts: int) -> None:
+    with _batch_stats_lock:
+        for key, value in counts.items():
+            _batch_stats[key] += value
+
+
+def get_batch_stats() -> Dict[str, int]:
+    """批量分类的请求数、覆盖的 URL 数和估算的 prompt token 数。"""
+    with _batch_stats_lock:
+        return dict(_batch_stats)
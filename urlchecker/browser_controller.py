@@ -1,5 +1,5 @@
 import asyncio
-from playwright.async_api import async_playwright, Browser, Page, Playwright, ElementHandle
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright, ElementHandle
 import logging
 from typing import Dict, Any, Optional, List
 
@@ -11,27 +11,61 @@ from .actions import (
     AgentAction
 )
 
+from .config import AI_CONFIG
+from .host_scheduler import get_host_scheduler
+from .prefetch import Prefetcher
+from .browser_pool import get_browser_pool
+from .http_cache import get_http_cache
+from .deadline import Deadline, DeadlineExceeded, bounded_timeout
+
 logger = logging.getLogger(__name__)
 
 class BrowserController:
     def __init__(self, headless: bool = True):
         self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
+        self.prefetcher: Optional[Prefetcher] = None
         self.headless = headless # True 就是无头模式，不弹出浏览器窗口
+        self._pooled = False # 上下文来自共享浏览器池时，关闭时只关上下文
 
     async def start(self):
         logger.info("启动浏览器控制器...")
-        self.playwright = await async_playwright().start()
-        # 用 Chromium，也可以换成 .firefox 或 .webkit
-        self.browser = await self.playwright.chromium.launch(headless=self.headless)
-        self.page = await self.browser.new_page()
+        pool = get_browser_pool()
+        if pool is not None and pool.headless == self.headless:
+            # 复用池中已启动的浏览器，只新建独立的上下文
+            self.context = await pool.new_context()
+            self._pooled = True
+        else:
+            self.playwright = await async_playwright().start()
+            # 用 Chromium，也可以换成 .firefox 或 .webkit
+            self.browser = await self.playwright.chromium.launch(headless=self.headless)
+            # 显式创建上下文，预加载的后台页面与 Agent 页面共享 cookie 和缓存
+            self.context = await self.browser.new_context()
+        http_cache = get_http_cache()
+        if http_cache is not None:
+            # 静态资源走共享的磁盘缓存 (预加载页面同样受益)
+            await http_cache.attach(self.context)
+        self.page = await self.context.new_page()
+        prefetch_cfg = AI_CONFIG.get("PREFETCH") or {}
+        if prefetch_cfg.get("ENABLED", False):
+            self.prefetcher = Prefetcher(
+                self.context,
+                top_k=prefetch_cfg.get("TOP_K", 2),
+                timeout=prefetch_cfg.get("TIMEOUT", 20),
+                patterns=prefetch_cfg.get("PATTERNS"),
+            )
         logger.info("浏览器启动成功。")
 
     async def close(self):
         logger.info("关闭浏览器控制器...")
+        if self.prefetcher:
+            await self.prefetcher.discard_all()
         if self.page:
             await self.page.close()
+        if self.context:
+            await self.context.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
@@ -135,8 +169,50 @@ class BrowserController:
             "elements": extracted_elements, # 用元素列表替换之前的简单 content
         }
 
-    async def execute_action(self, action: AgentAction) -> Dict[str, Any]:
-        """在浏览器页面上执行一个动作。"""
+    async def get_page_content(self, max_chars: int = 20000) -> Dict[str, Any]:
+        """获取当前页面的标题、可见文本和全部链接目标 (用于计算内容指纹)。"""
+        page = await self._ensure_page()
+        try:
+            content = await page.evaluate(
+                """(maxChars) => ({
+                    title: document.title || "",
+                    text: (document.body ? document.body.innerText : "").slice(0, maxChars),
+                    links: Array.from(document.querySelectorAll("a[href]"), a => a.href),
+                })""",
+                max_chars,
+            )
+        except Exception as e:
+            logger.debug(f"获取页面内容失败: {e}")
+            return {"url": page.url, "title": "", "text": "", "links": []}
+        return {"url": page.url, "title": content.get("title", ""), "text": content.get("text", ""),
+                "links": content.get("links", [])}
+
+    def start_prefetch(self, state: Dict[str, Any]) -> None:
+        """在等待 LLM 期间预加载当前页面上最可能被访问的链接。"""
+        if self.prefetcher is not None:
+            self.prefetcher.start(state)
+
+    async def discard_prefetch(self) -> None:
+        if self.prefetcher is not None:
+            await self.prefetcher.discard_all()
+
+    async def _switch_to_prefetched(self, url: Optional[str]) -> bool:
+        """目标页面已被预加载时切换过去，返回是否命中。"""
+        if self.prefetcher is None or not url:
+            return False
+        prefetched = await self.prefetcher.take(url)
+        if prefetched is None:
+            return False
+        old_page, self.page = self.page, prefetched
+        await old_page.close()
+        return True
+
+    async def execute_action(self, action: AgentAction, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        在浏览器页面上执行一个动作。
+        各操作的固定超时会收紧到 deadline (默认取当前上下文的截止时间) 的剩余时间以内；
+        截止时间已到时抛出 DeadlineExceeded。
+        """
         page = await self._ensure_page()
         action_type = action.action
         params = action.params
@@ -145,17 +221,37 @@ class BrowserController:
         logger.info(f"执行动作: {action_type}，参数: {params}")
 
         try:
-            if action_type == "goto_url":
-                # 增加超时时间到 60 秒 (单位是毫秒)
-                await page.goto(params.url, wait_until="domcontentloaded", timeout=60000) 
+            if action_type == "goto_url" and await self._switch_to_prefetched(params.url):
+                result["message"] = f"跳转到了 {params.url}"
+            elif action_type == "goto_url":
+                # 导航受按主机的并发/速率限制，目标主机已熔断时直接失败，不再等 60 秒超时
+                scheduler = get_host_scheduler()
+                async with scheduler.slot(params.url):
+                    try:
+                        # 最多 60 秒 (单位是毫秒)，不超过截止时间
+                        await page.goto(params.url, wait_until="domcontentloaded",
+                                        timeout=bounded_timeout(60, deadline) * 1000)
+                    except Exception as e:
+                        scheduler.record_failure(params.url, reason=type(e).__name__)
+                        raise
+                scheduler.record_success(params.url)
                 result["message"] = f"跳转到了 {params.url}"
             elif action_type == "click_element":
-                # 也可以为点击等操作增加超时时间 (如果需要)
-                await page.locator(params.selector).click(timeout=15000) # 例如 15 秒
+                href = None
+                if self.prefetcher is not None:
+                    # 普通链接的点击等价于跳转到其 href，命中预加载时直接切换页面
+                    try:
+                        href = await page.locator(params.selector).first.evaluate(
+                            "el => (el.tagName === 'A' && el.href && !el.target) ? el.href : null", timeout=5000)
+                    except Exception as e:
+                        logger.debug(f"读取元素 href 失败，按普通点击处理: {e}")
+                if not await self._switch_to_prefetched(href):
+                    # 也可以为点击等操作增加超时时间 (如果需要)
+                    await page.locator(params.selector).click(timeout=bounded_timeout(15, deadline) * 1000)
                 result["message"] = f"点击了元素，选择器: {params.selector}"
             elif action_type == "type_text":
                 # 为输入操作增加超时
-                await page.locator(params.selector).fill(params.text, timeout=15000) # 例如 15 秒
+                await page.locator(params.selector).fill(params.text, timeout=bounded_timeout(15, deadline) * 1000)
                 result["message"] = f"在元素里输入了文字，选择器: {params.selector}"
             elif action_type == "extract_info":
                 extracted_data = {}
@@ -178,6 +274,8 @@ class BrowserController:
             # 执行完动作稍微等一下... (这个 sleep 可能不再那么必要，因为操作本身有超时了)
             # await asyncio.sleep(1)
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             # 捕捉所有执行过程中可能出的错
             logger.error(f"执行动作 {action_type} 时出错: {e}")
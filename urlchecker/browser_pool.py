@@ -0,0 +1,106 @@
+"""
+共享浏览器池。
+
+原来每次 Agent 检查都要启动一次 Playwright 和 Chromium (通常 1~3 秒)，第一次检查还要排在
+全部 PDF 解析之后。浏览器池在进程内只启动 SIZE 个 Chromium，每次检查在其中一个上新建
+独立的 BrowserContext (cookie、缓存互不影响)，检查结束只关闭上下文。
+池可以在解析 PDF 的同时提前启动 (见 urlchecker/warmup.py)。
+"""
+
+import time
+import asyncio
+import logging
+import itertools
+from typing import Optional, List, Dict, Any
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+from .config import AI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPool:
+    """在同一个事件循环中共享的一组 Chromium 实例。"""
+
+    def __init__(self, size: int = 1, headless: bool = True):
+        self.size = max(1, size)
+        self.headless = headless
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[Browser] = []
+        self._next = itertools.cycle(range(self.size))
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.launch_seconds: Optional[float] = None
+        self.contexts_created = 0
+        self.relaunches = 0
+
+    async def start(self) -> None:
+        """启动 Playwright 和浏览器 (可重复调用，只启动一次)。"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._browsers:
+                return
+            started = time.monotonic()
+            self._playwright = await async_playwright().start()
+            self._browsers = list(await asyncio.gather(
+                *(self._playwright.chromium.launch(headless=self.headless) for _ in range(self.size))))
+            self.launch_seconds = round(time.monotonic() - started, 3)
+            logger.info(f"[浏览器池] 已启动 {self.size} 个浏览器，用时 {self.launch_seconds} 秒。")
+
+    async def new_context(self) -> BrowserContext:
+        """在池中的下一个浏览器上新建上下文；浏览器意外退出时重新启动它。"""
+        await self.start()
+        index = next(self._next)
+        browser = self._browsers[index]
+        if not browser.is_connected():
+            logger.warning(f"[浏览器池] 浏览器 {index} 已断开，重新启动。")
+            browser = self._browsers[index] = await self._playwright.chromium.launch(headless=self.headless)
+            self.relaunches += 1
+        self.contexts_created += 1
+        return await browser.new_context()
+
+    async def close(self) -> None:
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug(f"[浏览器池] 关闭浏览器出错: {e}")
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "browsers": self.size,
+            "launch_seconds": self.launch_seconds,
+            "contexts_created": self.contexts_created,
+            "relaunches": self.relaunches,
+        }
+
+
+_shared_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> Optional[BrowserPool]:
+    """按 AI_CONFIG['BROWSER_POOL'] 创建 (或返回已创建的) 全局浏览器池；未启用时返回 None。"""
+    global _shared_pool
+    cfg = AI_CONFIG.get("BROWSER_POOL") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    if _shared_pool is None:
+        _shared_pool = BrowserPool(size=cfg.get("SIZE", 1), headless=cfg.get("HEADLESS", True))
+    return _shared_pool
+
+
+async def close_browser_pool() -> None:
+    """关闭全局浏览器池 (在事件循环结束前调用)。"""
+    global _shared_pool
+    if _shared_pool is not None:
+        pool, _shared_pool = _shared_pool, None
+        await pool.close()
+
+
+def get_browser_pool_stats() -> Optional[Dict[str, Any]]:
+    return _shared_pool.stats() if _shared_pool is not None else None
@@ -0,0 +1,53 @@
+"""
+相同 URL 的在途请求合并。
+
+并发处理多篇论文时，引用同一仓库的两篇论文会同时对同一个 URL 发起连通性检查和
+Agent 检查。InflightCoalescer 以规范化 URL 为键：第一个调用者真正执行，之后到达的
+调用者直接等待同一个任务的结果，并统计被合并掉的重复检查次数。
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class InflightCoalescer:
+    """按键合并同时进行的相同异步调用。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """若 key 已有在途任务则等待它，否则用 factory 启动新任务。"""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info(f"[请求合并] {self.name}: '{key}' 已在检查中，等待同一结果。")
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        # shield: 某个等待者被取消时不影响其他等待者共享的任务
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "executed": self.executed, "coalesced": self.coalesced,
+                "in_flight": len(self._inflight)}
+
+
+# 连通性检查和 Agent 检查各用一个全局合并器
+probe_coalescer = InflightCoalescer("连通性检查")
+agent_coalescer = InflightCoalescer("Agent 检查")
+
+
+def get_coalescing_stats() -> Dict[str, Dict[str, int]]:
+    """各合并器的调用次数、实际执行次数和避免的重复检查数。"""
+    return {c.name: c.stats() for c in (probe_coalescer, agent_coalescer)}
@@ -0,0 +1,223 @@
+"""
+LLM 请求的自适应并发控制 (AIMD)。
+
+多个 Agent 并发检查 URL 时，所有 LLM 请求都会打到同一个 OpenAI 兼容端点。
+固定并发要么太保守，要么会触发成片的 429。这里的 AdaptiveLimiter 按 AIMD
+(加性增、乘性减) 调整允许的在途请求数：
+- 请求成功且延迟正常时，limit 缓慢增加 (每完成约 limit 个请求 +increase_step)；
+- 遇到 429 / 超时时，limit 乘以 decrease_factor 快速回退；
+- 延迟超过 latency_threshold 时视为拥塞前兆，做一次较温和的回退。
+
+AIClient.complete 是同步的 (在线程中执行)，所以这里用 threading.Condition 实现。
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, Generator
+
+from .ai_client import AIClient, AIClientError, AIClientRateLimitError, AIClientTimeoutError
+from .config import AI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 请求结果分类，用于决定如何调整 limit
+OUTCOME_SUCCESS = "success"
+OUTCOME_THROTTLED = "throttled"   # 429
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_ERROR = "error"           # 其他错误，不调整 limit，只计数
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器 (线程安全)。"""
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 increase_step: float = 1.0, decrease_factor: float = 0.5,
+                 latency_threshold: float = 30.0, backoff_cooldown: float = 2.0,
+                 throughput_window: float = 60.0):
+        """
+        :param initial_limit:     初始允许的在途请求数
+        :param min_limit:         limit 下限
+        :param max_limit:         limit 上限
+        :param increase_step:     每个"窗口" (约 limit 个成功请求) 增加的量
+        :param decrease_factor:   遇到 429/超时时的乘性回退系数
+        :param latency_threshold: 单次请求延迟 (秒) 超过该值视为拥塞
+        :param backoff_cooldown:  两次回退之间的最小间隔 (秒)，避免同一波 429 把 limit 打到底
+        :param throughput_window: 计算近期吞吐量的滑动窗口 (秒)
+        """
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.backoff_cooldown = backoff_cooldown
+        self.throughput_window = throughput_window
+
+        self._cond = threading.Condition()
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._last_backoff = 0.0
+
+        # 统计信息
+        self._started_at: Optional[float] = None
+        self._counts = {OUTCOME_SUCCESS: 0, OUTCOME_THROTTLED: 0, OUTCOME_TIMEOUT: 0, OUTCOME_ERROR: 0}
+        self._latency_total = 0.0
+        self._peak_limit = self._limit
+        self._peak_in_flight = 0
+        self._wait_total = 0.0
+        self._recent_done: deque = deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> float:
+        """阻塞直到有空闲名额，返回请求开始时间 (传给 release)。"""
+        wait_start = time.monotonic()
+        with self._cond:
+            if self._started_at is None:
+                self._started_at = wait_start
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            now = time.monotonic()
+            self._wait_total += now - wait_start
+            return now
+
+    def release(self, started: float, outcome: str) -> None:
+        """归还名额，并根据请求结果和延迟调整 limit。"""
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self._in_flight -= 1
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+
+            if outcome == OUTCOME_SUCCESS:
+                self._latency_total += latency
+                self._recent_done.append(now)
+                if latency > self.latency_threshold:
+                    self._backoff(now, factor=(1 + self.decrease_factor) / 2, reason=f"延迟 {latency:.1f}s 过高")
+                else:
+                    self._limit = min(self.max_limit, self._limit + self.increase_step / max(self._limit, 1.0))
+                    self._peak_limit = max(self._peak_limit, self._limit)
+            elif outcome in (OUTCOME_THROTTLED, OUTCOME_TIMEOUT):
+                self._backoff(now, factor=self.decrease_factor, reason=outcome)
+
+            self._cond.notify_all()
+
+    def _backoff(self, now: float, factor: float, reason: str) -> None:
+        # 调用方已持有锁
+        if now - self._last_backoff < self.backoff_cooldown:
+            return
+        old = self._limit
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        self._last_backoff = now
+        logger.info(f"[并发控制] {reason}，LLM 并发上限 {old:.1f} -> {self._limit:.1f}")
+
+    def stats(self) -> Dict[str, Any]:
+        """当前 limit 与吞吐量等指标。"""
+        now = time.monotonic()
+        with self._cond:
+            while self._recent_done and now - self._recent_done[0] > self.throughput_window:
+                self._recent_done.popleft()
+            elapsed = (now - self._started_at) if self._started_at else 0.0
+            succeeded = self._counts[OUTCOME_SUCCESS]
+            total = sum(self._counts.values())
+            return {
+                "limit": round(self._limit, 2),
+                "peak_limit": round(self._peak_limit, 2),
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "requests": total,
+                "succeeded": succeeded,
+                "throttled": self._counts[OUTCOME_THROTTLED],
+                "timeouts": self._counts[OUTCOME_TIMEOUT],
+                "errors": self._counts[OUTCOME_ERROR],
+                "avg_latency_s": round(self._latency_total / succeeded, 3) if succeeded else None,
+                "avg_wait_s": round(self._wait_total / total, 3) if total else None,
+                "throughput_rps": round(succeeded / elapsed, 3) if elapsed > 0 else 0.0,
+                "recent_throughput_rps": round(len(self._recent_done) / self.throughput_window, 3),
+            }
+
+
+def classify_error(e: Exception) -> str:
+    """把 AIClient 抛出的异常映射为限流器使用的结果分类。"""
+    if isinstance(e, AIClientRateLimitError):
+        return OUTCOME_THROTTLED
+    if isinstance(e, AIClientTimeoutError):
+        return OUTCOME_TIMEOUT
+    return OUTCOME_ERROR
+
+
+class AdaptiveLimitedClient(AIClient):
+    """给任意 AIClient 套上 AdaptiveLimiter 的包装客户端。"""
+
+    def __init__(self, inner: AIClient, limiter: AdaptiveLimiter):
+        super().__init__(inner.api_key)
+        self.inner = inner
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        # model / api_base 等属性透传给内部客户端
+        return getattr(self.inner, name)
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        started = self.limiter.acquire()
+        outcome = OUTCOME_SUCCESS
+        try:
+            return self.inner.complete(messages, **kwargs)
+        except AIClientError as e:
+            outcome = classify_error(e)
+            raise
+        except Exception:
+            outcome = OUTCOME_ERROR
+            raise
+        finally:
+            self.limiter.release(started, outcome)
+
+    def stream_complete(self, messages: List[Dict[str, str]], callback: Callable[[str], None], **kwargs) -> None:
+        for delta in self.generate_stream(messages, **kwargs):
+            callback(delta)
+
+    def generate_stream(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
+        # 流式请求在整个输出期间都占用一个名额；调用方提前关闭生成器视为成功
+        started = self.limiter.acquire()
+        outcome = OUTCOME_SUCCESS
+        try:
+            yield from self.inner.generate_stream(messages, **kwargs)
+        except AIClientError as e:
+            outcome = classify_error(e)
+            raise
+        except Exception:
+            outcome = OUTCOME_ERROR
+            raise
+        finally:
+            self.limiter.release(started, outcome)
+
+
+# 所有 LLMHandler 共享同一个限流器 (每次 check_url_is_dataset 都会新建 LLMHandler)
+_shared_limiter: Optional[AdaptiveLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter() -> Optional[AdaptiveLimiter]:
+    """按 AI_CONFIG['ADAPTIVE_CONCURRENCY'] 创建 (或返回已创建的) 全局限流器；未启用时返回 None。"""
+    global _shared_limiter
+    cfg = AI_CONFIG.get("ADAPTIVE_CONCURRENCY") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveLimiter(
+                initial_limit=cfg.get("INITIAL_LIMIT", 4),
+                min_limit=cfg.get("MIN_LIMIT", 1),
+                max_limit=cfg.get("MAX_LIMIT", 32),
+                increase_step=cfg.get("INCREASE_STEP", 1.0),
+                decrease_factor=cfg.get("DECREASE_FACTOR", 0.5),
+                latency_threshold=cfg.get("LATENCY_THRESHOLD", 30.0),
+                backoff_cooldown=cfg.get("BACKOFF_COOLDOWN", 2.0),
+            )
+            logger.info(f"已启用 LLM 自适应并发控制，初始并发上限: {_shared_limiter.limit}")
+        return _shared_limiter
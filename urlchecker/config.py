@@ -8,8 +8,9 @@ load_dotenv() # 加载 .env 文件中的环境变量
 
 AI_CONFIG = {
     # 指定要使用的AI源: 'OPENAI' (用于标准 OpenAI 或 Siliflow 等兼容 API)
+    # 'ROUTER' (在下面 ROUTER 中配置的多个兼容端点之间负载均衡)
     # 或未来可以添加 'CUSTOM_AI' 等
-    "DEFAULT_AI_SOURCE": "OPENAI", 
+    "DEFAULT_AI_SOURCE": os.getenv("AI_SOURCE", "OPENAI"), 
     
     # OpenAI 或兼容 API 的配置 (根据 DEFAULT_AI_SOURCE 选择)
     "OPENAI": {
@@ -24,7 +25,215 @@ AI_CONFIG = {
         # 生成内容的最大 Token 数量 (需要根据模型调整)
         "MAX_TOKENS": 1024 # 稍微调大一点，以容纳 JSON 输出和思考过程
     },
-    
+
+    # 多端点路由配置 (DEFAULT_AI_SOURCE 为 'ROUTER' 时使用)
+    "ROUTER": {
+        # 'least_outstanding': 在途请求数/权重 最小的端点优先；'weighted': 按权重平滑轮询
+        "STRATEGY": "least_outstanding",
+        "FAILURE_THRESHOLD": 3,      # 连续失败多少次后标记为不健康
+        "FAILURE_COOLDOWN": 30.0,    # 不健康端点的冷却时间 (秒)
+        "RATE_LIMIT_COOLDOWN": 10.0, # 端点返回 429 后的冷却时间 (秒)
+        "MAX_WAIT": 60.0,            # 所有端点都满载时最多等待的秒数
+        "ENDPOINTS": [
+            {
+                "NAME": "primary",
+                "API_KEY": os.getenv("OPENAI_API_KEY", ""),
+                "API_BASE": os.getenv("OPENAI_API_BASE", "https://aigptx.top/v1"),
+                "MODEL": os.getenv("OPENAI_MODEL", "chatgpt-4o-latest"),
+                "TEMPERATURE": 0.0,
+                "MAX_TOKENS": 1024,
+                "WEIGHT": 1.0,
+                "MAX_IN_FLIGHT": 8,     # 该端点的并发上限 (None 表示不限)
+                "MAX_RPM": None,        # 每分钟请求数上限
+                "MAX_REQUESTS": None,   # 整个运行的请求总数上限
+            },
+            # {
+            #     "NAME": "backup",
+            #     "API_KEY": os.getenv("BACKUP_API_KEY", ""),
+            #     "API_BASE": os.getenv("BACKUP_API_BASE", "https://api.siliconflow.cn/v1"),
+            #     "MODEL": os.getenv("BACKUP_MODEL", "Qwen/Qwen2.5-72B-Instruct"),
+            #     "WEIGHT": 0.5,
+            #     "MAX_IN_FLIGHT": 4,
+            #     "MAX_RPM": 60,
+            #     "MAX_REQUESTS": 2000,
+            # },
+        ],
+    },
+
+    # LLM 请求的自适应并发控制 (AIMD)，所有并发的 Agent 共享同一个限流器
+    "ADAPTIVE_CONCURRENCY": {
+        "ENABLED": True,
+        "INITIAL_LIMIT": 4,        # 初始允许的在途请求数
+        "MIN_LIMIT": 1,
+        "MAX_LIMIT": 32,
+        "INCREASE_STEP": 1.0,      # 健康时每"一轮"请求增加的并发数
+        "DECREASE_FACTOR": 0.5,    # 遇到 429/超时时的乘性回退系数
+        "LATENCY_THRESHOLD": 30.0, # 单次请求超过该秒数视为拥塞
+        "BACKOFF_COOLDOWN": 2.0,   # 两次回退之间的最小间隔 (秒)
+    },
+
+    # 流式输出与提前解析：Agent 在 action 字段完整后即可行动
+    "STREAMING": {
+        "ENABLED": False,
+        # 何时提前断开生成: 'finish' (结论已知时；YES 要等 thought 写完), 'any' (任意动作完整时), 'never'
+        "EARLY_STOP": "finish",
+    },
+
+    # Agent 消息布局与提示缓存 (见 llm_handler.py)
+    "PROMPT_LAYOUT": {
+        # 'stable': 系统提示、schema、任务和示例作为固定前缀，之后才是历史和页面状态 (紧凑 JSON)，
+        #           所有请求共享逐字节相同的前缀，可以命中提供方的提示缓存；'legacy': 原来的布局
+        "MODE": "stable",
+        "FEW_SHOT": True,               # 在固定前缀中加入少量示例
+        "STREAM_USAGE": True,           # 流式请求时要求服务端返回 usage (stream_options.include_usage)
+        "CACHED_INPUT_DISCOUNT": 0.5,   # 命中缓存的输入 token 相对原价的折扣，用于估算成本降幅
+    },
+
+    # 批量分类：把多个页面的静态摘要打包进一次请求 (见 batch.py)
+    "BATCH_CLASSIFY": {
+        "BATCH_SIZE": 8,           # 每次请求最多包含的 URL 数
+        "MAX_PROMPT_TOKENS": 6000, # 每次请求的 prompt token 上限 (估算值)
+        "FETCH_TIMEOUT": 10,       # 静态抓取页面的超时 (秒)
+    },
+
+    # 按主机的礼貌调度与熔断 (连通性检查和浏览器导航共用)
+    "HOST_SCHEDULER": {
+        "MAX_CONCURRENCY": 2,       # 每个主机的并发上限
+        "RATE": 2.0,                # 每个主机每秒最多发起的请求数 (None 表示不限)
+        "FAILURE_THRESHOLD": 3,     # 连续失败多少次后熔断该主机
+        "RESET_TIMEOUT": None,      # 熔断多少秒后放行一次试探请求；None 表示本次运行内不再访问
+        "HOST_GROUPS": ["github.io"], # 按后缀共享配额的主机组 (所有 *.github.io 视为同一主机)
+        "OVERRIDES": {
+            "bgithub.xyz": {"MAX_CONCURRENCY": 2, "RATE": 1.0},
+            "hf-mirror.com": {"MAX_CONCURRENCY": 3, "RATE": 2.0},
+        },
+    },
+
+    # 持久化的可达性缓存 (见 reachability.py)，不同结果使用不同的 TTL (秒)
+    "REACHABILITY_CACHE": {
+        "ENABLED": True,
+        "PATH": ".cache/reachability.sqlite3",
+        "SUCCESS_TTL": 7 * 24 * 3600,     # 能连上
+        "TRANSIENT_TTL": 6 * 3600,        # 超时、连接被拒等暂时性失败
+        "PERMANENT_TTL": 30 * 24 * 3600,  # 域名不存在 (NXDOMAIN)、404/410
+    },
+
+    # 重定向 / 短链接解析 (见 resolver.py)；镜像替换改为作用在解析后的最终 URL 上
+    "URL_RESOLVER": {
+        "ENABLED": True,
+        "CACHE_PATH": ".cache/redirects.sqlite3",
+        "CACHE_TTL": 30 * 24 * 3600,  # source -> final 映射的有效期 (秒)
+        "TIMEOUT": 5,                 # 每一跳 HEAD 请求的超时 (秒)
+        "MAX_REDIRECTS": 10,
+        # 已知的最终平台，不需要解析 (PDFparser.replacements 的源主机会自动加入)
+        "SKIP_HOSTS": ["github.com", "huggingface.co", "kaggle.com", "zenodo.org", "gitlab.com"],
+    },
+
+    # 基于历史判定训练的 URL 预筛模型 (见 prescreen.py，需要 numpy)
+    "PRESCREEN": {
+        "ENABLED": True,
+        "HISTORY_PATH": ".cache/verdicts.jsonl",  # 每次 Agent 判定都会追加到这里
+        # 正例标注 (支持通配符)；每个会议的候选链接列表都要有对应的标注文件，否则其中的正例会被当作负例
+        "BENCHMARK_POSITIVES": ["benchmark_markdown/hand_dataset.json", "benchmark_markdown/filter.json",
+                                "benchmark_markdown/*final[-_]dataset[-_]links.json"],
+        "BENCHMARK_CANDIDATES": ["benchmark_markdown/*extract*urls.txt"],
+        "MIN_TRAINING_EXAMPLES": 100,
+        "N_FEATURES": 2 ** 16,
+        "NEGATIVE_THRESHOLD": 0.05,  # 正例概率低于该值的 URL 跳过 Agent，直接判为 NO
+        "AUDIT_RATE": 0.1,           # 本该跳过的 URL 中仍交给 Agent 抽检的比例，用于估计召回损失
+    },
+
+    # 页面内容指纹 (SimHash) 判定复用 (见 fingerprint.py)
+    "FINGERPRINT_CACHE": {
+        "ENABLED": True,
+        "PATH": ".cache/fingerprints.sqlite3",
+        "MAX_HAMMING": 3,     # 64 位指纹汉明距离不超过该值且标题相同视为同一页面；超过 3 时分桶索引可能漏掉部分相似页面
+        "MIN_FEATURES": 50,   # 文本太少的页面 (空白页、报错页) 不参与复用
+        "TTL": 30 * 24 * 3600,
+        "SAME_HOST_ONLY": False,  # True 时只复用同一主机上页面的判定 (不再跨镜像站复用)；复用总会以 WARNING 记录两个 URL
+    },
+
+    # 等待 LLM 时推测性预加载可能的下一跳页面 (见 prefetch.py)
+    "PREFETCH": {
+        "ENABLED": True,
+        "TOP_K": 2,      # 每一步最多预加载的链接数
+        "TIMEOUT": 20,   # 单个预加载导航的超时 (秒)
+        "PATTERNS": None, # 链接文本/href 的匹配模式 (正则列表)；None 使用 prefetch.DEFAULT_PATTERNS
+    },
+
+    # 共享浏览器池：进程内只启动 SIZE 个 Chromium，每次检查新建独立上下文 (见 browser_pool.py)
+    "BROWSER_POOL": {
+        "ENABLED": True,
+        "SIZE": 1,
+        "HEADLESS": True,  # 与 BrowserController 的 headless 不一致时该检查自行启动浏览器
+    },
+
+    # 解析 PDF 的同时预热浏览器池、LLM 连接和 DNS (见 warmup.py)
+    "WARM_START": {
+        "ENABLED": True,
+        "BROWSER": True,
+        "LLM": True,              # 建立连接并用 GET /models 校验凭据 (不消耗 token)
+        "DNS": True,              # 预解析已提取链接的主机，NXDOMAIN 记入可达性缓存
+        "DNS_CONCURRENCY": 16,
+        "CREDENTIAL_TIMEOUT": 10,
+    },
+
+    # 常驻分类服务 (python -m urlchecker.service，见 service.py)
+    "SERVICE": {
+        "HOST": "127.0.0.1",
+        "PORT": 8765,
+        "UNIX_SOCKET": None,       # 设置后改为监听 Unix socket
+        "MAX_CONCURRENCY": 4,      # 同时运行的 Agent 检查数
+        "MAX_QUEUE": 256,          # 排队请求上限，超出返回 503
+        "DEFAULT_DEADLINE": 600,   # 请求未指定截止时间时的默认值 (秒)
+        "CACHE_TTL": 24 * 3600,    # 服务内判定缓存的有效期 (秒)
+    },
+
+    # 浏览器上下文共享的静态资源磁盘缓存 (见 http_cache.py)
+    "HTTP_CACHE": {
+        "ENABLED": True,
+        "DIR": ".cache/http",
+        "MAX_BYTES": 512 * 1024 * 1024,        # 总大小上限，超出时按最近使用时间淘汰
+        "MAX_ENTRY_BYTES": 10 * 1024 * 1024,   # 单个响应超过该大小不缓存
+        "DEFAULT_TTL": 24 * 3600,              # 响应没有 max-age 时的有效期 (秒)
+        "RESOURCE_TYPES": None,                # 缓存的资源类型；None 使用 http_cache.DEFAULT_RESOURCE_TYPES
+    },
+
+    # 页面证据提前判定和自适应步数 (见 evidence.py)
+    "EVIDENCE": {
+        "ENABLED": True,
+        "DETECTORS": None,   # 启用的检测器名称列表 (按顺序)；None 使用 evidence.DEFAULT_DETECTORS
+        "MAX_STEPS": 10,     # Agent 最多步数
+        "STALL_STEPS": 2,    # 连续这么多步没有新的观察 (页面和提取结果都没变) 时提前结束；None 表示不限
+    },
+
+    # LLM 费用记账与运行前预估 (见 cost.py)；token/费用上限和降级模型在 config.yaml 的 agent.budget 中配置
+    "COST": {
+        # 各模型单价 (美元 / 百万 token)，按模型名最长前缀匹配；请按提供方当前的价目表修改。
+        # 没有配置单价的模型只统计 token，不计费用 (也就不受费用上限约束)
+        "PRICES": {
+            "chatgpt-4o-latest": {"INPUT": 5.0, "CACHED_INPUT": 5.0, "OUTPUT": 15.0},
+            "gpt-4o-mini": {"INPUT": 0.15, "CACHED_INPUT": 0.075, "OUTPUT": 0.6},
+            "gpt-4o": {"INPUT": 2.5, "CACHED_INPUT": 1.25, "OUTPUT": 10.0},
+        },
+        "HISTORY_PATH": ".cache/cost_history.jsonl",  # 每次运行的用量汇总，试运行按其平均值预估；None 表示不记录
+        "HISTORY_RUNS": 20,                           # 预估时使用最近多少次运行
+    },
+
+    # 日志输出、详细日志采样与 Agent 对话记录 (见 logs.py)
+    "LOGGING": {
+        "LEVEL": "INFO",
+        "FORMAT": "text",            # 'text': 原来的格式，检查内的日志带 "[cid] " 前缀；'json': 每行一条 JSON (含 cid / url / paper 字段)
+        "FILE": None,                # 另外写入的日志文件路径；None 表示只输出到控制台
+        "ASYNC": True,               # 通过队列由后台线程输出，记录日志不阻塞 Agent；False 时同步输出 (调试用)
+        "QUEUE_SIZE": 10000,         # 队列满时丢弃 WARNING 以下的记录
+        "SAMPLED_LOGGERS": None,     # 按检查采样的模块；None 使用 logs.DEFAULT_SAMPLED_LOGGERS (Agent / 浏览器 / LLM 处理)
+        "STEP_SAMPLE_RATE": 1.0,     # 这些模块的 INFO 及以下日志保留的检查比例 (如 0.1 只保留十分之一检查的逐步日志)
+        "STEP_MAX_PER_SECOND": None, # 这些模块每秒最多输出的条数；None 表示不限
+        "TRANSCRIPTS": "file",       # Agent 每一步的想法/动作/结果：'file' 写入压缩文件；'stdout' 按原来的方式打印；'off' 不记录
+        "TRANSCRIPT_DIR": "logs/transcripts",  # 每次运行一个 run-<时间>-<进程号>.jsonl.gz
+    },
+
     # 示例: 如果未来要添加完全不同的自定义AI，可以像这样配置
     # "CUSTOM_AI": {
     #     "API_URL": "YOUR_CUSTOM_API_URL",
@@ -0,0 +1,210 @@
+"""
+LLM 用量与费用记账、硬上限和运行前的费用预估。
+
+每次 LLM 请求的 usage (prompt / cached / completion token 数) 按 AI_CONFIG['COST']['PRICES']
+折算成费用，并同时记到当前的记账范围上：整次运行、会议 (venue)、论文、URL。
+记账范围放在 contextvar 中 (cost_scope)，和截止时间一样随 asyncio 任务、asyncio.to_thread
+传递到 AIClient，调用方不需要层层传参。
+
+运行预算 (priority.RunBudget) 用这里的累计值检查 token 数和费用上限；用量达到上限的
+一定比例后切换到更便宜的模型 (DOWNGRADE_MODEL)，达到上限后不再开始新的检查。
+每次运行结束时把汇总追加到历史文件，estimate_run() 用历史平均值预估新一批论文的费用和耗时。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple
+
+from .config import AI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 记账层级，按从粗到细的顺序
+SCOPE_LEVELS = ("venue", "paper", "url")
+
+_current_scope: contextvars.ContextVar[Tuple[Tuple[str, str], ...]] = contextvars.ContextVar("cost_scope", default=())
+
+
+@contextmanager
+def cost_scope(**labels: Optional[str]):
+    """在此范围内 (及其中创建的任务、线程里) 发出的 LLM 请求记到这些层级上，如 cost_scope(paper=..., url=...)。"""
+    scope = dict(_current_scope.get())
+    scope.update({level: label for level, label in labels.items() if label is not None})
+    token = _current_scope.set(tuple(scope.items()))
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def _price(model: Optional[str]) -> Optional[Dict[str, float]]:
+    """模型的单价 (美元 / 百万 token)；没有配置时返回 None。按最长前缀匹配，便于给一族模型配一个价格。"""
+    prices = (AI_CONFIG.get("COST") or {}).get("PRICES") or {}
+    if not model:
+        return None
+    if model in prices:
+        return prices[model]
+    matches = [name for name in prices if model.startswith(name)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def _new_totals() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "spend_usd": 0.0}
+
+
+class CostLedger:
+    """按运行 / 会议 / 论文 / URL 累计 LLM 请求数、token 数和费用。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = _new_totals()
+        self.by_model: Dict[str, Dict[str, float]] = {}
+        self.by_scope: Dict[str, Dict[str, Dict[str, float]]] = {level: {} for level in SCOPE_LEVELS}
+        self.unpriced_models: set = set()
+        self.calls_without_usage = 0
+        self.downgrade_model: Optional[str] = None
+        self.downgrade_reason: Optional[str] = None
+
+    def charge(self, model: Optional[str], prompt_tokens: int, cached_tokens: int, completion_tokens: int,
+               has_usage: bool = True) -> float:
+        """记一次请求，返回折算的费用 (美元)。"""
+        price = _price(model)
+        spend = 0.0
+        if price is not None:
+            uncached = max(0, prompt_tokens - cached_tokens)
+            spend = (uncached * price.get("INPUT", 0.0)
+                     + cached_tokens * price.get("CACHED_INPUT", price.get("INPUT", 0.0))
+                     + completion_tokens * price.get("OUTPUT", 0.0)) / 1_000_000
+        delta = {"calls": 1, "prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens,
+                 "completion_tokens": completion_tokens, "spend_usd": spend}
+        with self._lock:
+            if price is None and model:
+                self.unpriced_models.add(model)
+            if not has_usage:
+                self.calls_without_usage += 1
+            targets = [self.totals, self.by_model.setdefault(model or "default", _new_totals())]
+            for level, label in _current_scope.get():
+                if level in self.by_scope:
+                    targets.append(self.by_scope[level].setdefault(label, _new_totals()))
+            for totals in targets:
+                for key, value in delta.items():
+                    totals[key] += value
+        return spend
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.totals)
+
+    def downgrade(self, model: str, reason: str) -> None:
+        """之后的请求改用更便宜的模型。"""
+        with self._lock:
+            if self.downgrade_model is None:
+                logger.warning(f"[费用] {reason}，之后的 LLM 请求改用 {model}。")
+            self.downgrade_model, self.downgrade_reason = model, reason
+
+    def model_for(self, model: Optional[str]) -> Optional[str]:
+        """调用方本来要用的模型，降级后返回降级模型。"""
+        return self.downgrade_model or model
+
+    def report(self, top: int = 5) -> Dict[str, Any]:
+        """运行总计、按模型的用量，以及每个层级中费用最高的几项和平均值。"""
+        with self._lock:
+            report: Dict[str, Any] = {key: round(value, 4) if key == "spend_usd" else value
+                                      for key, value in self.totals.items()}
+            report["by_model"] = {model: dict(totals, spend_usd=round(totals["spend_usd"], 4))
+                                  for model, totals in self.by_model.items()}
+            for level, entries in self.by_scope.items():
+                if not entries:
+                    continue
+                costliest = sorted(entries.items(), key=lambda item: (-item[1]["spend_usd"], -item[1]["prompt_tokens"]))
+                report[f"per_{level}"] = {
+                    "count": len(entries),
+                    "avg_spend_usd": round(sum(t["spend_usd"] for t in entries.values()) / len(entries), 5),
+                    "avg_tokens": round(sum(t["prompt_tokens"] + t["completion_tokens"]
+                                            for t in entries.values()) / len(entries)),
+                    "costliest": [(label, round(t["spend_usd"], 4), int(t["prompt_tokens"] + t["completion_tokens"]))
+                                  for label, t in costliest[:top]],
+                }
+            if self.unpriced_models:
+                report["unpriced_models"] = sorted(self.unpriced_models)
+            if self.calls_without_usage:
+                report["calls_without_usage"] = self.calls_without_usage
+            if self.downgrade_model:
+                report["downgraded_to"] = self.downgrade_model
+            return report
+
+
+_ledger = CostLedger()
+
+
+def get_cost_ledger() -> CostLedger:
+    return _ledger
+
+
+def get_cost_report() -> Dict[str, Any]:
+    return _ledger.report()
+
+
+def _history_path() -> Optional[str]:
+    return (AI_CONFIG.get("COST") or {}).get("HISTORY_PATH", ".cache/cost_history.jsonl")
+
+
+def append_run_history(summary: Dict[str, Any]) -> None:
+    """把一次运行的汇总 (论文数、候选链接数、Agent 检查数、请求数、token、费用、耗时) 追加到历史文件。"""
+    path = _history_path()
+    if not path:
+        return
+    try:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(summary, finished_at=time.time()), ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning(f"[费用] 写入运行历史 {path} 失败: {e}")
+
+
+def load_run_history(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """读取最近 limit 次 (默认 COST.HISTORY_RUNS) 运行的汇总。"""
+    path = _history_path()
+    limit = limit or (AI_CONFIG.get("COST") or {}).get("HISTORY_RUNS", 20)
+    if not path or not os.path.exists(path):
+        return []
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return runs[-limit:]
+
+
+def estimate_run(papers: int, candidates: int, history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    按历史运行的平均值预估：每个候选链接最终进入 Agent 检查的比例、每次检查的请求数 / token / 费用、
+    每个候选链接摊到的墙钟时间 (已包含当时的并发度)。没有历史时只返回数量。
+    """
+    estimate: Dict[str, Any] = {"papers": papers, "candidate_urls": candidates, "history_runs": len(history)}
+    total = {key: sum(run.get(key) or 0 for run in history)
+             for key in ("candidates", "agent_checks", "llm_calls", "prompt_tokens", "completion_tokens",
+                         "spend_usd", "wall_seconds")}
+    if not total["candidates"] or not total["agent_checks"]:
+        estimate["note"] = "没有可用的历史运行记录，无法预估费用和耗时"
+        return estimate
+    checks = candidates * total["agent_checks"] / total["candidates"]
+    per_check = {key: total[key] / total["agent_checks"]
+                 for key in ("llm_calls", "prompt_tokens", "completion_tokens", "spend_usd")}
+    estimate.update({
+        "agent_checks": round(checks),
+        "llm_calls": round(checks * per_check["llm_calls"]),
+        "tokens": round(checks * (per_check["prompt_tokens"] + per_check["completion_tokens"])),
+        "spend_usd": round(checks * per_check["spend_usd"], 2),
+        "wall_seconds": round(candidates * total["wall_seconds"] / total["candidates"]),
+        "spend_usd_per_check": round(per_check["spend_usd"], 5),
+    })
+    return estimate
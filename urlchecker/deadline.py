@@ -0,0 +1,118 @@
+"""
+分层截止时间 (运行 / 论文 / URL) 与尾延迟统计。
+
+单个 URL 的最坏耗时原本没有上限：最多 10 步 × (60 秒 goto + 15 秒点击 + 180 秒 LLM 超时)。
+Deadline 表示一个绝对截止时刻，子截止时间取 min(父截止时间, 现在 + 子预算)；
+当前截止时间放在 contextvar 中，随 asyncio 任务 (包括请求合并创建的共享任务) 传递到
+MineAgent.run、BrowserController.execute_action 和 AIClient.complete，
+各处用 bounded_timeout() 把自己的固定超时收紧到剩余时间以内。
+超时的检查以 "TIMEOUT" 状态返回 (附带已有的部分结果)，不算作错误。
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple
+
+# Agent 检查超时时返回的状态 (区别于 YES / NO / Error: ...)
+STATUS_TIMEOUT = "TIMEOUT"
+
+
+class DeadlineExceeded(Exception):
+    """截止时间已到"""
+    pass
+
+
+class Deadline:
+    """绝对截止时刻 (time.monotonic)；at 为 None 表示不限。"""
+
+    def __init__(self, at: Optional[float] = None, name: str = "run"):
+        self.at = at
+        self.name = name
+
+    @classmethod
+    def after(cls, seconds: Optional[float], name: str = "run") -> "Deadline":
+        return cls(None if seconds is None else time.monotonic() + seconds, name)
+
+    def child(self, seconds: Optional[float], name: str) -> "Deadline":
+        """子截止时间：不晚于本截止时间；哪一级先到期，name 就记为哪一级。"""
+        if seconds is None:
+            return self
+        at = time.monotonic() + seconds
+        if self.at is not None and self.at <= at:
+            return self
+        return Deadline(at, name)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.at is None else max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def __repr__(self) -> str:
+        remaining = self.remaining()
+        return f"Deadline({self.name}, remaining={'∞' if remaining is None else f'{remaining:.1f}s'})"
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """在此范围内 (及其中创建的 asyncio 任务里) 生效的截止时间。"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def bounded_timeout(default: float, deadline: Optional[Deadline] = None) -> float:
+    """
+    把固定超时 default 收紧到当前截止时间的剩余时间以内；已到期时抛出 DeadlineExceeded。
+    """
+    deadline = deadline or current_deadline()
+    if deadline is None or deadline.at is None:
+        return default
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded(f"{deadline.name} 截止时间已到")
+    return min(default, remaining)
+
+
+class LatencyRecorder:
+    """记录每个 URL 检查的耗时和结果，输出尾延迟分布。"""
+
+    def __init__(self, slowest: int = 5):
+        self.slowest = slowest
+        self._samples: List[Tuple[float, str, str]] = []
+
+    def record(self, url: str, seconds: float, outcome: str) -> None:
+        self._samples.append((seconds, outcome, url))
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        if not self._samples:
+            return None
+        latencies = sorted(seconds for seconds, _, _ in self._samples)
+
+        def percentile(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+
+        outcomes: Dict[str, int] = {}
+        for _, outcome, _ in self._samples:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        total = sum(latencies)
+        slowest = sorted(self._samples, reverse=True)[: self.slowest]
+        return {
+            "checks": len(latencies),
+            "outcomes": outcomes,
+            "p50": percentile(0.5), "p90": percentile(0.9), "p95": percentile(0.95), "p99": percentile(0.99),
+            "max": round(latencies[-1], 2),
+            # 最慢的 1% 检查占总耗时的比例，衡量少数病态页面对整个运行的影响
+            "slowest_1pct_share": round(sum(latencies[int(0.99 * len(latencies)):]) / total, 3) if total else None,
+            "slowest": [(round(seconds, 2), outcome, url) for seconds, outcome, url in slowest],
+        }
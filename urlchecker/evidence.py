@@ -0,0 +1,181 @@
+"""
+基于页面证据的提前判定。
+
+很多页面不需要问 LLM 就能判断：Hugging Face 数据集卡片、Kaggle 数据集页面、
+直接指向 .csv / .parquet 等数据文件的下载链接、"Download dataset" 按钮……
+证据检测器在 MineAgent 每次 get_current_state 之后运行，命中时直接以 YES/NO 结束，
+省掉这一步 (以及之后) 的 LLM 请求。
+
+检测器是 (state) -> Optional[(verdict, reason)] 的函数，用 @register_detector 注册，
+AI_CONFIG['EVIDENCE']['DETECTORS'] 选择启用哪些 (按顺序运行，第一个命中的生效)。
+"""
+
+import re
+import logging
+import threading
+from urllib.parse import urlsplit
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from .config import AI_CONFIG
+from .sniff import is_data_file
+
+logger = logging.getLogger(__name__)
+
+Evidence = Tuple[str, str]  # (verdict: "YES" / "NO", 判定依据)
+Detector = Callable[[Dict[str, Any]], Optional[Evidence]]
+
+DETECTORS: Dict[str, Detector] = {}
+
+
+def register_detector(name: str):
+    """注册一个证据检测器。"""
+    def decorator(func: Detector) -> Detector:
+        DETECTORS[name] = func
+        return func
+    return decorator
+
+
+def _host_path(url: str) -> Tuple[str, List[str]]:
+    parts = urlsplit(url or "")
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host, [segment for segment in parts.path.split("/") if segment]
+
+
+def _links(state: Dict[str, Any]):
+    """页面元素中的 (href, 文本) 对。"""
+    for element in state.get("elements") or []:
+        href = (element.get("attributes") or {}).get("href")
+        if href:
+            yield href, element.get("text") or ""
+
+
+@register_detector("hf_dataset_card")
+def detect_hf_dataset_card(state: Dict[str, Any]) -> Optional[Evidence]:
+    host, path = _host_path(state.get("url"))
+    if host in ("huggingface.co", "hf.co", "hf-mirror.com") and len(path) >= 3 and path[0] == "datasets":
+        return "YES", f"Hugging Face 数据集卡片 ({'/'.join(path[1:3])})"
+    return None
+
+
+@register_detector("kaggle_dataset")
+def detect_kaggle_dataset(state: Dict[str, Any]) -> Optional[Evidence]:
+    host, path = _host_path(state.get("url"))
+    if host == "kaggle.com" and len(path) >= 3 and path[0] == "datasets":
+        return "YES", f"Kaggle 数据集页面 ({'/'.join(path[1:3])})"
+    return None
+
+
+@register_detector("paperswithcode_dataset")
+def detect_paperswithcode_dataset(state: Dict[str, Any]) -> Optional[Evidence]:
+    host, path = _host_path(state.get("url"))
+    if host == "paperswithcode.com" and len(path) >= 2 and path[0] == "dataset":
+        return "YES", f"Papers with Code 数据集页面 ({path[1]})"
+    return None
+
+
+@register_detector("data_file_links")
+def detect_data_file_links(state: Dict[str, Any]) -> Optional[Evidence]:
+    matched = []
+    for href, text in _links(state):
+        # 和内容嗅探共用同一条规则 (GitHub 源码包不算，通用压缩包需要链接本身提到 data)
+        if is_data_file(href, text=text):
+            matched.append(_host_path(href)[1][-1])
+    if matched:
+        return "YES", f"页面包含数据文件下载链接: {', '.join(matched[:3])}"
+    return None
+
+
+# 结尾要求单词边界："Download DataLoader examples"、"Download database schema"、"Download Datasheet" 都不是数据集
+_DOWNLOAD_BUTTON_RE = re.compile(r"\bdownload\s+(the\s+)?(full\s+)?(datasets?|data|corpus|corpora)\b|下载数据(?!库|表)", re.IGNORECASE)
+
+
+@register_detector("download_dataset_button")
+def detect_download_dataset_button(state: Dict[str, Any]) -> Optional[Evidence]:
+    for element in state.get("elements") or []:
+        if element.get("tag") not in ("a", "button"):
+            continue
+        label = " ".join(filter(None, [element.get("text"), (element.get("attributes") or {}).get("aria-label")]))
+        if label and _DOWNLOAD_BUTTON_RE.search(label):
+            return "YES", f"页面上有下载数据集的按钮/链接: '{label[:60]}'"
+    return None
+
+
+_ERROR_TITLE_RE = re.compile(r"^\s*(404|410)\b|page not found|not found\s*$|页面不存在|找不到页面", re.IGNORECASE)
+
+
+@register_detector("error_page")
+def detect_error_page(state: Dict[str, Any]) -> Optional[Evidence]:
+    # 连通性检查只看状态码，很多站点对不存在的页面返回 200 加一个错误页
+    title = state.get("title") or ""
+    if _ERROR_TITLE_RE.search(title) and len(state.get("elements") or []) < 15:
+        return "NO", f"页面是错误页 (标题: '{title[:60]}')"
+    return None
+
+
+DEFAULT_DETECTORS = ["hf_dataset_card", "kaggle_dataset", "paperswithcode_dataset",
+                     "data_file_links", "download_dataset_button", "error_page"]
+
+
+class EvidenceDetector:
+    """按顺序运行一组证据检测器。"""
+
+    def __init__(self, names: Optional[List[str]] = None):
+        names = names or DEFAULT_DETECTORS
+        unknown = [name for name in names if name not in DETECTORS]
+        if unknown:
+            raise ValueError(f"未知的证据检测器: {unknown} (可用: {sorted(DETECTORS)})")
+        self.detectors = [(name, DETECTORS[name]) for name in names]
+
+    def inspect(self, state: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+        """返回第一个命中的 (检测器名, verdict, 判定依据)，都没命中时返回 None。"""
+        _record(states=1)
+        for name, detector in self.detectors:
+            try:
+                evidence = detector(state)
+            except Exception as e:  # 检测器出错不影响 Agent，交给 LLM 判断
+                logger.debug(f"[证据检测] {name} 出错: {e}")
+                continue
+            if evidence is not None:
+                # 命中即结束检查，至少省掉这一步的 LLM 请求
+                _record(hits=1, llm_calls_saved=1, **{f"hit:{name}": 1})
+                return name, evidence[0], evidence[1]
+        return None
+
+
+def get_evidence_detector() -> Optional[EvidenceDetector]:
+    """按 AI_CONFIG['EVIDENCE'] 创建检测器；未启用时返回 None。"""
+    cfg = AI_CONFIG.get("EVIDENCE") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    return EvidenceDetector(cfg.get("DETECTORS"))
+
+
+_evidence_stats: Dict[str, int] = {"states": 0, "hits": 0, "llm_calls_saved": 0,
+                                   "stall_stops": 0, "steps_saved_by_stall": 0}
+_evidence_stats_lock = threading.Lock()
+
+
+def _record(**counts: int) -> None:
+    with _evidence_stats_lock:
+        for key, value in counts.items():
+            _evidence_stats[key] = _evidence_stats.get(key, 0) + value
+
+
+def record_stall_stop(steps_saved: int) -> None:
+    """Agent 因连续没有新观察而提前结束时调用 (steps_saved 为剩余步数，即最多省掉的 LLM 请求数)。"""
+    _record(stall_stops=1, steps_saved_by_stall=steps_saved)
+
+
+def get_evidence_stats() -> Dict[str, Any]:
+    """检查过的页面状态数、各检测器命中数与命中率、省掉的 LLM 请求数、因无进展提前结束的次数。"""
+    with _evidence_stats_lock:
+        stats = dict(_evidence_stats)
+    states = stats["states"]
+    stats["hit_rate"] = round(stats["hits"] / states, 3) if states else None
+    stats["detectors"] = {}
+    for key in [k for k in stats if k.startswith("hit:")]:
+        hits = stats.pop(key)
+        stats["detectors"][key[len("hit:"):]] = {"hits": hits, "hit_rate": round(hits / states, 3) if states else None}
+    return stats
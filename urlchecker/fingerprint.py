@@ -0,0 +1,221 @@
+"""
+页面内容指纹与判定复用。
+
+很多候选页面结构几乎相同：fork、镜像站、GitHub Pages 模板、hf-mirror.com 与 huggingface.co
+上同一个模型卡片。这里把页面的可见文本和链接目标压缩成 64 位 SimHash 指纹，
+并把 Agent 的 YES/NO 判定按指纹缓存；新 URL 打开后若指纹与已判定页面的汉明距离
+不超过 MAX_HAMMING，就直接复用该判定，不再调用 LLM。
+同一模板的页面 (GitHub 仓库页、项目主页模板) 大部分特征来自共享的导航、页脚，
+只有几十个词不同的 README 也可能落在距离阈值内，所以复用还要求两个页面的标题 (规范化后) 相同。
+复用默认允许跨主机 (镜像站)；SAME_HOST_ONLY 打开后只复用同一主机上页面的判定。
+查找使用 4 段 16 位分桶索引：距离 ≤ 3 的两个指纹至少有一段完全相同。
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import AI_CONFIG
+from .urlnorm import url_host
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+_BANDS = 4
+_BAND_BITS = FINGERPRINT_BITS // _BANDS
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fingerprint_features(text: str, links: List[str], shingle_size: int = 3) -> List[str]:
+    """
+    生成 SimHash 的特征：可见文本的词 n-gram + 链接路径。
+    链接只取路径部分 (去掉主机)，这样镜像站和原站上的同一页面得到相同的特征；
+    数字统一替换为 0，避免 star 数、日期之类的小差异。
+    """
+    words = [re.sub(r"\d", "0", w) for w in _WORD_RE.findall(text.lower())]
+    features = [" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 0))]
+    for link in links:
+        try:
+            path = urlsplit(link).path.rstrip("/").lower()
+        except ValueError:
+            continue
+        if path:
+            features.append("link:" + path)
+    return features
+
+
+def simhash(features: List[str]) -> int:
+    """64 位 SimHash (每个特征权重相同)。"""
+    counts = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            counts[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(FINGERPRINT_BITS) if counts[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(fp: int) -> List[Tuple[int, int]]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(i, fp >> (i * _BAND_BITS) & mask) for i in range(_BANDS)]
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """小写并合并空白 (数字保留：repo1 和 repo2 是不同的页面)。"""
+    return " ".join((title or "").lower().split())
+
+
+def _site(url: str) -> str:
+    host = url_host(url)
+    return host[4:] if host.startswith("www.") else host
+
+
+class FingerprintVerdictStore:
+    """按页面指纹缓存 YES/NO 判定 (SQLite 持久化，内存中维护分桶索引)。"""
+
+    def __init__(self, path: str, max_hamming: int = 3, min_features: int = 50, ttl: float = 30 * 24 * 3600,
+                 same_host_only: bool = False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_hamming = max_hamming
+        self.min_features = min_features
+        self.ttl = ttl
+        self.same_host_only = same_host_only
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_verdicts (
+                fingerprint TEXT NOT NULL,
+                url TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                thought TEXT,
+                created_at REAL NOT NULL,
+                title TEXT,
+                PRIMARY KEY (fingerprint, url)
+            )
+        """)
+        try:
+            self._conn.execute("ALTER TABLE page_verdicts ADD COLUMN title TEXT")  # 旧版本的缓存文件没有标题列
+        except sqlite3.OperationalError:
+            pass
+        self._conn.commit()
+        # SQLite INTEGER 是有符号 64 位，指纹按十六进制文本保存
+        self._entries: List[Tuple[int, str, str, Optional[str], str]] = []
+        self._index: Dict[Tuple[int, int], List[int]] = {}
+        now = time.time()
+        for fp_hex, url, verdict, thought, created_at, title in self._conn.execute(
+                "SELECT fingerprint, url, verdict, thought, created_at, title FROM page_verdicts"):
+            if now - created_at < ttl:
+                self._add_to_index(int(fp_hex, 16), url, verdict, thought, normalize_title(title))
+        self.counts = {"lookups": 0, "hits": 0, "cross_host_hits": 0, "title_mismatches": 0, "too_small": 0,
+                       "stored": 0}
+        self.hit_distances: Dict[int, int] = {}
+
+    def _add_to_index(self, fp: int, url: str, verdict: str, thought: Optional[str], title: str) -> None:
+        position = len(self._entries)
+        self._entries.append((fp, url, verdict, thought, title))
+        for band in _bands(fp):
+            self._index.setdefault(band, []).append(position)
+
+    def fingerprint(self, text: str, links: List[str]) -> Optional[int]:
+        """内容太少 (空白页、报错页) 时返回 None，这类页面彼此都很像，不能复用判定。"""
+        features = fingerprint_features(text, links)
+        if len(features) < self.min_features:
+            with self._lock:
+                self.counts["too_small"] += 1
+            return None
+        return simhash(features)
+
+    def lookup(self, fp: int, url: Optional[str] = None, title: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        返回汉明距离最近且不超过 max_hamming、标题相同的已判定页面
+        (same_host_only 时只找和 url 同一主机的)。没有标题的页面不复用判定。
+        """
+        host = _site(url) if url else None
+        title = normalize_title(title)
+        with self._lock:
+            self.counts["lookups"] += 1
+            if not title:
+                return None
+            candidates = {pos for band in _bands(fp) for pos in self._index.get(band, [])}
+            best = None
+            title_mismatch = False
+            for pos in candidates:
+                if self.same_host_only and host and _site(self._entries[pos][1]) != host:
+                    continue
+                distance = hamming_distance(fp, self._entries[pos][0])
+                if distance > self.max_hamming:
+                    continue
+                if self._entries[pos][4] != title:
+                    title_mismatch = True  # 同一模板的不同页面
+                    continue
+                if best is None or distance < best[0]:
+                    best = (distance, pos)
+            if best is None:
+                if title_mismatch:
+                    self.counts["title_mismatches"] += 1
+                return None
+            distance, pos = best
+            _, matched_url, verdict, thought, _ = self._entries[pos]
+            self.counts["hits"] += 1
+            if host and _site(matched_url) != host:
+                self.counts["cross_host_hits"] += 1
+            self.hit_distances[distance] = self.hit_distances.get(distance, 0) + 1
+            return {"url": matched_url, "verdict": verdict, "thought": thought, "distance": distance}
+
+    def add(self, fp: int, url: str, verdict: str, thought: Optional[str], title: Optional[str] = None) -> None:
+        if verdict not in ("YES", "NO"):
+            return
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO page_verdicts (fingerprint, url, verdict, thought, created_at, title) "
+                               "VALUES (?, ?, ?, ?, ?, ?)", (format(fp, "016x"), url, verdict, thought, time.time(), title))
+            self._conn.commit()
+            self._add_to_index(fp, url, verdict, thought, normalize_title(title))
+            self.counts["stored"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counts["lookups"]
+            return {
+                **self.counts,
+                "hit_rate": round(self.counts["hits"] / lookups, 3) if lookups else None,
+                "hit_distances": dict(sorted(self.hit_distances.items())),
+                "known_pages": len(self._entries),
+                "max_hamming": self.max_hamming,
+            }
+
+
+_shared_store: Optional[FingerprintVerdictStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_fingerprint_store() -> Optional[FingerprintVerdictStore]:
+    """按 AI_CONFIG['FINGERPRINT_CACHE'] 打开 (或返回已打开的) 全局指纹判定缓存；未启用时返回 None。"""
+    global _shared_store
+    cfg = AI_CONFIG.get("FINGERPRINT_CACHE") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = FingerprintVerdictStore(
+                path=cfg.get("PATH", ".cache/fingerprints.sqlite3"),
+                max_hamming=cfg.get("MAX_HAMMING", 3),
+                min_features=cfg.get("MIN_FEATURES", 50),
+                ttl=cfg.get("TTL", 30 * 24 * 3600),
+                same_host_only=cfg.get("SAME_HOST_ONLY", False),
+            )
+        return _shared_store
+
+
+def get_fingerprint_stats() -> Optional[Dict[str, Any]]:
+    return _shared_store.stats() if _shared_store is not None else None
@@ -0,0 +1,192 @@
+"""
+按主机的礼貌调度与熔断。
+
+候选 URL 高度集中在少数主机上 (bgithub.xyz、hf-mirror.com、*.github.io)。
+连通性检查和浏览器 Agent 共用同一个 HostScheduler：
+- 每个主机 (或主机组，例如所有 *.github.io) 有独立的并发上限和请求速率上限；
+- 熔断器：同一主机连续失败达到阈值后打开，剩余指向该主机的 URL 直接短路失败，
+  不再逐个等待 10 秒 / 60 秒的超时；可选在 RESET_TIMEOUT 秒后放行一次试探请求。
+运行结束时通过 stats() 输出每个主机的状态。
+"""
+
+import asyncio
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, List
+
+from .config import AI_CONFIG
+from .urlnorm import url_host
+
+logger = logging.getLogger(__name__)
+
+
+class HostCircuitOpenError(Exception):
+    """主机熔断器处于打开状态，请求被短路"""
+    pass
+
+
+class _HostState:
+    def __init__(self, key: str, max_concurrency: int, rate: Optional[float]):
+        self.key = key
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_interval = 1.0 / rate if rate else 0.0
+        self.next_start = 0.0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_probe = False
+
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.wait_total = 0.0
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.half_open_probe else "open"
+
+
+class HostScheduler:
+    """按主机限制并发和速率，并在连续失败后熔断该主机。"""
+
+    def __init__(self, default_max_concurrency: int = 2, default_rate: Optional[float] = 2.0,
+                 failure_threshold: int = 3, reset_timeout: Optional[float] = None,
+                 host_groups: Optional[List[str]] = None,
+                 overrides: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        :param default_max_concurrency: 每个主机默认的并发上限
+        :param default_rate:            每个主机默认的每秒请求数上限 (None 表示不限)
+        :param failure_threshold:       连续失败多少次后打开熔断器
+        :param reset_timeout:           熔断打开多少秒后放行一次试探请求；None 表示本次运行内一直打开
+        :param host_groups:             按后缀合并计算的主机组，例如 'github.io' 使所有 *.github.io 共享配额
+        :param overrides:               按主机 (或主机组) 覆盖 MAX_CONCURRENCY / RATE
+        """
+        self.default_max_concurrency = max(1, default_max_concurrency)
+        self.default_rate = default_rate
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.host_groups = host_groups or []
+        self.overrides = overrides or {}
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = asyncio.Lock()
+
+    def host_key(self, url: str) -> str:
+        host = url_host(url)
+        for group in self.host_groups:
+            if host == group or host.endswith("." + group):
+                return group
+        return host
+
+    def _get_state(self, key: str) -> _HostState:
+        state = self._hosts.get(key)
+        if state is None:
+            override = self.overrides.get(key, {})
+            state = _HostState(
+                key,
+                max_concurrency=max(1, override.get("MAX_CONCURRENCY", self.default_max_concurrency)),
+                rate=override.get("RATE", self.default_rate),
+            )
+            self._hosts[key] = state
+        return state
+
+    def is_open(self, url: str) -> bool:
+        """主机熔断器当前是否会短路该 URL (不占用配额，可用于提前跳过)。"""
+        state = self._hosts.get(self.host_key(url))
+        if state is None or state.opened_at is None:
+            return False
+        if self.reset_timeout is not None and time.monotonic() - state.opened_at >= self.reset_timeout:
+            return state.half_open_probe
+        return True
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        在该主机的并发和速率限制内执行一次请求。
+        熔断打开时抛出 HostCircuitOpenError；调用方在请求结束后调用 record_success / record_failure。
+        """
+        state = self._get_state(self.host_key(url))
+        self._check_circuit(state)
+
+        wait_start = time.monotonic()
+        async with state.semaphore:
+            # 排队期间熔断器可能已经打开
+            self._check_circuit(state)
+            async with self._lock:
+                now = time.monotonic()
+                start_at = max(now, state.next_start)
+                state.next_start = start_at + state.min_interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            state.wait_total += time.monotonic() - wait_start
+            state.requests += 1
+            yield
+
+    def _check_circuit(self, state: _HostState) -> None:
+        if state.opened_at is None:
+            return
+        if (self.reset_timeout is not None and not state.half_open_probe
+                and time.monotonic() - state.opened_at >= self.reset_timeout):
+            state.half_open_probe = True  # 放行这一次试探请求
+            logger.info(f"[主机调度] '{state.key}' 熔断冷却结束，放行一次试探请求。")
+            return
+        state.short_circuited += 1
+        raise HostCircuitOpenError(f"主机 '{state.key}' 已熔断 (连续失败 {state.consecutive_failures} 次)")
+
+    def record_success(self, url: str) -> None:
+        state = self._get_state(self.host_key(url))
+        state.successes += 1
+        state.consecutive_failures = 0
+        if state.opened_at is not None:
+            logger.info(f"[主机调度] '{state.key}' 试探请求成功，熔断器关闭。")
+        state.opened_at = None
+        state.half_open_probe = False
+
+    def record_failure(self, url: str, reason: str = "") -> None:
+        state = self._get_state(self.host_key(url))
+        state.failures += 1
+        state.consecutive_failures += 1
+        if state.half_open_probe or (state.opened_at is None and state.consecutive_failures >= self.failure_threshold):
+            state.opened_at = time.monotonic()
+            state.half_open_probe = False
+            logger.warning(f"[主机调度] '{state.key}' 连续失败 {state.consecutive_failures} 次，熔断该主机。最后一次原因: {reason}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个主机的请求数、失败数、被短路的 URL 数和熔断状态。"""
+        return {
+            key: {
+                "state": state.state(),
+                "requests": state.requests,
+                "successes": state.successes,
+                "failures": state.failures,
+                "short_circuited": state.short_circuited,
+                "avg_wait_s": round(state.wait_total / state.requests, 3) if state.requests else None,
+            }
+            for key, state in self._hosts.items()
+        }
+
+
+_shared_scheduler: Optional[HostScheduler] = None
+
+
+def get_host_scheduler() -> HostScheduler:
+    """按 AI_CONFIG['HOST_SCHEDULER'] 创建 (或返回已创建的) 全局主机调度器。"""
+    global _shared_scheduler
+    if _shared_scheduler is None:
+        cfg = AI_CONFIG.get("HOST_SCHEDULER") or {}
+        _shared_scheduler = HostScheduler(
+            default_max_concurrency=cfg.get("MAX_CONCURRENCY", 2),
+            default_rate=cfg.get("RATE", 2.0),
+            failure_threshold=cfg.get("FAILURE_THRESHOLD", 3),
+            reset_timeout=cfg.get("RESET_TIMEOUT"),
+            host_groups=cfg.get("HOST_GROUPS", ["github.io"]),
+            overrides=cfg.get("OVERRIDES", {}),
+        )
+    return _shared_scheduler
+
+
+def get_host_scheduler_stats() -> Optional[Dict[str, Dict[str, Any]]]:
+    """返回主机调度器统计；本次运行未使用时返回 None。"""
+    return _shared_scheduler.stats() if _shared_scheduler is not None else None
@@ -0,0 +1,211 @@
+"""
+浏览器共享的持久化 HTTP 磁盘缓存。
+
+每次 Agent 检查都是新建的独立上下文，同样的静态资源 (GitHub / bgithub 的 CSS、JS 包，
+Hugging Face 前端，GitHub Pages 主题……) 每次都要重新下载。这里在上下文上拦截请求
+(context.route)：样式表、脚本、字体、图片等静态资源先查磁盘缓存，命中时直接返回；
+未命中时正常请求，可缓存的响应 (200、没有 no-store / no-cache) 写入缓存。
+缓存按 max-age (没有时用 DEFAULT_TTL) 过期，总大小超过 MAX_BYTES 时按最近使用时间淘汰。
+只缓存静态资源，不缓存页面本身，也不共享 cookie，上下文之间仍然相互隔离。
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple, List
+
+from .config import AI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESOURCE_TYPES = ["stylesheet", "script", "font", "image"]
+
+# 缓存的是解码后的响应体，这些头不能原样返回
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie", "connection"}
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class DiskHttpCache:
+    """按 URL 缓存静态资源响应的磁盘缓存 (SQLite 索引 + 每个响应体一个文件)。"""
+
+    def __init__(self, directory: str, max_bytes: int, default_ttl: float,
+                 resource_types: Optional[List[str]] = None, max_entry_bytes: int = 10 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.resource_types = set(resource_types or DEFAULT_RESOURCE_TYPES)
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+        """)
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+
+    def _path(self, file: str) -> str:
+        return os.path.join(self.directory, file[:2], file)
+
+    def get(self, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """返回未过期的 (status, headers, body)；没有时返回 None。"""
+        with self._lock:
+            row = self._conn.execute("SELECT file, status, headers, expires_at FROM entries WHERE url = ?",
+                                     (url,)).fetchone()
+            if row is None or row[3] < time.time():
+                self.misses += 1
+                return None
+            file, status, headers, _ = row
+            try:
+                with open(self._path(file), "rb") as f:
+                    body = f.read()
+            except OSError:
+                self._delete(url, file)
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            self.hits += 1
+            self.bytes_saved += len(body)
+            return status, json.loads(headers), body
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes, ttl: float) -> None:
+        if len(body) > self.max_entry_bytes:
+            return
+        file = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self._path(file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+            with open(path, "wb") as f:
+                f.write(body)
+            now = time.time()
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (url, file, status, json.dumps(headers), len(body), now + ttl, now))
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            self.stored += 1
+            self._evict()
+            self._conn.commit()
+
+    def _delete(self, url: str, file: str) -> None:
+        size = self._conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+        self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self._total_bytes -= size[0] if size else 0
+        try:
+            os.remove(self._path(file))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """总大小超过上限时按最近使用时间淘汰 (先淘汰已过期的)。"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT url, file FROM entries ORDER BY expires_at >= ?, last_used", (time.time(),)).fetchall()
+        for url, file in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._delete(url, file)
+            self.evicted += 1
+
+    @staticmethod
+    def _ttl(headers: Dict[str, str], default_ttl: float) -> Optional[float]:
+        """可缓存时返回有效期 (秒)，不可缓存时返回 None。"""
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "no-cache" in cache_control or headers.get("vary", "").strip() == "*":
+            return None
+        match = _MAX_AGE_RE.search(cache_control)
+        if match:
+            return float(match.group(1)) or None
+        return default_ttl
+
+    async def _handle(self, route) -> None:
+        request = route.request
+        if request.method != "GET" or request.resource_type not in self.resource_types:
+            await route.fallback()
+            return
+        url = request.url
+        cached = await asyncio.to_thread(self.get, url)
+        if cached is not None:
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"[HTTP缓存] 请求 {url} 失败，交给浏览器处理: {e}")
+            await route.fallback()
+            return
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        await route.fulfill(status=response.status, headers=headers, body=body)
+        self.bytes_fetched += len(body)
+        ttl = self._ttl(response.headers, self.default_ttl) if response.status == 200 else None
+        if ttl is not None:
+            await asyncio.to_thread(self.put, url, response.status, headers, body, ttl)
+
+    async def attach(self, context) -> None:
+        """让一个 BrowserContext 的静态资源请求经过缓存。"""
+        await context.route("**/*", self._handle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "bytes_saved": self.bytes_saved,
+                "bytes_fetched": self.bytes_fetched,
+                "stored": self.stored,
+                "evicted": self.evicted,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_shared_cache: Optional[DiskHttpCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[DiskHttpCache]:
+    """按 AI_CONFIG['HTTP_CACHE'] 打开 (或返回已打开的) 全局 HTTP 磁盘缓存；未启用时返回 None。"""
+    global _shared_cache
+    cfg = AI_CONFIG.get("HTTP_CACHE") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = DiskHttpCache(
+                directory=cfg.get("DIR", ".cache/http"),
+                max_bytes=cfg.get("MAX_BYTES", 512 * 1024 * 1024),
+                default_ttl=cfg.get("DEFAULT_TTL", 24 * 3600),
+                resource_types=cfg.get("RESOURCE_TYPES"),
+                max_entry_bytes=cfg.get("MAX_ENTRY_BYTES", 10 * 1024 * 1024),
+            )
+        return _shared_cache
+
+
+def get_http_cache_stats() -> Optional[Dict[str, Any]]:
+    return _shared_cache.stats() if _shared_cache is not None else None
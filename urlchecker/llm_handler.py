@@ -1,6 +1,8 @@
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
 
 # 移除 LangChain 相关的导入
 # from langchain_core.language_models.chat_models import BaseChatModel
@@ -8,29 +10,211 @@ from typing import List, Dict, Any, Optional
 from pydantic import ValidationError
 
 # 导入新的 AI Client
-from .ai_client import AIClient, AIClientError, get_ai_client
+from .ai_client import AIClient, AIClientError, AIClientTimeoutError, get_ai_client, get_usage_stats
+from .deadline import current_deadline
 from .actions import LLMResponse, AgentAction, FinishAction, FinishParams
-from .prompts import get_system_prompt # 系统提示仍然需要
+from .cost import get_cost_ledger
+from .prompts import get_system_prompt, get_stable_system_prompt # 系统提示仍然需要
 
 logger = logging.getLogger(__name__)
 
+# 流式调用的全局统计 (每次检查都会新建 LLMHandler，所以放在模块级)
+_stream_stats = {"streamed_calls": 0, "early_stops": 0, "chars_received": 0, "time_to_action_total": 0.0}
+_stream_stats_lock = threading.Lock()
+
+
+# 消息布局统计：请求中固定前缀 (系统消息) 占的字符比例
+_layout_stats = {"requests": 0, "prefix_chars": 0, "total_chars": 0}
+_layout_stats_lock = threading.Lock()
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """消息布局、固定前缀占比，以及 API 报告的提示缓存命中情况 (见 ai_client.get_usage_stats)。"""
+    from .config import AI_CONFIG
+    with _layout_stats_lock:
+        layout = dict(_layout_stats)
+    total = layout.pop("total_chars")
+    prefix = layout.pop("prefix_chars")
+    layout["mode"] = (AI_CONFIG.get("PROMPT_LAYOUT") or {}).get("MODE", "stable")
+    layout["stable_prefix_share"] = round(prefix / total, 3) if total else None
+    layout["usage"] = get_usage_stats()
+    return layout
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def get_stream_stats() -> Dict[str, Any]:
+    """流式调用次数、提前结束次数和平均"动作可用"耗时。"""
+    with _stream_stats_lock:
+        stats = dict(_stream_stats)
+    calls = stats.pop("time_to_action_total")
+    stats["avg_time_to_action_s"] = round(calls / stats["streamed_calls"], 3) if stats["streamed_calls"] else None
+    return stats
+
+
+class IncrementalResponseParser:
+    """
+    增量解析流式输出的 LLMResponse JSON。
+
+    只跟踪顶层对象：每当一个顶层字段 (如 'action') 的值完整出现，就解析它放进 fields，
+    不必等整个 JSON 结束。前面的 ```json 之类的包裹会被跳过。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_kind: Optional[str] = None  # 'key' / 'value' / None (嵌套在容器中的字符串)
+        self._state = "key"  # key -> colon -> value_start -> value_* -> after_value
+        self._key_start = 0
+        self._key: Optional[str] = None
+        self._value_start = 0
+
+    def feed(self, text: str) -> None:
+        self.buffer += text
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf) and not self.done:
+            c = buf[i]
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_kind == "key":
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                        self._state = "colon"
+                    elif self._string_kind == "value":
+                        self._complete_value(buf[self._value_start:i + 1])
+            elif self._state == "value_start" and not c.isspace():
+                self._value_start = i
+                if c == '"':
+                    self._in_string, self._string_kind, self._state = True, "value", "value_string"
+                elif c in "{[":
+                    self._depth += 1
+                    self._state = "value_container"
+                else:
+                    self._state = "value_primitive"
+            elif c == '"':
+                self._in_string = True
+                self._string_kind = None
+                if self._depth == 1 and self._state == "key":
+                    self._string_kind = "key"
+                    self._key_start = i
+            elif c == ":" and self._depth == 1 and self._state == "colon":
+                self._state = "value_start"
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}],":
+                if self._state == "value_primitive" and self._depth == 1:
+                    self._complete_value(buf[self._value_start:i].strip())
+                if c == ",":
+                    if self._depth == 1:
+                        self._state = "key"
+                else:
+                    self._depth -= 1
+                    if self._state == "value_container" and self._depth == 1:
+                        self._complete_value(buf[self._value_start:i + 1])
+                    elif self._depth == 0:
+                        self.done = True
+            i += 1
+        self._pos = i
+
+    def _complete_value(self, raw: str) -> None:
+        try:
+            self.fields[self._key] = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.debug(f"流式解析字段 '{self._key}' 失败: {raw[:100]}")
+        self._state = "after_value"
+
+    def partial_string(self, field: str) -> Optional[str]:
+        """返回某个字符串字段目前已收到的内容 (字段未完整时也可用)。"""
+        if field in self.fields:
+            return self.fields[field]
+        if self._state != "value_string" or self._key != field:
+            return None
+        raw = self.buffer[self._value_start + 1:].rstrip("\\")
+        try:
+            return json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            return raw
+
+
 class LLMHandler:
     # 不再需要传入 llm 实例，改为使用全局的 ai_client 或按需获取
     # def __init__(self, llm: BaseChatModel):
     def __init__(self):
         # 获取根据配置创建的 AI Client 实例
         self.client: AIClient = get_ai_client() 
-        self.system_prompt = get_system_prompt()
+        from .config import AI_CONFIG
+        stream_cfg = AI_CONFIG.get("STREAMING") or {}
+        self.streaming = bool(stream_cfg.get("ENABLED", False))
+        self.early_stop = stream_cfg.get("EARLY_STOP", "finish")
+        # 流式模式下要求模型先写 action，结论可以尽早解析出来
+        self.system_prompt = get_system_prompt(action_first=self.streaming)
+        # 消息布局：'stable' 把任务和示例放进系统消息，请求之间共享逐字节相同的前缀 (利于提供方的提示缓存)；
+        # 'legacy' 是原来的布局 (任务和页面状态放在最后一条用户消息里)
+        layout_cfg = AI_CONFIG.get("PROMPT_LAYOUT") or {}
+        self.prompt_layout = layout_cfg.get("MODE", "stable")
+        self.few_shot = bool(layout_cfg.get("FEW_SHOT", True))
+        self._stable_system_prompts: Dict[str, str] = {}
         # 从 client 获取一些配置可能有用，或者直接从 AI_CONFIG 读取
         # 例如，获取模型名称以传递给 complete 方法 (如果需要覆盖客户端默认值)
-        from .config import AI_CONFIG
         default_source = AI_CONFIG.get("DEFAULT_AI_SOURCE", "OPENAI")
         self.default_model = AI_CONFIG.get(default_source, {}).get('MODEL')
-        self.default_temperature = AI_CONFIG.get(default_source, {}).get('TEMPERATURE', 0.0)
-        self.default_max_tokens = AI_CONFIG.get(default_source, {}).get('MAX_TOKENS', 1024)
+        # ROUTER 等没有统一模型参数的源返回 None，由各端点客户端使用自己的配置
+        self.default_temperature = AI_CONFIG.get(default_source, {}).get('TEMPERATURE')
+        self.default_max_tokens = AI_CONFIG.get(default_source, {}).get('MAX_TOKENS')
 
     def _construct_messages(self, task: str, current_state: Dict[str, Any], history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         """组装要发给 LLM 的消息列表 (返回 OpenAI 格式的字典列表)。"""
+        if self.prompt_layout == "stable":
+            messages = self._construct_stable_messages(task, current_state, history)
+        else:
+            messages = self._construct_legacy_messages(task, current_state, history)
+        with _layout_stats_lock:
+            _layout_stats["requests"] += 1
+            _layout_stats["prefix_chars"] += len(messages[0]["content"]) if self.prompt_layout == "stable" else len(self.system_prompt)
+            _layout_stats["total_chars"] += sum(len(message["content"]) for message in messages)
+        return messages
+
+    def _construct_stable_messages(self, task: str, current_state: Dict[str, Any], history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        前缀稳定的布局：固定的系统消息 (系统提示、schema、任务、示例) 在最前面，
+        之后是历史和当前页面状态，全部用紧凑 JSON，同一 URL 的后续步骤还能复用之前各步的前缀。
+        """
+        system_prompt = self._stable_system_prompts.get(task)
+        if system_prompt is None:
+            system_prompt = self._stable_system_prompts[task] = get_stable_system_prompt(
+                task, action_first=self.streaming, few_shot=self.few_shot)
+        messages = [{"role": "system", "content": system_prompt}]
+        for entry in history:
+            if "llm_response_raw" in entry:
+                raw = entry["llm_response_raw"]
+                try:
+                    raw = _compact_json(json.loads(raw))
+                except (TypeError, ValueError):
+                    pass
+                messages.append({"role": "assistant", "content": raw})
+            if "action_result" in entry:
+                messages.append({"role": "user", "content": f"Action Result:\n{_compact_json(entry['action_result'])}"})
+        messages.append({"role": "user", "content": f"Current Page State:\n{_compact_json(current_state)}"})
+        return messages
+
+    def _construct_legacy_messages(self, task: str, current_state: Dict[str, Any], history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         messages = [{"role": "system", "content": self.system_prompt}]
 
         # 把历史记录加进去
@@ -56,6 +240,59 @@ class LLMHandler:
 
         return messages
 
+    def _should_stop_early(self, action: Any, parser: IncrementalResponseParser) -> bool:
+        if not isinstance(action, dict) or self.early_stop == "never":
+            return False
+        if action.get("action") == "finish":
+            # 除 NO 以外的结论 (YES) 的想法会作为依据写进结果文件，要等 thought 字段完整再断开
+            message = str((action.get("params") or {}).get("message", "")).strip().upper()
+            return message == "NO" or "thought" in parser.fields
+        return self.early_stop == "any"
+
+    def _stream_response(self, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        流式调用 LLM。返回 (已收到的原始文本, 提前结束时拼好的响应数据)；
+        没有提前结束时第二项为 None，由调用方按完整回复解析。
+        """
+        parser = IncrementalResponseParser()
+        started = time.monotonic()
+        action_ready_at: Optional[float] = None
+        early_data: Optional[Dict[str, Any]] = None
+
+        stream = self.client.generate_stream(
+            messages=messages,
+            model=get_cost_ledger().model_for(self.default_model),
+            temperature=self.default_temperature,
+            max_tokens=self.default_max_tokens
+        )
+        deadline = current_deadline()
+        try:
+            for delta in stream:
+                if deadline is not None and deadline.expired():
+                    # 读超时只限制两段输出之间的间隔，慢速输出要在这里按截止时间断开
+                    raise AIClientTimeoutError(f"流式输出超过 {deadline.name} 截止时间")
+                parser.feed(delta)
+                action = parser.fields.get("action")
+                if action is None:
+                    continue
+                if action_ready_at is None:
+                    action_ready_at = time.monotonic()
+                if not parser.done and self._should_stop_early(action, parser):
+                    thought = parser.partial_string("thought") or "(流式输出在动作确定后提前结束)"
+                    early_data = {"thought": thought, "action": action}
+                    logger.debug(f"action 已完整 ({action.get('action')})，提前结束生成。")
+                    break
+        finally:
+            stream.close() # 提前 break 时断开连接，服务端停止生成
+
+        with _stream_stats_lock:
+            _stream_stats["streamed_calls"] += 1
+            _stream_stats["chars_received"] += len(parser.buffer)
+            _stream_stats["time_to_action_total"] += (action_ready_at or time.monotonic()) - started
+            if early_data is not None:
+                _stream_stats["early_stops"] += 1
+        return parser.buffer, early_data
+
     # 这个方法现在不再是 async，因为我们的 AIClient.complete 是同步的
     # 如果 ai_client.complete 改为 async，这里也需要改回 async
     def get_next_action(self, task: str, current_state: Dict[str, Any], history: List[Dict[str, Any]]) -> Optional[LLMResponse]:
@@ -67,13 +304,19 @@ class LLMHandler:
         response_text = ""
         response_data = {}
         try:
-            # 调用我们自定义的 AI Client 的 complete 方法
-            response_text = self.client.complete(
-                messages=messages,
-                model=self.default_model, # 可以传递，或者让 client 用自己的默认值
-                temperature=self.default_temperature,
-                max_tokens=self.default_max_tokens
-            )
+            if self.streaming:
+                response_text, early_data = self._stream_response(messages)
+                if early_data is not None:
+                    response_data = early_data
+                    return LLMResponse.model_validate(response_data)
+            else:
+                # 调用我们自定义的 AI Client 的 complete 方法
+                response_text = self.client.complete(
+                    messages=messages,
+                    model=get_cost_ledger().model_for(self.default_model), # 可以传递，或者让 client 用自己的默认值
+                    temperature=self.default_temperature,
+                    max_tokens=self.default_max_tokens
+                )
             logger.debug(f"AI Client 返回原始回复:\n{response_text}")
 
             # 清理掉可能的 Markdown 代码块标记 (比如 ```json ... ```)
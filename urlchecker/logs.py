@@ -0,0 +1,287 @@
+"""
+日志：异步输出、按检查关联、详细日志采样，以及 Agent 对话记录 (transcript)。
+
+几十个 Agent 并发时，同步写控制台本身会成为瓶颈，不同 URL 的日志也交错在一起难以阅读：
+- setup_logging() 把根 logger 换成 QueueHandler，记录放进队列后立即返回，
+  由 QueueListener 的后台线程格式化并写到控制台/文件；
+- log_context() 把关联 ID (cid)、URL、论文名放进 contextvar，随 asyncio 任务和 to_thread 传递，
+  每条记录都带上它们 (文本格式为 "[cid] " 前缀，JSON 格式为独立字段)，一次检查的日志可以按 cid 过滤出来；
+- Agent / 浏览器 / LLM 处理等模块的 INFO 及以下日志按检查采样 (同一个 cid 的日志要么全保留、
+  要么全丢弃，保留下来的仍然是完整的过程)，另有每秒条数上限；WARNING 及以上总是保留；
+- Agent 每一步的想法、动作和结果写到每次运行一个的 gzip 压缩 JSONL 文件 (或按原来的方式打印到标准输出)。
+"""
+
+import os
+import json
+import zlib
+import time
+import gzip
+import uuid
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import logging.handlers
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple
+
+from .config import AI_CONFIG
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(ctx)s%(message)s"
+
+# 默认采样的模块：每一步都会输出 INFO 日志
+DEFAULT_SAMPLED_LOGGERS = ["urlchecker.agent", "urlchecker.browser_controller", "urlchecker.llm_handler"]
+
+_log_context: contextvars.ContextVar[Tuple[Tuple[str, str], ...]] = contextvars.ContextVar("log_context", default=())
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+@contextmanager
+def log_context(**fields: Optional[str]):
+    """在此范围内 (及其中创建的任务、线程里) 输出的日志都带上这些字段，如 log_context(cid=..., url=...)。"""
+    context = dict(_log_context.get())
+    context.update({key: str(value) for key, value in fields.items() if value is not None})
+    token = _log_context.set(tuple(context.items()))
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def current_log_context() -> Dict[str, str]:
+    return dict(_log_context.get())
+
+
+_log_stats = {"records": 0, "dropped_sampled": 0, "dropped_rate": 0, "dropped_queue_full": 0,
+              "transcript_entries": 0}
+_log_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _log_stats_lock:
+        _log_stats[key] += 1
+
+
+class ContextFilter(logging.Filter):
+    """在产生日志的线程里把当前的日志上下文附到记录上 (之后由后台线程格式化)。"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = current_log_context()
+        record.context = context
+        record.ctx = f"[{context['cid']}] " if "cid" in context else ""
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    对 loggers 中模块的 INFO 及以下日志采样：有 cid 时按 cid 决定整次检查保留与否，
+    没有时按计数每 1/sample_rate 条保留一条；保留下来的再受每秒 max_per_second 条的限制。
+    """
+
+    def __init__(self, loggers: List[str], sample_rate: float = 1.0, max_per_second: Optional[float] = None):
+        super().__init__()
+        self.loggers = tuple(loggers)
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._tokens = max_per_second or 0.0
+        self._refilled_at = time.monotonic()
+
+    def _sampled(self, record: logging.LogRecord) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        cid = getattr(record, "context", {}).get("cid")
+        if cid:
+            return zlib.crc32(cid.encode("utf-8")) / 2 ** 32 < self.sample_rate
+        with self._lock:
+            self._counter += 1
+            return self._counter % max(1, round(1 / self.sample_rate)) == 1 if self.sample_rate > 0 else False
+
+    def _within_rate(self) -> bool:
+        if self.max_per_second is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_per_second, self._tokens + (now - self._refilled_at) * self.max_per_second)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        _count("records")
+        if record.levelno >= logging.WARNING or not record.name.startswith(self.loggers):
+            return True
+        if not self._sampled(record):
+            _count("dropped_sampled")
+            return False
+        if not self._within_rate():
+            _count("dropped_rate")
+            return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON，日志上下文 (cid / url / paper) 作为独立字段。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃 WARNING 以下的记录而不是阻塞调用方；WARNING 及以上仍然等待入队。"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count("dropped_queue_full")
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured = False
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """按 AI_CONFIG['LOGGING'] 配置根 logger (只生效一次，替换已有的 handler)。由程序入口调用。"""
+    global _listener, _configured
+    with _setup_lock:
+        if _configured:
+            return
+        _configured = True
+        cfg = AI_CONFIG.get("LOGGING") or {}
+        formatter = JsonFormatter() if cfg.get("FORMAT", "text") == "json" else logging.Formatter(TEXT_FORMAT)
+        handlers: List[logging.Handler] = [logging.StreamHandler()]
+        if cfg.get("FILE"):
+            if os.path.dirname(cfg["FILE"]):
+                os.makedirs(os.path.dirname(cfg["FILE"]), exist_ok=True)
+            handlers.append(logging.FileHandler(cfg["FILE"], encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        filters = [ContextFilter(), SamplingFilter(cfg.get("SAMPLED_LOGGERS") or DEFAULT_SAMPLED_LOGGERS,
+                                                   cfg.get("STEP_SAMPLE_RATE", 1.0), cfg.get("STEP_MAX_PER_SECOND"))]
+
+        root = logging.getLogger()
+        root.setLevel(level or cfg.get("LEVEL", "INFO"))
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        if cfg.get("ASYNC", True):
+            queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=cfg.get("QUEUE_SIZE", 10000)))
+            for log_filter in filters:
+                queue_handler.addFilter(log_filter)
+            root.addHandler(queue_handler)
+            _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+            _listener.start()
+            atexit.register(shutdown_logging)
+        else:
+            for handler in handlers:
+                for log_filter in filters:
+                    handler.addFilter(log_filter)
+                root.addHandler(handler)
+
+
+class TranscriptWriter:
+    """
+    Agent 对话记录：mode 为 'file' 时由后台线程写入每次运行一个的 gzip 压缩 JSONL 文件；
+    'stdout' 时按原来的格式打印 LLM 输出；'off' 时不记录。
+    """
+
+    def __init__(self, mode: str = "file", directory: str = "logs/transcripts"):
+        self.mode = mode
+        self.path: Optional[str] = None
+        if mode == "file":
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f"run-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl.gz")
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _run(self) -> None:
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    return
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def record(self, event: str, **fields: Any) -> None:
+        if self.mode == "stdout":
+            if event == "llm":
+                print("\n-------------------- LLM 输出 --------------------")
+                print(f"[想法]: {fields.get('thought')}")
+                print(f"[动作]: {fields.get('action')}")
+                print(f"[参数]: {fields.get('params')}")
+                print("--------------------------------------------------\n")
+            return
+        if self.mode != "file":
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        _count("transcript_entries")
+        self._queue.put(dict(current_log_context(), ts=round(time.time(), 3), event=event, **fields))
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+_transcripts: Optional[TranscriptWriter] = None
+_transcripts_lock = threading.Lock()
+
+
+def get_transcript_writer() -> TranscriptWriter:
+    """按 AI_CONFIG['LOGGING'] 创建 (或返回已创建的) 本次运行的对话记录。"""
+    global _transcripts
+    with _transcripts_lock:
+        if _transcripts is None:
+            cfg = AI_CONFIG.get("LOGGING") or {}
+            _transcripts = TranscriptWriter(cfg.get("TRANSCRIPTS", "file"), cfg.get("TRANSCRIPT_DIR", "logs/transcripts"))
+        return _transcripts
+
+
+def record_transcript(event: str, **fields: Any) -> None:
+    get_transcript_writer().record(event, **fields)
+
+
+def shutdown_logging() -> None:
+    """写完队列中剩余的日志和对话记录 (进程退出时自动调用)。"""
+    global _listener
+    if _transcripts is not None:
+        _transcripts.close()
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """日志记录数、被采样/限速/队列满丢弃的条数、对话记录条数及文件路径。"""
+    with _log_stats_lock:
+        stats = dict(_log_stats)
+    if _transcripts is not None and _transcripts.path:
+        stats["transcript_path"] = _transcripts.path
+    return stats
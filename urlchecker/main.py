@@ -8,7 +8,7 @@ from dotenv import load_dotenv
 # from langchain_openai import ChatOpenAI
 # from langchain_community.chat_models import ChatOllama
 # from langchain_core.language_models.chat_models import BaseChatModel
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, List
 
 # 导入新的配置和客户端获取方式
 from .config import AI_CONFIG # 直接从 config.py 导入
@@ -17,12 +17,15 @@ from .agent import MineAgent
 from .llm_handler import LLMHandler # LLM Handler 仍然使用
 # 导入 FinishParams 用于类型提示
 from .actions import FinishParams
-
-# 配置日志输出格式
-logging.basicConfig(
-    level=logging.INFO, # 默认级别可以设为 INFO，减少冗余输出
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from .batch import BatchClassifier
+from .coalesce import agent_coalescer
+from .urlnorm import canonicalize_url
+from .fingerprint import get_fingerprint_store
+from .deadline import Deadline, STATUS_TIMEOUT, deadline_scope
+from .evidence import get_evidence_detector
+from .logs import log_context, new_correlation_id, setup_logging
+
+# 日志由程序入口调用 setup_logging() 配置 (格式、异步输出、采样见 AI_CONFIG['LOGGING'])
 # 为 urlchecker 相关模块设置 DEBUG 级别 (如果需要详细日志)
 # logging.getLogger('agent').setLevel(logging.DEBUG)
 # logging.getLogger('browser_controller').setLevel(logging.DEBUG)
@@ -37,18 +40,34 @@ logger = logging.getLogger(__name__)
 
 
 # --- 新增的外部调用接口 --- 
-async def check_url_is_dataset(url: str) -> Tuple[str, Optional[str]]:
+async def check_url_is_dataset(url: str, deadline: Optional[Deadline] = None) -> Tuple[str, Optional[str]]:
     """
     检查给定的 URL 是否指向一个数据集网站。
+    同一规范化 URL 的并发检查会被合并，只运行一次 Agent。
 
     Args:
         url: 要检查的 URL 字符串。
+        deadline: 检查的截止时间 (默认取当前上下文的)，到期时浏览器操作和 LLM 请求会被中断。
 
     Returns:
         一个元组 (status: str, thought: Optional[str])
-        status: "YES", "NO", 或 "Error: ..."
-        thought: 如果 status 是 "YES"，则为 LLM 的思考过程，否则为 None。
+        status: "YES", "NO", "TIMEOUT" 或 "Error: ..."
+        thought: 如果 status 是 "YES"，则为 LLM 的思考过程；"TIMEOUT" 时为超时前最后一步的想法 (可能为 None)；否则为 None。
     """
+    if deadline is None:
+        return await agent_coalescer.run(canonicalize_url(url), lambda: _run_agent_check(url))
+    # 合并后的共享任务在创建时复制当前上下文，因此会继承这里的截止时间
+    with deadline_scope(deadline):
+        return await agent_coalescer.run(canonicalize_url(url), lambda: _run_agent_check(url))
+
+
+async def _run_agent_check(url: str) -> Tuple[str, Optional[str]]:
+    """实际运行一次 Agent 检查 (check_url_is_dataset 的未合并版本)，这次检查的日志带同一个关联 ID。"""
+    with log_context(cid=new_correlation_id(), url=url):
+        return await _agent_check(url)
+
+
+async def _agent_check(url: str) -> Tuple[str, Optional[str]]:
     logger.info(f"开始检查 URL: {url}")
     
     # # 定义固定的任务
@@ -78,11 +97,16 @@ async def check_url_is_dataset(url: str) -> Tuple[str, Optional[str]]:
         return error_msg, None # 返回 thought 为 None
 
     # 创建 Agent 实例 (使用无头模式)
+    evidence_cfg = AI_CONFIG.get("EVIDENCE") or {}
     agent = MineAgent(
         task=task,
         llm_handler=llm_handler,
         start_url=url,
-        headless=True # 之前是 False，对于接口调用通常应该为 True
+        headless=True, # 之前是 False，对于接口调用通常应该为 True
+        fingerprint_store=get_fingerprint_store(),
+        evidence_detector=get_evidence_detector(),
+        max_steps=evidence_cfg.get("MAX_STEPS", 10),
+        stall_steps=evidence_cfg.get("STALL_STEPS")
     )
 
     # 运行 Agent 并获取结果
@@ -108,8 +132,12 @@ async def check_url_is_dataset(url: str) -> Tuple[str, Optional[str]]:
                     logger.warning(warning_msg)
                     # 可以选择返回错误，或者尝试强制判断 (这里选择返回错误)
                     return f"Error: LLM did not return YES or NO ({final_params.message})", None
+            elif agent.timed_out:
+                # 超过截止时间：记为超时而不是错误，附带已有的部分结果
+                logger.warning(f"URL '{url}' 的检查超时: {final_params.message}")
+                return STATUS_TIMEOUT, thought
             else:
-                # 任务失败 (由 Agent 内部判断，例如超时或出错)
+                # 任务失败 (由 Agent 内部判断，例如步数用完或出错)
                 error_msg = f"Error: Agent 执行失败: {final_params.message}"
                 logger.error(error_msg)
                 return error_msg, None
@@ -125,6 +153,41 @@ async def check_url_is_dataset(url: str) -> Tuple[str, Optional[str]]:
         return error_msg, None
 
 
+async def check_urls_batch(urls: List[str], recheck: bool = True) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    批量检查多个 URL：先用静态页面摘要打包分类 (每批一次 LLM 请求)，
+    摘要抓取失败、模型回答 UNSURE 或回复不合法的 URL 再用 check_url_is_dataset 逐个复查。
+
+    Args:
+        urls: 要检查的 URL 列表。
+        recheck: 为 False 时不做逐个复查，未能判断的 URL 不出现在返回结果中 (由调用方自行处理)。
+
+    Returns:
+        {url: (status, thought)}，status / thought 的含义与 check_url_is_dataset 相同。
+    """
+    batch_cfg = AI_CONFIG.get("BATCH_CLASSIFY") or {}
+    try:
+        classifier = BatchClassifier(
+            batch_size=batch_cfg.get("BATCH_SIZE", 8),
+            max_prompt_tokens=batch_cfg.get("MAX_PROMPT_TOKENS", 6000),
+            fetch_timeout=batch_cfg.get("FETCH_TIMEOUT", 10),
+        )
+    except (ValueError, AIClientError) as e:
+        logger.error(f"初始化批量分类失败，全部改为逐个检查: {e}")
+        batch_results = {url: None for url in urls}
+    else:
+        batch_results = await classifier.classify(urls)
+
+    results: Dict[str, Tuple[str, Optional[str]]] = {}
+    for url, verdict in batch_results.items():
+        if verdict is not None:
+            results[url] = verdict
+        elif recheck:
+            logger.info(f"[批量分类] URL '{url}' 未能通过摘要判断，改用 Agent 逐个检查。")
+            results[url] = await check_url_is_dataset(url)
+    return results
+
+
 # --- 主程序 (现在用于测试新接口) --- 
 async def main():
     # 示例 URL 列表
@@ -156,6 +219,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
     logger.info("检查 Playwright 浏览器是否安装...")
     # 在脚本开头添加 playwright 安装检查和执行逻辑
     try:
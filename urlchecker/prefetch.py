@@ -0,0 +1,153 @@
+"""
+LLM 思考期间的推测性预加载。
+
+MineAgent 每一步都要等 LLM 返回下一个动作，这段时间浏览器是空闲的；而模型接下来
+很可能 goto_url 或点击当前页面上 "Datasets" / "Download" 之类的链接。Prefetcher 在
+等待 LLM 时，把当前元素列表中文本或 href 命中数据集/下载模式的前 top_k 个链接
+在同一浏览器上下文的后台页面中提前打开。之后的 goto_url / click_element 若命中
+预加载的页面，直接切换过去，不再重新导航；没用上的页面在本步结束时关闭，计为浪费。
+"""
+
+import re
+import asyncio
+import logging
+import threading
+from urllib.parse import urljoin, urldefrag
+from typing import Dict, Any, Optional, List, Tuple
+
+from .host_scheduler import get_host_scheduler
+from .urlnorm import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATTERNS = [r"dataset", r"download", r"benchmark", r"\bdata\b", r"corpus", r"release",
+                    r"files", r"数据", r"下载"]
+
+
+class _PrefetchedPage:
+    def __init__(self, url: str):
+        self.url = url
+        self.page = None
+        self.task: Optional[asyncio.Task] = None
+        self.bytes = 0
+
+    def on_response(self, response) -> None:
+        try:
+            self.bytes += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
+
+
+class Prefetcher:
+    """为一个 BrowserController 预加载可能的下一跳页面。"""
+
+    def __init__(self, context, top_k: int = 2, timeout: float = 20.0, patterns: Optional[List[str]] = None):
+        """
+        :param context:  Playwright BrowserContext，预加载页面与 Agent 的页面共享 cookie 和缓存
+        :param top_k:    每一步最多预加载的链接数
+        :param timeout:  单个预加载导航的超时 (秒)
+        :param patterns: 链接文本/href 的匹配模式 (正则，忽略大小写)
+        """
+        self.context = context
+        self.top_k = top_k
+        self.timeout = timeout
+        self.pattern = re.compile("|".join(patterns or DEFAULT_PATTERNS), re.IGNORECASE)
+        self._pages: Dict[str, _PrefetchedPage] = {}
+
+    def candidates(self, state: Dict[str, Any]) -> List[str]:
+        """从页面状态的元素列表中挑出最可能被访问的链接 (按命中次数排序，同分保持页面顺序)。"""
+        current = canonicalize_url(state.get("url", ""))
+        scored: List[Tuple[int, int, str]] = []
+        seen = set()
+        for order, element in enumerate(state.get("elements", [])):
+            attributes = element.get("attributes") or {}
+            href = attributes.get("href")
+            if element.get("tag") != "a" or not href or href.startswith(("#", "javascript:", "mailto:")):
+                continue
+            url = urldefrag(urljoin(state.get("url", ""), href))[0]
+            key = canonicalize_url(url)
+            if key == current or key in seen or not url.startswith(("http://", "https://")):
+                continue
+            hits = len(self.pattern.findall(f"{element.get('text') or ''} {href}"))
+            if hits:
+                seen.add(key)
+                scored.append((-hits, order, url))
+        return [url for _, _, url in sorted(scored)[: self.top_k]]
+
+    def start(self, state: Dict[str, Any]) -> None:
+        """在后台开始预加载 (不等待)。"""
+        scheduler = get_host_scheduler()
+        for url in self.candidates(state):
+            key = canonicalize_url(url)
+            if key in self._pages or scheduler.is_open(url):
+                continue
+            entry = _PrefetchedPage(url)
+            entry.task = asyncio.ensure_future(self._load(entry))
+            self._pages[key] = entry
+            _record(started=1)
+            logger.debug(f"[预加载] 开始预加载: {url}")
+
+    async def _load(self, entry: _PrefetchedPage) -> None:
+        entry.page = await self.context.new_page()
+        entry.page.on("response", entry.on_response)
+        scheduler = get_host_scheduler()
+        async with scheduler.slot(entry.url):
+            await entry.page.goto(entry.url, wait_until="domcontentloaded", timeout=self.timeout * 1000)
+
+    async def take(self, url: str):
+        """
+        取出已预加载 (或正在预加载) 的页面；没有命中或预加载失败时返回 None。
+        正在加载的页面会等它完成，这仍比从头导航快。
+        """
+        entry = self._pages.pop(canonicalize_url(url), None)
+        if entry is None:
+            return None
+        try:
+            await entry.task
+        except Exception as e:
+            logger.debug(f"[预加载] {url} 预加载失败，改为正常导航: {e}")
+            await self._close(entry, wasted=True)
+            return None
+        _record(hits=1, used_bytes=entry.bytes)
+        logger.info(f"[预加载] 命中预加载页面: {url}")
+        return entry.page
+
+    async def discard_all(self) -> None:
+        """关闭本步没有用上的预加载页面。"""
+        entries = list(self._pages.values())
+        self._pages.clear()
+        for entry in entries:
+            await self._close(entry, wasted=True)
+
+    async def _close(self, entry: _PrefetchedPage, wasted: bool) -> None:
+        if entry.task is not None and not entry.task.done():
+            entry.task.cancel()
+        try:
+            await entry.task
+        except BaseException:  # 取消或加载失败都无所谓，页面马上关闭
+            pass
+        if entry.page is not None:
+            try:
+                await entry.page.close()
+            except Exception:
+                pass
+        if wasted:
+            _record(wasted=1, wasted_bytes=entry.bytes)
+
+
+_prefetch_stats = {"started": 0, "hits": 0, "wasted": 0, "used_bytes": 0, "wasted_bytes": 0}
+_prefetch_stats_lock = threading.Lock()
+
+
+def _record(**counts: int) -> None:
+    with _prefetch_stats_lock:
+        for key, value in counts.items():
+            _prefetch_stats[key] += value
+
+
+def get_prefetch_stats() -> Dict[str, Any]:
+    """预加载次数、命中率和浪费的字节数 (按响应的 Content-Length 统计)。"""
+    with _prefetch_stats_lock:
+        stats = dict(_prefetch_stats)
+    stats["hit_rate"] = round(stats["hits"] / stats["started"], 3) if stats["started"] else None
+    return stats
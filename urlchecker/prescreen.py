@@ -0,0 +1,317 @@
+"""
+基于历史判定结果训练的 URL 预筛模型。
+
+每次运行 Agent 都会产生带标签的 YES/NO 判定，这里把它们追加到判定历史 (JSONL)，
+再加上 benchmark_markdown 中人工标注的数据 (hand_dataset.json / filter.json 和各会议的
+*final_dataset_links.json 为正例，*extract*urls.txt 中其余的候选链接为负例)，训练一个只看 URL 本身的逻辑回归模型：
+- 特征：URL 分词后做特征哈希 (主机、域名后缀、路径片段、路径词和相邻词对、深度等)；
+- 训练：NumPy 批量梯度下降 + L2 正则，按类别频率加权；不需要 GPU；
+- 预测：一次向量化计算整批候选 URL 的正例概率，低于阈值的 URL 直接判为 NO，跳过 Agent。
+按 AUDIT_RATE 抽取一部分本该跳过的 URL 仍交给 Agent，用来在线估计预筛造成的召回损失。
+NumPy 是可选依赖，未安装时预筛自动关闭。
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import zlib
+import random
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 预筛是可选功能
+    np = None
+
+from .config import AI_CONFIG
+from .urlnorm import canonicalize_url, url_host
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def label_key(url: str, host_aliases: Optional[Dict[str, str]] = None) -> str:
+    """规范化 URL，并把镜像主机映射回原站 (hf-mirror.com -> huggingface.co)，使两者共享标签和特征。"""
+    canonical = canonicalize_url(url)
+    host = url_host(canonical)
+    for alias, origin in (host_aliases or {}).items():
+        if host == alias or host.endswith("." + alias):
+            return canonical.replace(host, host[: len(host) - len(alias)] + origin, 1)
+    return canonical
+
+
+def url_tokens(url: str, host_aliases: Optional[Dict[str, str]] = None) -> List[str]:
+    """把 URL 拆成用于特征哈希的 token。"""
+    canonical = label_key(url, host_aliases)
+    host = url_host(canonical)
+    path = canonical.split("/", 3)[3] if canonical.count("/") >= 3 else ""
+    path, _, query = path.partition("?")
+    segments = [seg for seg in path.lower().split("/") if seg]
+
+    tokens = [f"host:{host}", f"depth:{min(len(segments), 6)}"]
+    labels = host.split(".")
+    tokens.append(f"suffix:{'.'.join(labels[-2:])}")
+    tokens.append(f"tld:{labels[-1]}")
+    if query:
+        tokens.append("has_query")
+    if segments:
+        # 第一段路径 (GitHub 用户名、HF 的 datasets/models 等) 和主机组合起来最有区分度
+        tokens.append(f"seg0:{segments[0]}")
+        tokens.append(f"host_seg0:{host}/{segments[0]}")
+    tokens.extend(f"seg:{seg}" for seg in segments[1:6])
+    words = [w for w in _TOKEN_SPLIT.split("/".join(segments)) if w]
+    tokens.extend(f"w:{w}" for w in words)
+    tokens.extend(f"bi:{a}_{b}" for a, b in zip(words, words[1:]))
+    if segments:
+        last = segments[-1]
+        tokens.append(f"ext:{last.rsplit('.', 1)[-1]}" if "." in last else "ext:none")
+    return tokens
+
+
+class UrlPrescreenModel:
+    """特征哈希 + 逻辑回归的 URL 二分类模型 (需要 NumPy)。"""
+
+    def __init__(self, n_features: int = 2 ** 16, host_aliases: Optional[Dict[str, str]] = None):
+        if np is None:
+            raise RuntimeError("URL 预筛需要安装 numpy。")
+        self.n_features = n_features
+        self.host_aliases = host_aliases or {}
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+
+    def _feature_indices(self, url: str) -> List[int]:
+        return sorted({zlib.crc32(token.encode("utf-8")) % self.n_features
+                       for token in url_tokens(url, self.host_aliases)})
+
+    def _vectorize(self, urls: List[str]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """返回 CSR 形式的 (行号, 列号)，每个特征取值为 1。"""
+        rows, cols = [], []
+        for i, url in enumerate(urls):
+            indices = self._feature_indices(url)
+            rows.extend([i] * len(indices))
+            cols.extend(indices)
+        return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+    def _logits(self, rows, cols, n_rows: int) -> "np.ndarray":
+        return np.bincount(rows, weights=self.weights[cols], minlength=n_rows) + self.bias
+
+    def fit(self, urls: List[str], labels: List[int], epochs: int = 200, learning_rate: float = 0.5,
+            l2: float = 1e-4) -> "UrlPrescreenModel":
+        y = np.asarray(labels, dtype=np.float64)
+        rows, cols = self._vectorize(urls)
+        n = len(urls)
+        # 正负例数量差距很大，按类别频率加权
+        pos = max(y.sum(), 1.0)
+        neg = max(n - y.sum(), 1.0)
+        sample_weight = np.where(y > 0, n / (2 * pos), n / (2 * neg))
+        for _ in range(epochs):
+            probs = 1.0 / (1.0 + np.exp(-self._logits(rows, cols, n)))
+            residual = (probs - y) * sample_weight / n
+            grad = np.bincount(cols, weights=residual[rows], minlength=self.n_features)
+            self.weights -= (learning_rate * (grad + l2 * self.weights)).astype(np.float32)
+            self.bias -= learning_rate * residual.sum()
+        return self
+
+    def predict_proba(self, urls: List[str]) -> "np.ndarray":
+        """一次向量化计算整批 URL 的正例概率。"""
+        if not urls:
+            return np.zeros(0)
+        rows, cols = self._vectorize(urls)
+        return 1.0 / (1.0 + np.exp(-self._logits(rows, cols, len(urls))))
+
+
+class VerdictHistory:
+    """Agent 判定历史，JSONL 追加写入，每行 {"url", "verdict", "source", "time"}。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, url: str, verdict: str, source: str = "agent") -> None:
+        if verdict not in ("YES", "NO"):
+            return
+        directory = os.path.dirname(self.path)
+        with self._lock:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"url": url, "verdict": verdict, "source": source, "time": time.time()},
+                                   ensure_ascii=False) + "\n")
+
+    def load(self, host_aliases: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+        """返回 {label_key: 标签}，同一 URL 以最后一次判定为准。"""
+        labels: Dict[str, int] = {}
+        if not os.path.exists(self.path):
+            return labels
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                labels[label_key(record["url"], host_aliases)] = 1 if record.get("verdict") == "YES" else 0
+        return labels
+
+
+def _json_urls(data) -> List[str]:
+    """hand_dataset.json 是 URL 列表，filter.json 是 {pdf: [URL, ...]}。"""
+    if isinstance(data, dict):
+        return [url for urls in data.values() for url in urls]
+    return list(data)
+
+
+def load_benchmark_labels(positive_paths: List[str], candidate_patterns: List[str],
+                          host_aliases: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """
+    人工标注数据：positive_paths 匹配到的 JSON (hand_dataset.json、filter.json、各会议的
+    *final_dataset_links.json) 为正例，candidate_patterns 匹配到的候选链接列表
+    (*extract*urls.txt，每行一个 URL) 中其余的 URL 为负例。
+    候选链接列表包含全部会议的正例，因此每个会议的标注文件都必须列入 positive_paths，否则它们会被当作负例。
+    """
+    positives = set()
+    for path in (path for pattern in positive_paths for path in sorted(glob.glob(pattern))):
+        with open(path, "r", encoding="utf-8") as f:
+            for url in _json_urls(json.load(f)):
+                url = url.split(",")[0].strip()  # 个别条目后面拼了额外说明
+                if url:
+                    positives.add(label_key(url, host_aliases))
+    labels: Dict[str, int] = {}
+    for pattern in candidate_patterns:
+        for path in glob.glob(pattern):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    url = line.strip()
+                    if url:
+                        labels[label_key(url, host_aliases)] = 0
+    for url in positives:
+        labels[url] = 1
+    return labels
+
+
+class Prescreener:
+    """用预筛模型跳过高置信度的负例 URL，并统计节省的 Agent 调用和召回损失。"""
+
+    def __init__(self, model: UrlPrescreenModel, negative_threshold: float, audit_rate: float,
+                 holdout: Optional[Dict[str, float]] = None):
+        self.model = model
+        self.negative_threshold = negative_threshold
+        self.audit_rate = audit_rate
+        self.holdout = holdout
+        self._audited: Dict[str, float] = {}
+        self.counts = {"scored": 0, "skipped": 0, "audited": 0, "audit_yes": 0}
+
+    def screen(self, urls: List[str]) -> Tuple[List[str], List[Tuple[str, float]]]:
+        """
+        返回 (需要继续检查的 URL, 被跳过的 [(URL, 概率)])。
+        低于阈值的 URL 按 audit_rate 抽样保留，用于估计召回损失。
+        """
+        probs = self.model.predict_proba(urls)
+        self.counts["scored"] += len(urls)
+        keep, skipped = [], []
+        for url, prob in zip(urls, probs.tolist()):
+            if prob >= self.negative_threshold:
+                keep.append(url)
+            elif random.random() < self.audit_rate:
+                self._audited[canonicalize_url(url)] = prob
+                self.counts["audited"] += 1
+                keep.append(url)
+            else:
+                skipped.append((url, prob))
+        self.counts["skipped"] += len(skipped)
+        return keep, skipped
+
+    def record_verdict(self, url: str, verdict: str) -> None:
+        """抽检 URL 被 Agent 判为 YES 时，说明预筛会漏掉它。"""
+        if verdict == "YES" and canonicalize_url(url) in self._audited:
+            self.counts["audit_yes"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        audited = self.counts["audited"]
+        return {
+            **self.counts,
+            "agent_calls_saved": self.counts["skipped"],
+            # 抽检中被判为 YES 的比例 ≈ 被跳过的 URL 中实际为正例的比例
+            "audit_miss_rate": round(self.counts["audit_yes"] / audited, 3) if audited else None,
+            "estimated_missed": round(self.counts["skipped"] * self.counts["audit_yes"] / audited, 1) if audited else None,
+            "holdout": self.holdout,
+        }
+
+
+def _holdout_evaluate(urls: List[str], labels: List[int], threshold: float, n_features: int,
+                      host_aliases: Dict[str, str]) -> Optional[Dict[str, float]]:
+    """
+    留出 20% 数据评估阈值：recall_loss 为正例中会被跳过的比例，
+    negatives_skipped 为负例中会被跳过的比例 (即节省的 Agent 调用)。
+    """
+    indices = list(range(len(urls)))
+    random.Random(0).shuffle(indices)
+    split = len(indices) // 5
+    test_idx, train_idx = indices[:split], indices[split:]
+    test_pos = [urls[i] for i in test_idx if labels[i] == 1]
+    test_neg = [urls[i] for i in test_idx if labels[i] == 0]
+    if not test_pos or not test_neg:
+        return None
+    model = UrlPrescreenModel(n_features, host_aliases).fit(
+        [urls[i] for i in train_idx], [labels[i] for i in train_idx])
+    return {
+        "recall_loss": round(float((model.predict_proba(test_pos) < threshold).mean()), 3),
+        "negatives_skipped": round(float((model.predict_proba(test_neg) < threshold).mean()), 3),
+    }
+
+
+_verdict_history: Optional[VerdictHistory] = None
+_shared_prescreener: Optional[Prescreener] = None
+
+
+def get_verdict_history() -> Optional[VerdictHistory]:
+    """按 AI_CONFIG['PRESCREEN']['HISTORY_PATH'] 返回判定历史；未配置时返回 None。"""
+    global _verdict_history
+    cfg = AI_CONFIG.get("PRESCREEN") or {}
+    if _verdict_history is None and cfg.get("HISTORY_PATH"):
+        _verdict_history = VerdictHistory(cfg["HISTORY_PATH"])
+    return _verdict_history
+
+
+def build_prescreener(host_aliases: Optional[Dict[str, str]] = None) -> Optional[Prescreener]:
+    """
+    按 AI_CONFIG['PRESCREEN'] 训练预筛模型；未启用、缺少 numpy 或训练数据不足时返回 None。
+    :param host_aliases: 镜像主机 -> 原站主机 (即 pipeline 的 reverse_replacements)
+    """
+    global _shared_prescreener
+    cfg = AI_CONFIG.get("PRESCREEN") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    if np is None:
+        logger.warning("未安装 numpy，URL 预筛已关闭。")
+        return None
+    host_aliases = host_aliases or {}
+
+    labels = load_benchmark_labels(cfg.get("BENCHMARK_POSITIVES", []), cfg.get("BENCHMARK_CANDIDATES", []), host_aliases)
+    history = get_verdict_history()
+    if history is not None:
+        labels.update(history.load(host_aliases))  # 实际运行的判定覆盖人工标注
+    urls = list(labels)
+    y = [labels[url] for url in urls]
+    positives = sum(y)
+    if len(urls) < cfg.get("MIN_TRAINING_EXAMPLES", 100) or not positives or positives == len(y):
+        logger.info(f"URL 预筛训练数据不足 ({len(urls)} 条，正例 {positives} 条)，本次不启用。")
+        return None
+
+    n_features = cfg.get("N_FEATURES", 2 ** 16)
+    threshold = cfg.get("NEGATIVE_THRESHOLD", 0.05)
+    started = time.monotonic()
+    holdout = _holdout_evaluate(urls, y, threshold, n_features, host_aliases)
+    model = UrlPrescreenModel(n_features, host_aliases).fit(urls, y)
+    logger.info(f"URL 预筛模型训练完成：{len(urls)} 条样本 (正例 {positives})，耗时 {time.monotonic() - started:.1f} 秒，"
+                f"留出集评估 (阈值 {threshold}): {holdout}。")
+    _shared_prescreener = Prescreener(model, threshold, cfg.get("AUDIT_RATE", 0.1), holdout)
+    return _shared_prescreener
+
+
+def get_prescreen_stats() -> Optional[Dict[str, Any]]:
+    return _shared_prescreener.stats() if _shared_prescreener is not None else None
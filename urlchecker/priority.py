@@ -0,0 +1,189 @@
+"""
+候选 URL 的优先级排序与运行预算。
+
+Agent 检查是整个流程里最贵的一步 (浏览器 + 多轮 LLM)。这里给每个通过连通性检查的
+候选 URL 估一个 "产出 / 成本" 分数，分数高的先检查：
+- 产出：按域名/路径的先验 (数据集平台、代码托管) 和关键词命中 (dataset、benchmark 等)；
+- 成本：探测延迟越高越贵；静态托管平台 (GitHub/HF 镜像等) 页面简单，步数少；
+  可达性结果来自缓存的 URL 说明之前已经走过这条路，成本更可预期。
+RunBudget 限制整次运行的墙钟时间、LLM 请求数、token 数和费用 (见 cost.py)，预算用完后剩余 URL 不再检查；
+用量达到上限的 downgrade_at 比例后改用更便宜的模型。
+"""
+
+import time
+import heapq
+import itertools
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from .ai_client import get_llm_call_count
+from .cost import get_cost_ledger
+from .urlnorm import url_host
+
+logger = logging.getLogger(__name__)
+
+# 域名先验：命中这些主机 (或其子域) 的 URL 更可能是数据集/代码
+DOMAIN_PRIORS = {
+    "hf-mirror.com": 0.6,
+    "huggingface.co": 0.6,
+    "kaggle.com": 0.6,
+    "zenodo.org": 0.6,
+    "figshare.com": 0.5,
+    "archive.ics.uci.edu": 0.6,
+    "bgithub.xyz": 0.4,
+    "github.com": 0.4,
+    "gitlab.com": 0.3,
+    "bitbucket.org": 0.2,
+    "drive.google.com": 0.3,
+    "dropbox.com": 0.3,
+    "github.io": 0.2,
+}
+# 路径/查询中的关键词 (与 pipeline.preliminary_filter 的关键词一致，外加几个常见写法)
+YIELD_KEYWORDS = {
+    "dataset": 0.5, "datasets": 0.5, "corpus": 0.4, "benchmark": 0.4, "bench": 0.2,
+    "data": 0.2, "download": 0.3, "release": 0.1, "model": 0.1, "pretrained": 0.1,
+    "code": 0.05, "repo": 0.05,
+}
+# 页面结构简单、通常几步就能判断的主机
+STATIC_HOSTS = ("bgithub.xyz", "github.com", "hf-mirror.com", "huggingface.co", "gitlab.com", "zenodo.org")
+
+
+def _match_host(host: str, candidates) -> Optional[str]:
+    for candidate in candidates:
+        if host == candidate or host.endswith("." + candidate):
+            return candidate
+    return None
+
+
+def estimate_yield(url: str) -> float:
+    """估计 URL 指向数据集的可能性 (相对值，不是概率)。"""
+    host = url_host(url)
+    score = 0.1
+    matched = _match_host(host, DOMAIN_PRIORS)
+    if matched:
+        score += DOMAIN_PRIORS[matched]
+    rest = url.lower().split(host, 1)[-1] if host else url.lower()
+    score += sum(weight for keyword, weight in YIELD_KEYWORDS.items() if keyword in rest)
+    if rest.strip("/") == "":
+        score *= 0.5  # 只有主页，内容通常是个人/机构首页
+    return score
+
+
+def estimate_cost(url: str, latency: float = 0.0, cached: bool = False) -> float:
+    """估计检查该 URL 的相对成本 (1.0 约为一次普通 Agent 检查)。"""
+    cost = 1.0
+    if _match_host(url_host(url), STATIC_HOSTS):
+        cost *= 0.7
+    if latency > 3.0:
+        cost += min(latency / 10.0, 1.0)  # 响应慢的站点浏览器里也慢
+    if cached:
+        cost *= 0.9
+    return cost
+
+
+def score_url(url: str, latency: float = 0.0, cached: bool = False) -> float:
+    return estimate_yield(url) / estimate_cost(url, latency, cached)
+
+
+class RunBudget:
+    """整次运行的墙钟时间、LLM 请求数、token 数 (输入 + 输出) 和费用 (美元) 预算。None 表示不限。"""
+
+    def __init__(self, max_seconds: Optional[float] = None, max_llm_calls: Optional[int] = None,
+                 max_tokens: Optional[int] = None, max_spend_usd: Optional[float] = None,
+                 downgrade_at: Optional[float] = None, downgrade_model: Optional[str] = None):
+        self.max_seconds = max_seconds
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.max_spend_usd = max_spend_usd
+        self.downgrade_at = downgrade_at
+        self.downgrade_model = downgrade_model
+        self.started_at = time.monotonic()
+        self.llm_calls_at_start = get_llm_call_count()
+        self.usage_at_start = get_cost_ledger().snapshot()
+        self.checks_done = 0
+        self.check_seconds = 0.0
+
+    def llm_calls_used(self) -> int:
+        return get_llm_call_count() - self.llm_calls_at_start
+
+    def tokens_used(self) -> int:
+        usage = get_cost_ledger().snapshot()
+        return int(sum(usage[key] - self.usage_at_start[key] for key in ("prompt_tokens", "completion_tokens")))
+
+    def spend_used(self) -> float:
+        return get_cost_ledger().snapshot()["spend_usd"] - self.usage_at_start["spend_usd"]
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def record_check(self, seconds: float) -> None:
+        self.checks_done += 1
+        self.check_seconds += seconds
+
+    def exhausted(self) -> Optional[str]:
+        """
+        预算是否已不足以再开始一次检查；返回原因，未用完时返回 None。
+        按已完成检查的平均耗时 / 平均 LLM 请求数预估下一次检查的消耗。
+        """
+        avg_calls = self.llm_calls_used() / self.checks_done if self.checks_done else 0
+        avg_seconds = self.check_seconds / self.checks_done if self.checks_done else 0
+        avg_tokens = self.tokens_used() / self.checks_done if self.checks_done else 0
+        avg_spend = self.spend_used() / self.checks_done if self.checks_done else 0
+        if self.max_llm_calls is not None and self.llm_calls_used() + avg_calls > self.max_llm_calls:
+            return f"LLM 请求数预算用尽 ({self.llm_calls_used()}/{self.max_llm_calls})"
+        if self.max_tokens is not None and self.tokens_used() + avg_tokens > self.max_tokens:
+            return f"token 预算用尽 ({self.tokens_used()}/{self.max_tokens})"
+        if self.max_spend_usd is not None and self.spend_used() + avg_spend > self.max_spend_usd:
+            return f"费用预算用尽 (${self.spend_used():.2f}/${self.max_spend_usd:.2f})"
+        if self.max_seconds is not None and self.elapsed() + avg_seconds > self.max_seconds:
+            return f"时间预算用尽 ({self.elapsed():.0f}/{self.max_seconds:.0f} 秒)"
+        return None
+
+    def check_downgrade(self) -> None:
+        """请求数、token 数或费用任一项用到上限的 downgrade_at 比例时，之后的 LLM 请求改用 downgrade_model。"""
+        if self.downgrade_at is None or not self.downgrade_model:
+            return
+        for name, used, limit in (("LLM 请求数", self.llm_calls_used(), self.max_llm_calls),
+                                  ("token", self.tokens_used(), self.max_tokens),
+                                  ("费用", self.spend_used(), self.max_spend_usd)):
+            if limit and used >= self.downgrade_at * limit:
+                get_cost_ledger().downgrade(self.downgrade_model, f"{name}预算已用 {used / limit:.0%}")
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "elapsed_s": round(self.elapsed(), 1),
+            "llm_calls": self.llm_calls_used(),
+            "tokens": self.tokens_used(),
+            "spend_usd": round(self.spend_used(), 4),
+            "checks": self.checks_done,
+            "max_seconds": self.max_seconds,
+            "max_llm_calls": self.max_llm_calls,
+            "max_tokens": self.max_tokens,
+            "max_spend_usd": self.max_spend_usd,
+        }
+
+
+class PriorityWorkQueue:
+    """按分数从高到低出队的 URL 工作队列，同分时先入先出。"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+
+    def push(self, score: float, item: Any) -> None:
+        heapq.heappush(self._heap, (-score, next(self._seq), item))
+
+    def pop(self) -> Tuple[float, Any]:
+        neg_score, _, item = heapq.heappop(self._heap)
+        return -neg_score, item
+
+    def drain(self) -> List[Any]:
+        """按优先级顺序取出剩余的全部条目。"""
+        items = []
+        while self._heap:
+            items.append(self.pop()[1])
+        return items
+
+    def __len__(self) -> int:
+        return len(self._heap)
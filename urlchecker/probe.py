@@ -0,0 +1,108 @@
+"""
+URL 连通性检查。
+
+从 pipeline 中抽出来的轻量 HTTP 探测：只判断链接能否连上，供 Agent 检查前过滤死链。
+同一 URL 的并发探测会通过 probe_coalescer 合并，并受按主机的调度器/熔断器约束。
+探测前先查持久化的可达性缓存 (见 reachability.py)，缓存未过期时直接复用上次的结果。
+"""
+
+import asyncio
+import time
+import logging
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import requests
+
+from .coalesce import probe_coalescer
+from .host_scheduler import get_host_scheduler, HostCircuitOpenError
+from .reachability import get_reachability_cache, classify_probe, DNS_ERROR_MARKERS, OUTCOME_SUCCESS
+from .urlnorm import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# 增加 headers 模拟浏览器，减少被拒的可能性
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+@dataclass
+class ProbeResult:
+    url: str
+    reachable: bool
+    status_code: Optional[int] = None
+    final_url: Optional[str] = None
+    error_class: Optional[str] = None
+    error: Optional[str] = None
+    latency: float = 0.0
+    outcome: str = OUTCOME_SUCCESS  # success / transient / permanent，见 reachability.classify_probe
+    cached: bool = False
+    # 响应头中的内容信息，供 sniff.py 判断是否为直接下载的文件
+    content_type: Optional[str] = None
+    content_length: Optional[int] = None
+    content_disposition: Optional[str] = None
+
+
+def probe_url_sync(url: str, timeout: float = 10.0) -> ProbeResult:
+    """同步探测 URL。任何状态码都算可连接 (更宽松的可连接性检测条件)，只有请求异常才算不可达。"""
+    started = time.monotonic()
+    try:
+        response = requests.get(url, timeout=timeout, headers=HEADERS, allow_redirects=True, stream=True)
+        response.close() # 只读响应头，不下载响应体
+        try:
+            content_length = int(response.headers.get("Content-Length"))
+        except (TypeError, ValueError):
+            content_length = None
+        return ProbeResult(url=url, reachable=True, status_code=response.status_code,
+                           final_url=response.url, latency=time.monotonic() - started,
+                           outcome=classify_probe(True, response.status_code, None, None),
+                           content_type=response.headers.get("Content-Type"), content_length=content_length,
+                           content_disposition=response.headers.get("Content-Disposition"))
+    except requests.exceptions.RequestException as e:
+        error = str(e)
+        # 域名不存在在 requests 里只是 ConnectionError，单独标出来以便按主机缓存
+        error_class = "DNSError" if any(marker in error for marker in DNS_ERROR_MARKERS) else type(e).__name__
+        return ProbeResult(url=url, reachable=False, error_class=error_class, error=error,
+                           latency=time.monotonic() - started,
+                           outcome=classify_probe(False, None, error_class, error))
+
+
+# 这些状态码说明主机在拒绝我们 (限流/封禁)，计入熔断器的失败次数
+BLOCKING_STATUS_CODES = (429, 503)
+
+
+async def _scheduled_probe(url: str, timeout: float) -> ProbeResult:
+    """在主机调度器的并发/速率限制内探测，并把结果反馈给熔断器。"""
+    scheduler = get_host_scheduler()
+    try:
+        async with scheduler.slot(url):
+            result = await asyncio.to_thread(probe_url_sync, url, timeout)
+    except HostCircuitOpenError as e:
+        return ProbeResult(url=url, reachable=False, error_class="HostCircuitOpen", error=str(e),
+                           outcome="transient")
+    if not result.reachable or result.status_code in BLOCKING_STATUS_CODES:
+        scheduler.record_failure(url, reason=result.error_class or f"HTTP {result.status_code}")
+    else:
+        scheduler.record_success(url)
+    return result
+
+
+async def probe_url(url: str, timeout: float = 10.0) -> ProbeResult:
+    """异步探测 URL：先查可达性缓存；未命中时探测 (同一规范化 URL 的并发探测只执行一次) 并写回缓存。"""
+    cache = get_reachability_cache()
+    if cache is not None:
+        entry = cache.get(url)
+        if entry is not None:
+            return ProbeResult(cached=True, **entry)
+
+    result = await probe_coalescer.run(
+        canonicalize_url(url),
+        lambda: _scheduled_probe(url, timeout)
+    )
+    # 熔断短路不是真实的探测结果，不写缓存
+    if cache is not None and not result.cached and result.error_class != "HostCircuitOpen":
+        cache.put(url, result.outcome, result.status_code, result.final_url,
+                  result.error_class, result.error, result.latency,
+                  result.content_type, result.content_length, result.content_disposition)
+    return replace(result, url=url)
@@ -160,11 +160,79 @@ SYSTEM_PROMPT_TEMPLATE = """
 - 只输出 JSON 回复，前后不要加任何其他文字。
 """
 
-def get_system_prompt() -> str:
+# 流式模式下追加的要求：先写 action 再写 thought，这样动作 (尤其是 finish 的结论) 能尽早被解析出来
+ACTION_FIRST_INSTRUCTION = """- 在 JSON 中先写 'action' 字段，再写 'thought' 字段。
+"""
+
+def get_system_prompt(action_first: bool = False) -> str:
     """生成最终的系统提示，把完整的响应格式 schema 塞进去。"""
     # actions_schema_str = get_actions_schema_json() # 移除
     response_format_str = get_response_format_json() # 获取手动定义的 schema 字符串
-    return SYSTEM_PROMPT_TEMPLATE.format(
+    prompt = SYSTEM_PROMPT_TEMPLATE.format(
         # actions_schema=actions_schema_str, # 移除
         response_format=response_format_str
-    ) 
\ No newline at end of file
+    )
+    if action_first:
+        prompt += ACTION_FIRST_INSTRUCTION
+    return prompt 
+
+# 前缀稳定的消息布局 (PROMPT_LAYOUT.MODE = "stable") 下追加在系统提示后面的固定内容：
+# 任务、输入说明和少量示例都放进系统消息，所有 URL、所有步骤的请求共享完全相同的前缀，
+# 提供方的提示缓存才能命中；之后的消息只有历史和当前页面状态 (紧凑 JSON)。
+STABLE_LAYOUT_TEMPLATE = """
+当前任务：
+{task}
+
+输入说明：
+- 之后的每条用户消息是上一步动作的执行结果 ("Action Result:" 开头) 或当前页面状态 ("Current Page State:" 开头)，都是紧凑的 JSON。
+- 根据当前页面状态 (包括元素列表) 和历史，决定下一步动作。
+{examples}"""
+
+FEW_SHOT_EXAMPLES = [
+    (
+        {"url": "https://huggingface.co/datasets/squad", "title": "squad · Datasets at Hugging Face",
+         "elements": [{"id": 1, "tag": "h1", "text": "Dataset Card for SQuAD", "attributes": None},
+                      {"id": 2, "tag": "a", "text": "Files and versions", "attributes": {"href": "/datasets/squad/tree/main"}}]},
+        "这是 Hugging Face 上的数据集卡片页面，有数据集说明和文件列表。",
+        {"action": "finish", "params": {"success": True, "message": "YES"}},
+    ),
+    (
+        {"url": "https://github.com/someone/project", "title": "someone/project: Code for our paper",
+         "elements": [{"id": 1, "tag": "a", "text": "Project page", "attributes": {"href": "https://someone.github.io/project"}},
+                      {"id": 2, "tag": "p", "text": "Download the data from our project page.", "attributes": None}]},
+        "这是代码仓库，README 说数据在项目主页，需要打开项目主页确认。",
+        {"action": "goto_url", "params": {"url": "https://someone.github.io/project"}},
+    ),
+]
+
+
+def _format_examples(action_first: bool) -> str:
+    lines = []
+    for i, (state, thought, action) in enumerate(FEW_SHOT_EXAMPLES, 1):
+        response = {"action": action, "thought": thought} if action_first else {"thought": thought, "action": action}
+        lines += ["", f"示例 {i}：", "Current Page State:", json.dumps(state, ensure_ascii=False, separators=(",", ":")),
+                  "回复：", json.dumps(response, ensure_ascii=False, separators=(",", ":"))]
+    return "\n".join(lines) + "\n"
+
+
+def get_stable_system_prompt(task: str, action_first: bool = False, few_shot: bool = True) -> str:
+    """前缀稳定布局的系统消息：系统提示 + schema + 任务 + 示例 (同一任务下逐字节不变)。"""
+    return get_system_prompt(action_first=action_first) + STABLE_LAYOUT_TEMPLATE.format(
+        task=task.strip(), examples=_format_examples(action_first) if few_shot else "")
+
+
+# 批量分类用的系统提示：一次判断多个页面摘要，不涉及浏览器动作
+BATCH_CLASSIFY_SYSTEM_PROMPT = """
+你是一个专门判断网页是否为“数据集网站”的分类器。
+你会收到一个 JSON 列表，每一项是一个网页的精简摘要，包含 id、url、标题 (title)、描述 (description)、
+小标题 (headings)、正文开头 (text) 和页面上的链接 (links)。
+
+对每一项独立判断：
+- 页面明确提供某个数据集 (数据集主页、数据集卡片、数据下载链接、训练集/验证集/测试集说明等) -> "YES"；
+- 页面明显不是数据集网站 (普通博客、个人主页、论文页面、与数据无关的工具等) -> "NO"；
+- 仅凭摘要无法确定 (例如代码仓库可能附带数据、页面内容需要交互才能看到) -> "UNSURE"。
+
+响应格式：只输出一个 JSON 对象，前后不要加任何其他文字：
+{"results": [{"id": 1, "verdict": "YES", "thought": "一句话理由"}, ...]}
+必须为每个 id 输出恰好一项，verdict 只能是 "YES"、"NO" 或 "UNSURE"，thought 要简短。
+"""
@@ -0,0 +1,191 @@
+"""
+持久化的可达性缓存。
+
+连通性检查的结果按规范化 URL 存入 SQLite，记录状态码、重定向后的最终 URL、错误类型和延迟；
+域名不存在 (NXDOMAIN) 额外按主机记录，命中后同一主机的其他 URL 也不再重复解析。
+不同结果使用不同的 TTL：
+- success:   能连上 (任意非 404/410 状态码)；
+- transient: 超时、连接被拒、SSL 错误、DNS 临时故障等可能自行恢复的失败；
+- permanent: 域名不存在 (NXDOMAIN) 或 404/410，老论文里过期的个人主页多属此类。
+这里的分类只决定缓存多久；能连上的链接 (包括 404/410) 仍然交给 Agent 判断。
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+from .config import AI_CONFIG
+from .urlnorm import canonicalize_url, url_host
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_TRANSIENT = "transient"
+OUTCOME_PERMANENT = "permanent"
+
+GONE_STATUS_CODES = (404, 410)
+# 域名不存在 (NXDOMAIN, 即 getaddrinfo 返回 EAI_NONAME / EAI_NODATA) 时的报错特征。
+# urllib3 的 NameResolutionError / "Failed to resolve" 也包括 EAI_AGAIN
+# ("Temporary failure in name resolution") 这类解析器临时故障，不能据此判定为永久失败
+DNS_ERROR_MARKERS = ("Name or service not known", "nodename nor servname", "No address associated with hostname")
+
+
+def classify_probe(reachable: bool, status_code: Optional[int], error_class: Optional[str],
+                   error: Optional[str]) -> str:
+    """把一次探测结果归类为 success / transient / permanent。"""
+    if reachable:
+        return OUTCOME_PERMANENT if status_code in GONE_STATUS_CODES else OUTCOME_SUCCESS
+    if error_class == "DNSError" or any(marker in (error or "") for marker in DNS_ERROR_MARKERS):
+        return OUTCOME_PERMANENT  # 其他解析失败 (含 EAI_AGAIN) 按临时失败处理
+    return OUTCOME_TRANSIENT
+
+
+class ReachabilityCache:
+    """按规范化 URL 和主机缓存探测结果的 SQLite 存储。"""
+
+    def __init__(self, path: str, success_ttl: float, transient_ttl: float, permanent_ttl: float):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttls = {
+            OUTCOME_SUCCESS: success_ttl,
+            OUTCOME_TRANSIENT: transient_ttl,
+            OUTCOME_PERMANENT: permanent_ttl,
+        }
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS url_reachability (
+                url TEXT PRIMARY KEY,
+                outcome TEXT NOT NULL,
+                status_code INTEGER,
+                final_url TEXT,
+                error_class TEXT,
+                error TEXT,
+                latency REAL,
+                checked_at REAL NOT NULL,
+                content_type TEXT,
+                content_length INTEGER,
+                content_disposition TEXT
+            );
+            CREATE TABLE IF NOT EXISTS host_reachability (
+                host TEXT PRIMARY KEY,
+                outcome TEXT NOT NULL,
+                error_class TEXT,
+                checked_at REAL NOT NULL
+            );
+        """)
+        # 旧版本创建的缓存库没有内容信息列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(url_reachability)")}
+        for column, column_type in (("content_type", "TEXT"), ("content_length", "INTEGER"),
+                                    ("content_disposition", "TEXT")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE url_reachability ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+        self.hits = {OUTCOME_SUCCESS: 0, OUTCOME_TRANSIENT: 0, OUTCOME_PERMANENT: 0}
+        self.host_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _fresh(self, outcome: str, checked_at: float) -> bool:
+        return time.time() - checked_at < self.ttls.get(outcome, 0)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """返回未过期的缓存记录；主机级 DNS 失败优先于 URL 记录。没有可用记录时返回 None。"""
+        key = canonicalize_url(url)
+        with self._lock:
+            host_row = self._conn.execute(
+                "SELECT outcome, error_class, checked_at FROM host_reachability WHERE host = ?",
+                (url_host(key),)).fetchone()
+            if host_row and self._fresh(host_row[0], host_row[2]):
+                self.host_hits += 1
+                return {"url": url, "outcome": host_row[0], "reachable": False, "status_code": None,
+                        "final_url": None, "error_class": host_row[1],
+                        "error": "主机域名解析失败 (缓存)", "latency": 0.0}
+
+            row = self._conn.execute(
+                "SELECT outcome, status_code, final_url, error_class, error, latency, checked_at, "
+                "content_type, content_length, content_disposition "
+                "FROM url_reachability WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            (outcome, status_code, final_url, error_class, error, latency, checked_at,
+             content_type, content_length, content_disposition) = row
+            if not self._fresh(outcome, checked_at):
+                self.expired += 1
+                return None
+            self.hits[outcome] += 1
+            return {"url": url, "outcome": outcome, "reachable": error_class is None,
+                    "status_code": status_code, "final_url": final_url, "error_class": error_class,
+                    "error": error, "latency": latency, "content_type": content_type,
+                    "content_length": content_length, "content_disposition": content_disposition}
+
+    def put(self, url: str, outcome: str, status_code: Optional[int], final_url: Optional[str],
+            error_class: Optional[str], error: Optional[str], latency: float,
+            content_type: Optional[str] = None, content_length: Optional[int] = None,
+            content_disposition: Optional[str] = None) -> None:
+        key = canonicalize_url(url)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO url_reachability (url, outcome, status_code, final_url, error_class, error, "
+                "latency, checked_at, content_type, content_length, content_disposition) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, outcome, status_code, final_url, error_class, error, latency, now,
+                 content_type, content_length, content_disposition))
+            if outcome == OUTCOME_PERMANENT and status_code is None:
+                # 域名解析失败：整个主机一起记为不可达
+                self._conn.execute("INSERT OR REPLACE INTO host_reachability VALUES (?, ?, ?, ?)",
+                                   (url_host(key), outcome, error_class, now))
+            elif outcome == OUTCOME_SUCCESS:
+                self._conn.execute("DELETE FROM host_reachability WHERE host = ?", (url_host(key),))
+            self._conn.commit()
+
+    def put_host_failure(self, host: str, error_class: str = "DNSError") -> None:
+        """记录主机级的域名解析失败 (例如预热阶段提前解析出的 NXDOMAIN)。"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO host_reachability VALUES (?, ?, ?, ?)",
+                               (host, OUTCOME_PERMANENT, error_class, time.time()))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": dict(self.hits),
+            "host_hits": self.host_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache: Optional[ReachabilityCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_reachability_cache() -> Optional[ReachabilityCache]:
+    """按 AI_CONFIG['REACHABILITY_CACHE'] 打开 (或返回已打开的) 全局缓存；未启用时返回 None。"""
+    global _shared_cache
+    cfg = AI_CONFIG.get("REACHABILITY_CACHE") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ReachabilityCache(
+                path=cfg.get("PATH", ".cache/reachability.sqlite3"),
+                success_ttl=cfg.get("SUCCESS_TTL", 7 * 24 * 3600),
+                transient_ttl=cfg.get("TRANSIENT_TTL", 6 * 3600),
+                permanent_ttl=cfg.get("PERMANENT_TTL", 30 * 24 * 3600),
+            )
+        return _shared_cache
+
+
+def get_reachability_stats() -> Optional[Dict[str, Any]]:
+    return _shared_cache.stats() if _shared_cache is not None else None
@@ -0,0 +1,181 @@
+"""
+重定向 / 短链接解析。
+
+论文里常引用 bit.ly、tinyurl、goo.gl 等短链接，或者会跳转到 GitHub/HF 的项目主页。
+这里在连通性检查之前先用 HEAD 请求 (不下载响应体) 逐跳跟随重定向，得到最终 URL，
+再对最终 URL 做镜像替换 (github.com -> bgithub.xyz 等)，并把 source -> final 的映射
+持久化缓存。下一跳落到镜像替换的源主机 (例如 github.com) 时直接停止跟随，
+替换后由镜像站处理，不去连接可能被墙的原站。
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from urllib.parse import urljoin
+from typing import Dict, Optional, Iterable, Tuple, Any
+
+import requests
+
+from .config import AI_CONFIG
+from .urlnorm import canonicalize_url, url_host
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+# 部分服务器不支持 HEAD，改用只读响应头的 GET
+HEAD_UNSUPPORTED_STATUS_CODES = (403, 405, 501)
+
+
+def apply_replacements(url: str, replacements: Optional[Dict[str, str]]) -> str:
+    """按替换映射做子串替换 (与 PdfLinkExtractor.apply_replacements 规则一致)。"""
+    for src, tgt in (replacements or {}).items():
+        if src in url:
+            url = url.replace(src, tgt)
+    return url
+
+
+def _host_matches(host: str, hosts: Iterable[str]) -> bool:
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+def follow_redirects(url: str, stop_hosts: Iterable[str] = (), timeout: float = 5.0,
+                     max_redirects: int = 10) -> Tuple[str, int]:
+    """
+    用 HEAD 逐跳跟随重定向，返回 (最终 URL, 跳数)。
+    下一跳的主机属于 stop_hosts 时停在该跳 (不连接它)；请求失败时返回已经走到的 URL。
+    """
+    current = url
+    hops = 0
+    while hops < max_redirects:
+        if hops and _host_matches(url_host(current), stop_hosts):
+            break
+        try:
+            response = requests.head(current, timeout=timeout, headers=HEADERS, allow_redirects=False)
+            if response.status_code in HEAD_UNSUPPORTED_STATUS_CODES:
+                response = requests.get(current, timeout=timeout, headers=HEADERS,
+                                        allow_redirects=False, stream=True)
+                response.close()
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"[链接解析] 请求失败，停在 {current}: {e}")
+            break
+        location = response.headers.get("Location")
+        if response.status_code not in REDIRECT_STATUS_CODES or not location:
+            break
+        current = urljoin(current, location)
+        hops += 1
+    return current, hops
+
+
+class RedirectCache:
+    """source -> final URL 映射的 SQLite 缓存。"""
+
+    def __init__(self, path: str, ttl: float):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS redirects (
+                source TEXT PRIMARY KEY,
+                target TEXT NOT NULL,
+                hops INTEGER NOT NULL,
+                resolved_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT target, resolved_at FROM redirects WHERE source = ?",
+                                     (canonicalize_url(url),)).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return row[0]
+
+    def put(self, url: str, target: str, hops: int) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO redirects VALUES (?, ?, ?, ?)",
+                               (canonicalize_url(url), target, hops, time.time()))
+            self._conn.commit()
+
+
+class UrlResolver:
+    """解析重定向、做镜像替换，并统计解析情况。"""
+
+    def __init__(self, replacements: Optional[Dict[str, str]] = None, cache: Optional[RedirectCache] = None,
+                 skip_hosts: Iterable[str] = (), timeout: float = 5.0, max_redirects: int = 10):
+        """
+        :param replacements:  镜像替换映射，作用在解析后的最终 URL 上
+        :param cache:         source -> final 映射缓存；None 表示不缓存
+        :param skip_hosts:    不需要解析的主机 (已知的最终平台)；替换映射的源主机会自动加入
+        :param timeout:       每一跳 HEAD 请求的超时 (秒)
+        :param max_redirects: 最多跟随的跳数
+        """
+        self.replacements = replacements or {}
+        self.cache = cache
+        self.stop_hosts = set(skip_hosts) | {url_host(src) for src in self.replacements}
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.stats_counts = {"resolved": 0, "redirected": 0, "cache_hits": 0, "skipped": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats_counts[key] += 1
+
+    def resolve_sync(self, url: str) -> str:
+        """返回解析并替换后的最终 URL。"""
+        if _host_matches(url_host(url), self.stop_hosts):
+            self._count("skipped")
+            return apply_replacements(url, self.replacements)
+
+        target = self.cache.get(url) if self.cache is not None else None
+        if target is not None:
+            self._count("cache_hits")
+        else:
+            target, hops = follow_redirects(url, self.stop_hosts, self.timeout, self.max_redirects)
+            self._count("resolved")
+            if hops:
+                self._count("redirected")
+                logger.info(f"[链接解析] {url} -> {target} ({hops} 跳)")
+            if self.cache is not None:
+                self.cache.put(url, target, hops)
+        return apply_replacements(target, self.replacements)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self.stats_counts)
+
+
+_shared_resolver: Optional[UrlResolver] = None
+_shared_resolver_lock = threading.Lock()
+
+
+def get_url_resolver(replacements: Optional[Dict[str, str]] = None) -> Optional[UrlResolver]:
+    """按 AI_CONFIG['URL_RESOLVER'] 创建 (或返回已创建的) 全局解析器；未启用时返回 None。"""
+    global _shared_resolver
+    cfg = AI_CONFIG.get("URL_RESOLVER") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    with _shared_resolver_lock:
+        if _shared_resolver is None:
+            cache = RedirectCache(cfg["CACHE_PATH"], cfg.get("CACHE_TTL", 30 * 24 * 3600)) if cfg.get("CACHE_PATH") else None
+            _shared_resolver = UrlResolver(
+                replacements=replacements,
+                cache=cache,
+                skip_hosts=cfg.get("SKIP_HOSTS", []),
+                timeout=cfg.get("TIMEOUT", 5.0),
+                max_redirects=cfg.get("MAX_REDIRECTS", 10),
+            )
+        return _shared_resolver
+
+
+def get_resolver_stats() -> Optional[Dict[str, Any]]:
+    return _shared_resolver.stats() if _shared_resolver is not None else None
@@ -0,0 +1,274 @@
+"""
+多端点 LLM 路由客户端。
+
+把请求分散到 AI_CONFIG['ROUTER']['ENDPOINTS'] 中配置的多个 OpenAI 兼容端点
+(不同的 API_BASE / API_KEY / MODEL)，支持：
+- 负载均衡：least_outstanding (在途请求数 / 权重 最小者优先) 或 weighted (平滑加权轮询)；
+- 健康跟踪：连续失败达到阈值或遇到 429 的端点进入冷却期，冷却结束后自动恢复；
+- 自动故障转移：某个端点失败后换下一个端点重试；
+- 端点配额：MAX_IN_FLIGHT (并发)、MAX_RPM (每分钟请求数)、MAX_REQUESTS (整个运行的请求总数)。
+运行结束时可通过 stats() 获取每个端点的延迟和成功率。
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, Generator
+
+from .ai_client import AIClient, AIClientError, AIClientRateLimitError, OpenAIClient
+from .config import AI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class _Endpoint:
+    """单个端点的客户端、配额和健康/统计状态。"""
+
+    def __init__(self, name: str, client: AIClient, weight: float = 1.0,
+                 max_in_flight: Optional[int] = None, max_rpm: Optional[int] = None,
+                 max_requests: Optional[int] = None):
+        self.name = name
+        self.client = client
+        self.weight = max(float(weight), 0.01)
+        self.max_in_flight = max_in_flight
+        self.max_rpm = max_rpm
+        self.max_requests = max_requests
+
+        self.in_flight = 0
+        self.current_weight = 0.0  # 平滑加权轮询用
+        self.unhealthy_until = 0.0
+        self.consecutive_failures = 0
+        self.recent_starts: deque = deque()
+
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def quota_exhausted(self) -> bool:
+        return self.max_requests is not None and self.requests >= self.max_requests
+
+    def has_capacity(self, now: float) -> bool:
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return False
+        if self.max_rpm is not None:
+            while self.recent_starts and now - self.recent_starts[0] > 60.0:
+                self.recent_starts.popleft()
+            if len(self.recent_starts) >= self.max_rpm:
+                return False
+        return True
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "success_rate": round(self.successes / self.requests, 3) if self.requests else None,
+            "avg_latency_s": round(self.latency_total / self.successes, 3) if self.successes else None,
+            "max_latency_s": round(self.latency_max, 3),
+            "healthy": self.is_healthy(time.monotonic()),
+        }
+
+
+class RouterAIClient(AIClient):
+    """在多个端点之间做负载均衡和故障转移的 AIClient。"""
+
+    def __init__(self, endpoints: List[_Endpoint], strategy: str = "least_outstanding",
+                 failure_threshold: int = 3, failure_cooldown: float = 30.0,
+                 rate_limit_cooldown: float = 10.0, max_wait: float = 60.0):
+        """
+        :param endpoints:           端点列表
+        :param strategy:            'least_outstanding' 或 'weighted'
+        :param failure_threshold:   连续失败多少次后把端点标记为不健康
+        :param failure_cooldown:    不健康端点的冷却时间 (秒)
+        :param rate_limit_cooldown: 端点返回 429 后的冷却时间 (秒)
+        :param max_wait:            所有端点都没有空闲配额时最多等待的秒数
+        """
+        super().__init__(None)
+        if not endpoints:
+            raise ValueError("ROUTER 配置中没有任何端点 (ENDPOINTS 为空)。")
+        if strategy not in ("least_outstanding", "weighted"):
+            raise ValueError(f"不支持的路由策略: {strategy}")
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.failure_cooldown = failure_cooldown
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+
+    def _pick(self, exclude: set) -> Optional[_Endpoint]:
+        """选择一个端点并占用其在途名额；调用方已持有锁。"""
+        now = time.monotonic()
+        usable = [ep for ep in self.endpoints
+                  if ep.name not in exclude and not ep.quota_exhausted() and ep.has_capacity(now)]
+        if not usable:
+            return None
+        healthy = [ep for ep in usable if ep.is_healthy(now)]
+        # 所有可用端点都在冷却中时，选冷却最早结束的那个做试探，而不是直接失败
+        candidates = healthy or [min(usable, key=lambda ep: ep.unhealthy_until)]
+
+        if self.strategy == "weighted":
+            total = sum(ep.weight for ep in candidates)
+            for ep in candidates:
+                ep.current_weight += ep.weight
+            chosen = max(candidates, key=lambda ep: ep.current_weight)
+            chosen.current_weight -= total
+        else:
+            def load(ep: _Endpoint):
+                avg_latency = ep.latency_total / ep.successes if ep.successes else 0.0
+                return (ep.in_flight / ep.weight, avg_latency)
+            chosen = min(candidates, key=load)
+
+        chosen.in_flight += 1
+        chosen.requests += 1
+        chosen.recent_starts.append(now)
+        return chosen
+
+    def _acquire(self, exclude: set) -> Optional[_Endpoint]:
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            while True:
+                ep = self._pick(exclude)
+                if ep is not None:
+                    return ep
+                remaining = [e for e in self.endpoints if e.name not in exclude and not e.quota_exhausted()]
+                if not remaining:
+                    return None
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return None
+                # RPM 配额是按时间滑动释放的，所以定期醒来重新检查
+                self._cond.wait(timeout=min(timeout, 1.0))
+
+    def _release(self, ep: _Endpoint, started: float, error: Optional[Exception]) -> None:
+        latency = time.monotonic() - started
+        with self._cond:
+            ep.in_flight -= 1
+            if error is None:
+                ep.successes += 1
+                ep.consecutive_failures = 0
+                ep.latency_total += latency
+                ep.latency_max = max(ep.latency_max, latency)
+                ep.unhealthy_until = 0.0
+            else:
+                ep.failures += 1
+                ep.consecutive_failures += 1
+                now = time.monotonic()
+                if isinstance(error, AIClientRateLimitError):
+                    ep.rate_limited += 1
+                    ep.unhealthy_until = max(ep.unhealthy_until, now + self.rate_limit_cooldown)
+                    logger.warning(f"[LLM路由] 端点 '{ep.name}' 被限流，冷却 {self.rate_limit_cooldown:.0f} 秒。")
+                elif ep.consecutive_failures >= self.failure_threshold:
+                    ep.unhealthy_until = now + self.failure_cooldown
+                    logger.warning(f"[LLM路由] 端点 '{ep.name}' 连续失败 {ep.consecutive_failures} 次，标记为不健康 {self.failure_cooldown:.0f} 秒。")
+            self._cond.notify_all()
+
+    def complete(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        tried: set = set()
+        last_error: Optional[AIClientError] = None
+        while len(tried) < len(self.endpoints):
+            ep = self._acquire(tried)
+            if ep is None:
+                break
+            tried.add(ep.name)
+            started = time.monotonic()
+            try:
+                content = ep.client.complete(messages, **kwargs)
+            except AIClientError as e:
+                self._release(ep, started, e)
+                last_error = e
+                logger.warning(f"[LLM路由] 端点 '{ep.name}' 请求失败，尝试故障转移: {e}")
+                continue
+            self._release(ep, started, None)
+            return content
+
+        if last_error is not None:
+            raise last_error
+        raise AIClientError("没有可用的 LLM 端点 (配额已用完或全部繁忙)。")
+
+    def generate_stream(self, messages: List[Dict[str, str]], **kwargs) -> Generator[str, None, None]:
+        # 只有在收到第一段输出之前失败才会故障转移，已经输出的内容无法撤回
+        tried: set = set()
+        last_error: Optional[AIClientError] = None
+        while len(tried) < len(self.endpoints):
+            ep = self._acquire(tried)
+            if ep is None:
+                break
+            tried.add(ep.name)
+            started = time.monotonic()
+            emitted = False
+            try:
+                for delta in ep.client.generate_stream(messages, **kwargs):
+                    emitted = True
+                    yield delta
+            except AIClientError as e:
+                self._release(ep, started, e)
+                if emitted:
+                    raise
+                last_error = e
+                logger.warning(f"[LLM路由] 端点 '{ep.name}' 流式请求失败，尝试故障转移: {e}")
+                continue
+            except GeneratorExit:
+                self._release(ep, started, None)
+                raise
+            self._release(ep, started, None)
+            return
+
+        if last_error is not None:
+            raise last_error
+        raise AIClientError("没有可用的 LLM 端点 (配额已用完或全部繁忙)。")
+
+    def stream_complete(self, messages: List[Dict[str, str]], callback: Callable[[str], None], **kwargs) -> None:
+        for delta in self.generate_stream(messages, **kwargs):
+            callback(delta)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个端点的请求数、成功率和延迟。"""
+        with self._cond:
+            return {ep.name: ep.stats() for ep in self.endpoints}
+
+
+_shared_router: Optional[RouterAIClient] = None
+_shared_router_lock = threading.Lock()
+
+
+def get_llm_router() -> RouterAIClient:
+    """按 AI_CONFIG['ROUTER'] 创建 (或返回已创建的) 全局路由客户端，以便统计和配额跨 Agent 共享。"""
+    global _shared_router
+    with _shared_router_lock:
+        if _shared_router is None:
+            cfg = AI_CONFIG.get("ROUTER") or {}
+            endpoints = []
+            for i, ep_cfg in enumerate(cfg.get("ENDPOINTS", [])):
+                name = ep_cfg.get("NAME") or f"endpoint-{i}"
+                endpoints.append(_Endpoint(
+                    name=name,
+                    client=OpenAIClient(config=ep_cfg, name=name),
+                    weight=ep_cfg.get("WEIGHT", 1.0),
+                    max_in_flight=ep_cfg.get("MAX_IN_FLIGHT"),
+                    max_rpm=ep_cfg.get("MAX_RPM"),
+                    max_requests=ep_cfg.get("MAX_REQUESTS"),
+                ))
+            _shared_router = RouterAIClient(
+                endpoints,
+                strategy=cfg.get("STRATEGY", "least_outstanding"),
+                failure_threshold=cfg.get("FAILURE_THRESHOLD", 3),
+                failure_cooldown=cfg.get("FAILURE_COOLDOWN", 30.0),
+                rate_limit_cooldown=cfg.get("RATE_LIMIT_COOLDOWN", 10.0),
+                max_wait=cfg.get("MAX_WAIT", 60.0),
+            )
+            logger.info(f"已创建 LLM 路由客户端，{len(endpoints)} 个端点，策略: {_shared_router.strategy}")
+        return _shared_router
+
+
+def get_router_stats() -> Optional[Dict[str, Dict[str, Any]]]:
+    """返回路由客户端的端点统计；本次运行没有使用路由时返回 None。"""
+    return _shared_router.stats() if _shared_router is not None else None
@@ -0,0 +1,286 @@
+"""
+常驻的本地分类服务。
+
+临时检查、其他脚本、评测脚本都要调用 check_url_is_dataset，每次都要付出进程启动、
+浏览器启动和客户端初始化的开销。服务模式在一个进程里常驻浏览器池、LLM 连接、
+判定缓存和按主机的调度器，通过本地 HTTP (TCP 或 Unix socket) 提供：
+
+    GET  /health          服务状态和统计
+    POST /classify        {"url": "...", "deadline": 秒 (可选)}
+    POST /classify_batch  {"urls": [...], "deadline": 秒 (可选)}
+
+请求先排队 (上限 MAX_QUEUE，超出返回 503)，同时最多 MAX_CONCURRENCY 个 Agent 检查；
+超过截止时间的请求立即返回 TIMEOUT，但检查本身继续运行，结果写入判定缓存供之后的请求使用。
+MiningPipeline 可以通过 RemoteClassifier 把它作为远程后端 (config.yaml 中的 agent.backend)。
+
+启动: python -m urlchecker.service [--host 127.0.0.1 --port 8765 | --unix /tmp/urlchecker.sock]
+"""
+
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+from .config import AI_CONFIG
+from .main import check_url_is_dataset
+from .deadline import STATUS_TIMEOUT
+from .urlnorm import canonicalize_url
+from .warmup import start_warm_up
+from .browser_pool import close_browser_pool, get_browser_pool_stats
+from .host_scheduler import get_host_scheduler_stats
+from .http_cache import get_http_cache_stats
+from .logs import setup_logging
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class ServiceBusyError(Exception):
+    """排队的请求已达上限"""
+    pass
+
+
+class ClassificationService:
+    """带排队、并发上限、截止时间和判定缓存的 check_url_is_dataset 包装。"""
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 256,
+                 default_deadline: float = 600, cache_ttl: float = 24 * 3600):
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline
+        self.cache_ttl = cache_ttl
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._cache: Dict[str, Tuple[float, str, Optional[str]]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._pending = 0
+        self.started_at = time.time()
+        self.counts = {"requests": 0, "cache_hits": 0, "checks": 0, "deadline_exceeded": 0, "rejected": 0}
+
+    def _cached(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        checked_at, status, thought = entry
+        if time.time() - checked_at > self.cache_ttl:
+            del self._cache[key]
+            return None
+        return status, thought
+
+    async def _check(self, key: str, url: str) -> Tuple[str, Optional[str]]:
+        async with self._semaphore:
+            self.counts["checks"] += 1
+            status, thought = await check_url_is_dataset(url)
+        if status in ("YES", "NO"):
+            self._cache[key] = (time.time(), status, thought)
+        return status, thought
+
+    async def classify(self, url: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """检查单个 URL；超过 deadline 秒时返回 TIMEOUT (检查继续在后台进行)。"""
+        self.counts["requests"] += 1
+        started = time.monotonic()
+        key = canonicalize_url(url)
+        cached = self._cached(key)
+        if cached is not None:
+            self.counts["cache_hits"] += 1
+            return {"url": url, "status": cached[0], "thought": cached[1], "cached": True, "elapsed": 0.0}
+
+        task = self._inflight.get(key)
+        if task is None:
+            if self._pending >= self.max_queue:
+                self.counts["rejected"] += 1
+                raise ServiceBusyError(f"排队请求已达上限 ({self.max_queue})")
+            task = asyncio.ensure_future(self._check(key, url))
+            self._inflight[key] = task
+            self._pending += 1
+
+            def _done(_task, k=key):
+                self._inflight.pop(k, None)
+                self._pending -= 1
+            task.add_done_callback(_done)
+
+        try:
+            # shield: 截止时间到了只放弃等待，不取消检查
+            status, thought = await asyncio.wait_for(asyncio.shield(task), timeout=deadline or self.default_deadline)
+        except asyncio.TimeoutError:
+            self.counts["deadline_exceeded"] += 1
+            logger.info(f"[分类服务] {url} 超过截止时间 ({deadline or self.default_deadline} 秒)，检查仍在后台进行。")
+            status, thought = STATUS_TIMEOUT, None
+        except Exception as e:
+            status, thought = f"Error: {e}", None
+        return {"url": url, "status": status, "thought": thought, "cached": False,
+                "elapsed": round(time.monotonic() - started, 3)}
+
+    async def classify_batch(self, urls: List[str], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """并发检查多个 URL (整批共用同一个截止时间)；排队已满的 URL 单独返回错误。"""
+        async def one(url: str) -> Dict[str, Any]:
+            try:
+                return await self.classify(url, deadline)
+            except ServiceBusyError as e:
+                return {"url": url, "status": f"Error: {e}", "thought": None, "cached": False, "elapsed": 0.0}
+        return list(await asyncio.gather(*(one(url) for url in urls)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counts,
+            "in_flight": len(self._inflight),
+            "cached_verdicts": len(self._cache),
+            "uptime": round(time.time() - self.started_at, 1),
+            "browser_pool": get_browser_pool_stats(),
+            "http_cache": get_http_cache_stats(),
+            "hosts": get_host_scheduler_stats(),
+        }
+
+
+# --- 极简 HTTP/1.1 (每个连接一个请求，足够本地调用使用) ---
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, Any]]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    method, path, _ = request_line.split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_REQUEST_BYTES:
+        raise ValueError("请求体过大")
+    body = json.loads(await reader.readexactly(length)) if length else {}
+    return method, path, body
+
+
+def _response(status: int, payload: Any) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}.get(status, "")
+    head = (f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def _handle(service: ClassificationService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        try:
+            method, path, body = await _read_request(reader)
+        except (ValueError, json.JSONDecodeError, asyncio.IncompleteReadError) as e:
+            writer.write(_response(400, {"error": f"无效请求: {e}"}))
+            return
+        try:
+            if method == "GET" and path == "/health":
+                writer.write(_response(200, service.stats()))
+            elif method == "POST" and path == "/classify" and isinstance(body.get("url"), str):
+                writer.write(_response(200, await service.classify(body["url"], body.get("deadline"))))
+            elif method == "POST" and path == "/classify_batch" and isinstance(body.get("urls"), list):
+                writer.write(_response(200, {"results": await service.classify_batch(body["urls"], body.get("deadline"))}))
+            elif path in ("/health", "/classify", "/classify_batch"):
+                writer.write(_response(400, {"error": "参数错误"}))
+            else:
+                writer.write(_response(404, {"error": f"未知路径: {path}"}))
+        except ServiceBusyError as e:
+            writer.write(_response(503, {"error": str(e)}))
+        await writer.drain()
+    except ConnectionError:
+        pass  # 客户端提前断开
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8765, unix_socket: Optional[str] = None) -> None:
+    """启动服务并一直运行 (Ctrl+C 退出)。"""
+    cfg = AI_CONFIG.get("SERVICE") or {}
+    service = ClassificationService(
+        max_concurrency=cfg.get("MAX_CONCURRENCY", 4),
+        max_queue=cfg.get("MAX_QUEUE", 256),
+        default_deadline=cfg.get("DEFAULT_DEADLINE", 600),
+        cache_ttl=cfg.get("CACHE_TTL", 24 * 3600),
+    )
+    # 启动时就预热浏览器池和 LLM 连接，第一个请求不再等待
+    warm = start_warm_up()
+    handler = lambda reader, writer: _handle(service, reader, writer)
+    if unix_socket:
+        server = await asyncio.start_unix_server(handler, path=unix_socket)
+        logger.info(f"[分类服务] 监听 Unix socket: {unix_socket}")
+    else:
+        server = await asyncio.start_server(handler, host=host, port=port)
+        logger.info(f"[分类服务] 监听 http://{host}:{port}")
+    try:
+        if warm is not None:
+            logger.info(f"[分类服务] 预热完成: {await warm.wait()}")
+        async with server:
+            await server.serve_forever()
+    finally:
+        await close_browser_pool()
+
+
+class RemoteClassifier:
+    """
+    分类服务的客户端，接口与 check_url_is_dataset 相同。
+    address 形如 "http://127.0.0.1:8765" 或 "unix:///tmp/urlchecker.sock"。
+    """
+
+    def __init__(self, address: str, deadline: Optional[float] = None, connect_timeout: float = 10):
+        self.address = address
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        if self.address.startswith("unix://"):
+            connect = asyncio.open_unix_connection(self.address[len("unix://"):])
+            host = "localhost"
+        else:
+            host = self.address.split("://", 1)[-1].rstrip("/")
+            hostname, _, port = host.partition(":")
+            connect = asyncio.open_connection(hostname, int(port or 80))
+        reader, writer = await asyncio.wait_for(connect, timeout=self.connect_timeout)
+        try:
+            body = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
+            writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        return status, json.loads(body) if body else None
+
+    async def check(self, url: str, deadline: Optional[float] = None) -> Tuple[str, Optional[str]]:
+        """
+        返回 (status, thought)；服务不可用或繁忙时返回 Error 状态。
+        deadline (秒) 与构造时的截止时间取较小者。
+        """
+        if self.deadline is not None:
+            deadline = self.deadline if deadline is None else min(deadline, self.deadline)
+        try:
+            status, result = await self._request("POST", "/classify", {"url": url, "deadline": deadline})
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+            return f"Error: 分类服务不可用 ({self.address}): {e}", None
+        if status != 200:
+            return f"Error: 分类服务返回 HTTP {status}: {(result or {}).get('error')}", None
+        return result["status"], result.get("thought")
+
+    async def check_batch(self, urls: List[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+        try:
+            status, result = await self._request("POST", "/classify_batch", {"urls": urls, "deadline": self.deadline})
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+            return {url: (f"Error: 分类服务不可用 ({self.address}): {e}", None) for url in urls}
+        if status != 200:
+            return {url: (f"Error: 分类服务返回 HTTP {status}", None) for url in urls}
+        return {item["url"]: (item["status"], item.get("thought")) for item in result["results"]}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    cfg = AI_CONFIG.get("SERVICE") or {}
+    parser = argparse.ArgumentParser(description="常驻的 URL 数据集分类服务")
+    parser.add_argument("--host", default=cfg.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=cfg.get("PORT", 8765))
+    parser.add_argument("--unix", default=cfg.get("UNIX_SOCKET"), help="监听 Unix socket 路径 (提供时忽略 --host/--port)")
+    args = parser.parse_args()
+    setup_logging()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        logger.info("[分类服务] 已停止。")
@@ -0,0 +1,178 @@
+"""
+内容类型嗅探。
+
+论文里常常直接链接压缩包、CSV、模型权重或网盘文件。把这些交给 Agent 的 goto_url
+只会触发下载或者 60 秒的导航失败。连通性检查本来就会发一个只读响应头的 GET
+(见 probe.py)，这里根据其中的 Content-Type、Content-Length 和 Content-Disposition
+(以及文件扩展名) 把 URL 分成三类：
+- data: 直接下载的数据文件，立即判定为 YES 并记录格式和大小；压缩包、JSON 等通用格式
+        只有链接或文件名提到 data 时才算 (规则见 is_data_file，和 evidence.py 共用)；
+- skip: 模型权重、PDF、图片、安装包、GitHub 源码包等二进制的非数据内容，直接丢弃；
+- page: HTML 页面或无法判断的内容，交给 Agent。
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from urllib.parse import urlsplit, unquote
+from typing import Optional, Dict, Any, Tuple
+
+KIND_DATA = "data"
+KIND_SKIP = "skip"
+KIND_PAGE = "page"
+
+# 几乎只用于发布数据的格式 (也包括压缩过的，如 csv.gz)
+_DATA_FORMATS = ("csv", "tsv", "jsonl", "ndjson", "parquet", "arrow", "feather", "h5", "hdf5", "npz", "npy",
+                 "tfrecord", "tfrecords", "xlsx", "xls", "mat")
+_COMPRESSIONS = ("gz", "bz2", "xz", "zst")
+# 代码、配置也常用的通用格式：只有链接或文件名提到 data 时才算数据文件，否则交给 Agent
+_GENERIC_FORMATS = ("json", "zip", "tar", "tgz", "tar.gz", "tar.bz2", "tar.xz", "tar.zst", "7z", "rar") + _COMPRESSIONS
+_DATA_WORD_RE = re.compile(r"data|corpus|benchmark|数据", re.IGNORECASE)
+
+# 文件扩展名 -> 类别 (扩展名本身即格式)；多段扩展名 (tar.gz、csv.gz) 优先匹配
+_EXTENSIONS: Dict[str, str] = {}
+for _ext in _DATA_FORMATS + _GENERIC_FORMATS + tuple(f"{f}.{c}" for f in _DATA_FORMATS for c in _COMPRESSIONS):
+    _EXTENSIONS[_ext] = KIND_DATA
+for _ext in ("pt", "pth", "ckpt", "safetensors", "bin", "onnx", "pb", "gguf",  # 模型权重
+             "pdf", "ps", "doc", "docx", "ppt", "pptx",
+             "png", "jpg", "jpeg", "gif", "svg", "webp", "mp4", "avi", "mov", "webm", "mp3",
+             "exe", "msi", "dmg", "whl", "apk", "deb", "rpm"):
+    _EXTENSIONS[_ext] = KIND_SKIP
+
+# 托管源代码的主机：上面的 .json / .zip 是配置文件或源码，不是数据
+_RAW_SOURCE_HOSTS = ("raw.githubusercontent.com", "gist.githubusercontent.com")
+
+# 数据文件的 Content-Type -> 格式 (没有可识别扩展名时使用)
+_DATA_MIME_TYPES = {
+    "text/csv": "csv", "text/tab-separated-values": "tsv", "application/x-ndjson": "jsonl",
+    "application/vnd.apache.parquet": "parquet", "application/x-parquet": "parquet",
+    "application/x-hdf5": "hdf5", "application/x-hdf": "hdf5",
+    "application/zip": "zip", "application/x-zip-compressed": "zip", "application/x-tar": "tar",
+    "application/gzip": "gz", "application/x-gzip": "gz", "application/x-bzip2": "bz2", "application/x-xz": "xz",
+    "application/zstd": "zst", "application/x-7z-compressed": "7z", "application/vnd.rar": "rar",
+    "application/x-rar-compressed": "rar",
+}
+_SKIP_MIME_PREFIXES = ("image/", "video/", "audio/", "font/")
+_SKIP_MIME_TYPES = ("application/pdf", "application/postscript", "application/x-msdownload",
+                    "application/vnd.android.package-archive", "application/msword")
+_HTML_MIME_TYPES = ("text/html", "application/xhtml+xml")
+
+_FILENAME_RE = re.compile(r"""filename\*\s*=\s*[^']*'[^']*'([^;]+)|filename\s*=\s*"?([^";]+)"?""", re.IGNORECASE)
+
+
+@dataclass
+class ContentInfo:
+    kind: str                              # data / skip / page
+    format: Optional[str] = None           # csv / zip / pdf ... (能判断时)
+    content_type: Optional[str] = None
+    content_length: Optional[int] = None
+    filename: Optional[str] = None
+    attachment: bool = False
+
+    def describe(self) -> str:
+        size = "大小未知"
+        if self.content_length is not None:
+            value, unit = float(self.content_length), "B"
+            for unit in ("B", "KB", "MB", "GB", "TB"):
+                if value < 1024 or unit == "TB":
+                    break
+                value /= 1024
+            size = f"{value:.1f} {unit}" if unit != "B" else f"{int(value)} B"
+        return f"{self.format or self.content_type or '未知格式'}, {size}"
+
+
+def _filename(url: str, content_disposition: Optional[str]) -> Optional[str]:
+    if content_disposition:
+        match = _FILENAME_RE.search(content_disposition)
+        if match:
+            return unquote((match.group(1) or match.group(2)).strip())
+    path = urlsplit(url or "").path
+    name = unquote(path.rsplit("/", 1)[-1])
+    return name or None
+
+
+def _extension(filename: Optional[str]) -> Optional[str]:
+    if not filename or "." not in filename:
+        return None
+    parts = filename.lower().split(".")
+    if len(parts) >= 3 and f"{parts[-2]}.{parts[-1]}" in _EXTENSIONS:
+        return f"{parts[-2]}.{parts[-1]}"
+    return parts[-1] if parts[-1] in _EXTENSIONS else None
+
+
+def _host_path(url: str) -> Tuple[str, str]:
+    parts = urlsplit(url or "")
+    host = (parts.hostname or "").lower()
+    return (host[4:] if host.startswith("www.") else host), parts.path
+
+
+def _is_source_archive(url: str) -> bool:
+    """GitHub 的 "Download ZIP" / release 源码包是代码，不是数据。"""
+    host, path = _host_path(url)
+    return host == "codeload.github.com" or (host == "github.com" and "archive" in path.split("/"))
+
+
+def is_data_file(url: str, filename: Optional[str] = None, file_format: Optional[str] = None, text: str = "") -> bool:
+    """
+    链接是否指向数据文件 (内容嗅探和 evidence.detect_data_file_links 共用这条规则)：
+    GitHub 源码包和 raw 源文件不算；csv / parquet 等数据格式算；
+    压缩包、JSON 等通用格式只有链接、文件名或链接文字提到 data 时才算。
+    """
+    if _is_source_archive(url) or _host_path(url)[0] in _RAW_SOURCE_HOSTS:
+        return False
+    if filename is None:
+        filename = _filename(url, None)
+    if file_format is None:
+        file_format = _extension(filename)
+    if file_format is None:
+        return False
+    if file_format.split(".", 1)[0] in _DATA_FORMATS:
+        return True
+    return file_format in _GENERIC_FORMATS and bool(_DATA_WORD_RE.search(f"{url} {filename or ''} {text}"))
+
+
+def sniff_content(url: str, content_type: Optional[str], content_length: Optional[int],
+                  content_disposition: Optional[str]) -> ContentInfo:
+    """根据响应头 (和 URL 中的文件名) 判断内容类别。"""
+    mime = (content_type or "").split(";", 1)[0].strip().lower() or None
+    filename = _filename(url, content_disposition)
+    ext = _extension(filename)
+    info = ContentInfo(kind=KIND_PAGE, content_type=mime, content_length=content_length, filename=filename,
+                       attachment=bool(content_disposition and "attachment" in content_disposition.lower()))
+
+    if mime in _HTML_MIME_TYPES:
+        # 即使 URL 以 .zip 结尾，返回 HTML 的也是落地页 (网盘、镜像站的下载页等)
+        pass
+    elif ext is not None and _EXTENSIONS[ext] == KIND_SKIP:
+        info.kind, info.format = KIND_SKIP, ext
+    elif ext is not None or mime in _DATA_MIME_TYPES:
+        info.format = ext or _DATA_MIME_TYPES[mime]
+        if _is_source_archive(url):
+            info.kind = KIND_SKIP
+        elif is_data_file(url, filename, info.format):
+            info.kind = KIND_DATA
+        # 否则 (raw 源文件、没有提到 data 的压缩包 / JSON) 交给 Agent
+    elif mime and (mime.startswith(_SKIP_MIME_PREFIXES) or mime in _SKIP_MIME_TYPES):
+        info.kind, info.format = KIND_SKIP, mime.split("/", 1)[-1]
+    elif info.attachment or mime == "application/octet-stream":
+        # 没有可识别扩展名的二进制下载：浏览器打开只会触发下载，Agent 判断不了
+        info.kind = KIND_SKIP
+    _record(info)
+    return info
+
+
+_sniff_stats = {KIND_DATA: 0, KIND_SKIP: 0, KIND_PAGE: 0, "data_bytes": 0}
+_sniff_stats_lock = threading.Lock()
+
+
+def _record(info: ContentInfo) -> None:
+    with _sniff_stats_lock:
+        _sniff_stats[info.kind] += 1
+        if info.kind == KIND_DATA:
+            _sniff_stats["data_bytes"] += info.content_length or 0
+
+
+def get_sniff_stats() -> Dict[str, Any]:
+    """直接判定的数据文件数 (及总大小)、丢弃的非数据二进制数、交给 Agent 的页面数。"""
+    with _sniff_stats_lock:
+        return dict(_sniff_stats)
@@ -0,0 +1,41 @@
+"""
+URL 规范化工具。
+
+同一个资源在论文里常以不同写法出现 (大小写、末尾斜杠、#锚点、utm 参数、默认端口)，
+各类缓存与去重都以 canonicalize_url 的结果为键。
+"""
+
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "fbclid", "gclid")
+
+
+def canonicalize_url(url: str) -> str:
+    """返回用于缓存/去重的规范化 URL。无法解析时原样返回去掉首尾空白的字符串。"""
+    url = url.strip()
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+    try:
+        parts = urlsplit(url)
+        port = parts.port  # 端口不是数字 (如 "example.com:port") 时这里才抛出 ValueError
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = port if port not in (None, 80, 443) else None
+    netloc = f"{host}:{port}" if port else host
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if k.lower() not in TRACKING_PARAMS))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_host(url: str) -> str:
+    """返回 URL 的小写主机名 (不含端口)；无法解析时返回空字符串。"""
+    try:
+        return (urlsplit(url if "://" in url else "https://" + url).hostname or "").lower()
+    except ValueError:
+        return ""
@@ -0,0 +1,147 @@
+"""
+预热：在解析 PDF 的同时做好第一次 Agent 检查需要的准备。
+
+- 启动共享浏览器池 (Playwright + Chromium，见 browser_pool.py)；
+- 与每个 LLM 端点建立持久连接 (TCP/TLS 握手)，并用 GET /models 校验凭据；
+- 对已经提取出的链接的主机提前做 DNS 解析：NXDOMAIN 直接记入可达性缓存，
+  之后这些主机上的 URL 不再探测；
+全部在后台进行，不阻塞提取。
+"""
+
+import time
+import socket
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Iterable, List
+
+from .config import AI_CONFIG
+from .ai_client import OpenAIClient
+from .browser_pool import get_browser_pool
+from .reachability import get_reachability_cache
+from .urlnorm import canonicalize_url, url_host
+
+logger = logging.getLogger(__name__)
+
+
+def _llm_clients() -> List[OpenAIClient]:
+    """当前 AI 源对应的全部 OpenAI 兼容客户端 (路由模式下为每个端点一个)。"""
+    source = AI_CONFIG.get("DEFAULT_AI_SOURCE", "OPENAI").upper()
+    if source == "ROUTER":
+        from .router import get_llm_router
+        return [ep.client for ep in get_llm_router().endpoints if isinstance(ep.client, OpenAIClient)]
+    return [OpenAIClient(config_section="OPENAI")]
+
+
+class WarmStart:
+    """后台预热任务；start() 后可随时调用 resolve_hosts() 追加需要预解析的主机。"""
+
+    def __init__(self, browser: bool = True, llm: bool = True, dns: bool = True,
+                 dns_concurrency: int = 16, credential_timeout: float = 10):
+        self.browser = browser
+        self.llm = llm
+        self.dns = dns
+        self.credential_timeout = credential_timeout
+        self._dns_semaphore = asyncio.Semaphore(max(1, dns_concurrency))
+        self._tasks: List[asyncio.Task] = []
+        self._llm_task: Optional[asyncio.Task] = None
+        self._dns_tasks: List[asyncio.Task] = []
+        self._seen_hosts: set = set()
+        self._started_at: Optional[float] = None
+        self.report: Dict[str, Any] = {"dns": {"resolved": 0, "nxdomain": 0, "failed": 0}}
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+        if self.browser:
+            self._tasks.append(asyncio.ensure_future(self._warm_browser()))
+        if self.llm:
+            self._llm_task = asyncio.ensure_future(self._warm_llm())
+            self._tasks.append(self._llm_task)
+
+    async def _warm_browser(self) -> None:
+        pool = get_browser_pool()
+        if pool is None:
+            return
+        try:
+            await pool.start()
+            self.report["browser_ready_after"] = round(time.monotonic() - self._started_at, 3)
+        except Exception as e:
+            # 预热失败不影响运行，第一次检查时会再尝试启动
+            logger.warning(f"[预热] 启动浏览器池失败: {e}")
+            self.report["browser_error"] = str(e)
+
+    async def _warm_llm(self) -> None:
+        try:
+            clients = _llm_clients()
+        except (ValueError, KeyError) as e:
+            logger.warning(f"[预热] 无法创建 LLM 客户端: {e}")
+            self.report["llm_error"] = str(e)
+            return
+        results = await asyncio.gather(*(asyncio.to_thread(client.warm_up, self.credential_timeout)
+                                         for client in clients))
+        self.report["llm"] = {client.api_base: result for client, result in zip(clients, results)}
+        self.report["llm_ready_after"] = round(time.monotonic() - self._started_at, 3)
+        for client, result in zip(clients, results):
+            if result.get("credentials_valid") is False:
+                logger.error(f"[预热] LLM 端点 {client.api_base} 凭据无效 (HTTP {result.get('status_code')})，请检查 API_KEY。")
+            elif not result.get("connected"):
+                logger.warning(f"[预热] 无法连接 LLM 端点 {client.api_base}: {result.get('error')}")
+
+    async def wait_llm(self) -> None:
+        """只等待 LLM 连接和凭据校验 (不等 DNS 预解析)。"""
+        if self._llm_task is not None:
+            await self._llm_task
+
+    def credentials_invalid(self) -> bool:
+        """所有 LLM 端点都明确拒绝了凭据 (401/403) 时返回 True。"""
+        llm = self.report.get("llm") or {}
+        return bool(llm) and all(result.get("credentials_valid") is False for result in llm.values())
+
+    def resolve_hosts(self, urls: Iterable[str]) -> None:
+        """在后台解析这些 URL 中尚未解析过的主机 (需在事件循环线程中调用)。"""
+        if not self.dns:
+            return
+        for url in urls:
+            host = url_host(url)
+            if host and host not in self._seen_hosts:
+                self._seen_hosts.add(host)
+                self._dns_tasks.append(asyncio.ensure_future(self._resolve(host, url)))
+
+    async def _resolve(self, host: str, url: str) -> None:
+        async with self._dns_semaphore:
+            try:
+                await asyncio.to_thread(socket.getaddrinfo, host, 443, 0, socket.SOCK_STREAM)
+                self.report["dns"]["resolved"] += 1
+            except socket.gaierror as e:
+                if e.errno == socket.EAI_NONAME:
+                    self.report["dns"]["nxdomain"] += 1
+                    cache = get_reachability_cache()
+                    if cache is not None:
+                        cache.put_host_failure(url_host(canonicalize_url(url)))
+                    logger.info(f"[预热] 域名不存在，之后不再探测: {host}")
+                else:
+                    self.report["dns"]["failed"] += 1
+            except Exception as e:  # 主机名本身不合法等，交给之后的连通性检查处理
+                logger.debug(f"[预热] 解析 {host} 出错: {e}")
+                self.report["dns"]["failed"] += 1
+
+    async def wait(self) -> Dict[str, Any]:
+        """等待全部预热任务完成，返回预热报告。"""
+        await asyncio.gather(*self._tasks, *self._dns_tasks)
+        self.report["dns"]["hosts"] = len(self._seen_hosts)
+        return self.report
+
+
+def start_warm_up() -> Optional[WarmStart]:
+    """按 AI_CONFIG['WARM_START'] 启动后台预热；未启用时返回 None。需在事件循环中调用。"""
+    cfg = AI_CONFIG.get("WARM_START") or {}
+    if not cfg.get("ENABLED", False):
+        return None
+    warm = WarmStart(
+        browser=cfg.get("BROWSER", True),
+        llm=cfg.get("LLM", True),
+        dns=cfg.get("DNS", True),
+        dns_concurrency=cfg.get("DNS_CONCURRENCY", 16),
+        credential_timeout=cfg.get("CREDENTIAL_TIMEOUT", 10),
+    )
+    warm.start()
+    return warm